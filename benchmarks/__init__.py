@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks of the validation rules used in the lessons.
+
+Every case of :mod:`benchmarks.cases` is a schema of a lesson, e.g.
+``regex_example`` of ``lsn01_quickstart.py`` or ``example_allow_unknown`` of
+``p2_validation_rules/p1_allow_unknown.py``. :mod:`benchmarks.documents`
+generates synthetic documents for them, with a given container size, nesting
+depth and error rate, and :mod:`benchmarks.runner` measures the docs/sec,
+the p50 / p99 latency and the peak memory of ``validate``, ``validated`` and
+``normalized``.
+
+Run from the repository root::
+
+    python -m benchmarks --output results.json
+    python -m benchmarks --output new.json --compare results.json
+
+The results are JSON, with the cerberus and python versions, so runs of
+different cerberus versions can be compared.
+"""
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Find the invalid records of a NDJSON file: the loop of
+``validated_method_example`` of ``lsn01_quickstart.py`` against
+:class:`learn_cerberus.bulk.BulkValidator`.
+
+A file of synthetic order records, with a given error rate, is written to a
+temporary directory, then every method reports the offsets of the invalid
+records and the records/sec:
+
+- ``validated loop``: read the lines, ``json.loads`` and ``v.validated(record)``
+  with a ``cerberus.Validator``, the flow of ``validated_method_example``.
+- ``compiled loop``: the same with a ``CompiledValidator``.
+- ``mmap scan``: :func:`learn_cerberus.bulk.scan` of a memory map, one
+  process.
+- ``bulk``: :class:`learn_cerberus.bulk.BulkValidator`, worker processes.
+
+Usage::
+
+    python -m benchmarks.bulk_ndjson
+    python -m benchmarks.bulk_ndjson --records 1000000 --processes 8 --output bulk.json
+"""
+
+from __future__ import print_function
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from cerberus import Validator
+
+from learn_cerberus.bulk import BulkValidator, map_file, scan
+from learn_cerberus.compiled import CompiledValidator
+
+from .runner import environment
+
+SCHEMA = {
+    "id": {"type": "integer", "required": True},
+    "sku": {"type": "string", "regex": "[A-Z]{2}[0-9]{3}", "required": True},
+    "price": {"type": "integer", "min": 0},
+    "quantity": {"type": "integer", "min": 1, "max": 1000},
+    "status": {"type": "string", "allowed": ["new", "paid", "shipped"]},
+    "customer": {"type": "dict", "schema": {
+        "name": {"type": "string", "empty": False},
+        "email": {"type": "string", "maxlength": 64},
+    }},
+}
+
+_ERRORS = [
+    ("price", -1), ("sku", "kt001"), ("quantity", "3"), ("status", "lost"),
+    ("customer", {"name": ""}),
+]
+
+
+def write_records(path, n_records, error_rate, seed=0):
+    """Write ``n_records`` order records, a fraction ``error_rate`` of them
+    invalid.
+    """
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for i in range(n_records):
+            record = {
+                "id": i,
+                "sku": "KT%03d" % rng.randint(0, 999),
+                "price": rng.randint(0, 100000),
+                "quantity": rng.randint(1, 20),
+                "status": rng.choice(["new", "paid", "shipped"]),
+                "customer": {"name": "customer %d" % rng.randint(0, 9999),
+                             "email": "c%d@example.com" % rng.randint(0, 9999)},
+            }
+            if rng.random() < error_rate:
+                field, value = rng.choice(_ERRORS)
+                record[field] = value
+            f.write(json.dumps(record))
+            f.write("\n")
+
+
+def _loop(validator, path):
+    offsets = list()
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if validator.validated(json.loads(line)) is None:
+                offsets.append(offset)
+            offset += len(line)
+    return offsets
+
+
+def validated_loop(path, processes):
+    return _loop(Validator(SCHEMA), path)
+
+
+def compiled_loop(path, processes):
+    return _loop(CompiledValidator(SCHEMA), path)
+
+
+def mmap_scan(path, processes):
+    buffer = map_file(path)
+    try:
+        _, bad_records = scan(CompiledValidator(SCHEMA), buffer)
+    finally:
+        buffer.close()
+    return [bad.offset for bad in bad_records]
+
+
+def bulk(path, processes):
+    with BulkValidator(SCHEMA, processes=processes, chunk_bytes=1024 * 1024) as bv:
+        return [bad.offset for bad in bv.invalid_records(path)]
+
+
+METHODS = [
+    ("validated loop", validated_loop),
+    ("compiled loop", compiled_loop),
+    ("mmap scan", mmap_scan),
+    ("bulk", bulk),
+]
+
+
+def run(n_records=100000, error_rate=0.01, processes=None):
+    processes = processes or os.cpu_count() or 1
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "records.ndjson")
+        write_records(path, n_records, error_rate)
+        results = list()
+        expected = None
+        for label, method in METHODS:
+            started = time.perf_counter()
+            offsets = method(path, processes)
+            elapsed = time.perf_counter() - started
+            if expected is None:
+                expected = offsets
+            assert offsets == expected, label
+            results.append({
+                "method": label,
+                "seconds": round(elapsed, 3),
+                "records_per_sec": round(n_records / elapsed),
+                "n_invalid": len(offsets),
+            })
+        return dict(n_records=n_records, error_rate=error_rate, processes=processes,
+                    file_bytes=os.path.getsize(path), results=results)
+    finally:
+        shutil.rmtree(directory)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.bulk_ndjson",
+        description="Find the invalid records of a NDJSON file.",
+    )
+    parser.add_argument("-n", "--records", type=int, default=100000,
+                        help="records in the file, default 100000")
+    parser.add_argument("-e", "--error-rate", type=float, default=0.01,
+                        help="fraction of invalid records, default 0.01")
+    parser.add_argument("-p", "--processes", type=int, default=None,
+                        help="worker processes of bulk, default is the number of CPUs")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    report = run(args.records, args.error_rate, args.processes)
+    print("%d records, %.1f MB, %d invalid, %d processes" % (
+        report["n_records"], report["file_bytes"] / 1e6,
+        report["results"][0]["n_invalid"], report["processes"]))
+    for result in report["results"]:
+        print("%-16s %8.2f s %10d records/sec" % (
+            result["method"], result["seconds"], result["records_per_sec"]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(dict(environment(), **report), f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
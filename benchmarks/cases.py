@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+The benchmarked schemas, one per rule family of the lessons.
+
+A :class:`Case` has the schema, the validator class and ``samples``: valid
+and invalid values for the fields the generator can't guess, e.g. the ones
+with a ``regex`` or a custom rule.
+"""
+
+import re
+
+from cerberus import Validator
+
+
+class Case(object):
+    """
+    :param name: name of the case, ``<module>.<example function>``.
+    :param schema: the validation schema.
+    :param validator_class: ``Validator`` or a subclass of it.
+    :param samples: ``{field: (valid values, invalid value)}``
+    :param sized: ``True`` if the schema has containers, whose length is
+        set by the document size.
+    """
+
+    def __init__(self, name, schema, validator_class=Validator, samples=None,
+                 sized=False):
+        self.name = name
+        self.schema = schema
+        self.validator_class = validator_class
+        self.samples = samples or dict()
+        self.sized = sized
+
+
+def non_repeat_list(value):
+    seen = set()
+    return [x for x in value if not (x in seen or seen.add(x))]
+
+
+class OddValidator(Validator):
+    """``class_based_custom_validators`` of ``lsn02_custom_validator.py``
+    """
+
+    def _validate_isodd(self, isodd, field, value):
+        """{'type': 'boolean'}"""
+        if isodd and not bool(value & 1):
+            self._error(field, "Must be an odd number")
+
+
+objectid_regex = re.compile("[a-f0-9]{16}")
+
+
+class ObjectIdValidator(Validator):
+    """``custom_data_types`` of ``lsn02_custom_validator.py``
+    """
+
+    def _validate_type_objectid(self, value):
+        return isinstance(value, str) and objectid_regex.match(value) is not None
+
+
+EMAIL_REGEX = "[a-z0-9.]+@[a-z0-9.]+"
+
+CASES = [
+    Case("lsn01.basic_usage", {"name": {"type": "string"}}),
+    Case("lsn01.required", {
+        "lastname": {"type": "string", "required": True},
+        "firstname": {"type": "string", "required": True},
+    }),
+    Case("lsn01.nullable", {"memo": {"nullable": True, "type": "string"}}),
+    Case("lsn01.allowed", {"label": {"type": "integer", "allowed": [1, 2, 3]}}),
+    Case("lsn01.max_min_length", {
+        "password": {"type": "string", "minlength": 8, "maxlength": 20},
+    }),
+    Case("lsn01.regex", {"email": {"type": "string", "regex": EMAIL_REGEX}},
+         samples={"email": (["example@gmail.com", "john.doe@example.com"], "123456")}),
+    Case("lsn01.max_min", {"value": {"type": "number", "min": 0, "max": 1}}),
+    Case("lsn01.list_type", {"tag": {"type": "list", "schema": {"type": "string"}}},
+         sized=True),
+    Case("lsn01.list_allowed", {
+        "role": {"type": "list", "allowed": ["agent", "client", "supplier"]},
+    }, sized=True),
+    Case("lsn01.set_type", {"tag": {"type": "set"}}, sized=True),
+    Case("lsn01.non_repeat_list", {"tag": {"type": "list", "coerce": non_repeat_list}},
+         sized=True),
+    Case("lsn01.list_of_dict", {
+        "rows": {
+            "type": "list",
+            "schema": {
+                "type": "dict",
+                "schema": {"sku": {"type": "string"}, "price": {"type": "integer"}},
+            },
+        },
+    }, sized=True),
+    Case("lsn01.dict_type", {
+        "customer": {
+            "type": "dict",
+            "required": True,
+            "schema": {
+                "firstname": {"type": "string", "required": True},
+                "lastname": {"type": "string", "required": True},
+                "age": {"type": "integer", "required": True},
+            },
+        },
+    }),
+    Case("lsn01.valueschema", {
+        "poker_code": {
+            "type": "dict",
+            "valuesrules": {"type": "integer", "min": 1, "max": 52},
+        },
+    }, sized=True),
+    Case("lsn01.anyof", {
+        "value": {"type": "number",
+                  "anyof": [{"min": 0, "max": 10}, {"min": 100, "max": 1000}]},
+    }),
+    Case("lsn01.type_coercion", {"value": {"type": "number", "coerce": int}},
+         samples={"value": (["1", "42", "1000"], "abc")}),
+    Case("lsn02.class_based_custom_validators",
+         {"oddity": {"isodd": True, "type": "integer"}, "another": {"isodd": True}},
+         validator_class=OddValidator,
+         samples={"oddity": ([1, 3, 99], 10), "another": ([5, 7], 12)}),
+    Case("lsn02.custom_data_types", {"_id": {"type": "objectid"}},
+         validator_class=ObjectIdValidator,
+         samples={"_id": (["0123456789abcdef"], "0123456789")}),
+    Case("p1_allow_unknown.nested", {
+        "name": {"type": "string"},
+        "profile": {
+            "type": "dict",
+            "allow_unknown": True,
+            "schema": {"email": {"type": "string"}, "phone": {"type": "string"}},
+        },
+    }),
+    Case("p2_ofrules.oneof", {
+        "value": {"type": "number",
+                  "oneof": [{"min": 25, "max": 50}, {"min": 50, "max": 75}]},
+    }, samples={"value": ([25, 30, 60, 75], 50)}),
+    Case("p3_dependencies.dot_notation", {
+        "test_field": {"dependencies": ["a_dict.foo", "a_dict.bar"]},
+        "a_dict": {
+            "type": "dict",
+            "schema": {"foo": {"type": "string"}, "bar": {"type": "string"}},
+        },
+    }),
+    Case("p4_empty.empty", {"name": {"type": "string", "empty": False}}),
+]
+
+
+def get_cases(names=None):
+    """The cases whose name contains one of ``names``, all by default.
+    """
+    if not names:
+        return list(CASES)
+    return [case for case in CASES if any(name in case.name for name in names)]
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Synthetic documents for a schema.
+
+:func:`make_documents` derives valid values from the rules of each field
+(``type``, ``allowed``, ``min`` / ``max``, ``minlength`` / ``maxlength``,
+nested ``schema``, ``valuesrules``, ...). An invalid document breaks exactly
+one field of a valid one. :func:`nest_schema` wraps a schema into nested
+``"type": "dict"`` levels, for the nesting depth.
+"""
+
+import random
+import string
+
+_CHARS = string.ascii_lowercase
+
+
+def nest_schema(schema, depth):
+    """Wrap ``schema`` ``depth`` times into ``{"child": {"type": "dict",
+    "schema": ...}}``.
+    """
+    for _ in range(depth):
+        schema = {"child": {"type": "dict", "required": True, "schema": schema}}
+    return schema
+
+
+def _type_of(rules):
+    data_type = rules.get("type")
+    if isinstance(data_type, (list, tuple)):
+        return data_type[0]
+    return data_type
+
+
+def valid_value(rules, rng, size, samples=None):
+    """A random value which passes ``rules``.
+
+    :param size: length of the lists, sets and dicts.
+    :param samples: valid values to pick from, for the rules the generator
+        can't satisfy by itself (``regex``, custom rules).
+    """
+    if samples:
+        return rng.choice(samples)
+
+    data_type = _type_of(rules)
+    allowed = rules.get("allowed")
+    if allowed is not None:
+        if data_type == "list":
+            return [rng.choice(allowed) for _ in range(size)]
+        return rng.choice(allowed)
+
+    if data_type == "string":
+        low = max(rules.get("minlength", 1), 0 if rules.get("empty", True) else 1)
+        high = max(rules.get("maxlength", 10), low)
+        return "".join(rng.choice(_CHARS) for _ in range(rng.randint(low, high)))
+    if data_type in ("integer", "number", None):
+        low, high = rules.get("min", 0), rules.get("max", 1000)
+        for definitions in (rules.get("anyof"), rules.get("oneof")):
+            if definitions:
+                branch = rng.choice(definitions)
+                low, high = branch.get("min", low), branch.get("max", high)
+        if isinstance(low, float) or isinstance(high, float) or high - low < 2:
+            return rng.uniform(low, high)
+        return rng.randint(low, high)
+    if data_type == "float":
+        return rng.uniform(rules.get("min", 0.0), rules.get("max", 1000.0))
+    if data_type == "boolean":
+        return rng.random() < 0.5
+    if data_type == "list":
+        item_rules = rules.get("schema", {})
+        return [valid_value(item_rules, rng, size) for _ in range(size)]
+    if data_type == "set":
+        return set(rng.randint(0, 10 * size) for _ in range(size))
+    if data_type == "dict":
+        if "schema" in rules:
+            return valid_document(rules["schema"], rng, size)
+        value_rules = rules.get("valuesrules", rules.get("valueschema", {}))
+        return dict(("key%d" % i, valid_value(value_rules, rng, size))
+                    for i in range(size))
+    raise ValueError("can't generate a value for %r" % rules)
+
+
+def invalid_value(rules, rng, size):
+    """A random value which breaks at least one of ``rules``.
+    """
+    data_type = _type_of(rules)
+    if rules.get("allowed") is not None:
+        return ["not allowed"] if data_type == "list" else "not allowed"
+    if "minlength" in rules:
+        return "x" * (rules["minlength"] - 1)
+    if rules.get("empty") is False:
+        return ""
+    if "max" in rules:
+        return rules["max"] + 1
+    if "min" in rules:
+        return rules["min"] - 1
+    if data_type == "string":
+        return rng.randint(0, 100)
+    if data_type in ("list", "dict") and "schema" in rules:
+        value = valid_value(rules, rng, max(size, 1))
+        if data_type == "list":
+            value[rng.randrange(len(value))] = invalid_value(rules["schema"], rng, size)
+            return value
+        field = rng.choice(sorted(rules["schema"]))
+        value[field] = invalid_value(rules["schema"][field], rng, size)
+        return value
+    if data_type == "dict" and ("valuesrules" in rules or "valueschema" in rules):
+        value = valid_value(rules, rng, max(size, 1))
+        value["bad"] = invalid_value(rules.get("valuesrules", rules.get("valueschema")),
+                                     rng, size)
+        return value
+    if data_type in ("list", "set", "dict"):
+        return 0  # also breaks a coerce which iterates the value
+    if data_type is not None:
+        return "wrong type"
+    return None  # not nullable
+
+
+def valid_document(schema, rng, size, samples=None):
+    samples = samples or dict()
+    document = dict()
+    for field, rules in schema.items():
+        document[field] = valid_value(rules, rng, size, samples.get(field, (None,))[0])
+    for rules in schema.values():  # the values some fields depend on
+        dependencies = rules.get("dependencies")
+        if isinstance(dependencies, dict):
+            for field, values in dependencies.items():
+                document[field] = values[0] if isinstance(values, list) else values
+    return document
+
+
+def make_documents(schema, n, size=10, error_rate=0.0, samples=None, seed=0):
+    """Generate ``n`` documents, ``error_rate`` of them invalid.
+
+    :param samples: ``{field: (valid values, invalid value)}`` of the fields
+        the generator can't handle by itself.
+    """
+    rng = random.Random(seed)
+    samples = samples or dict()
+    documents = list()
+    for _ in range(n):
+        document = valid_document(schema, rng, size, samples)
+        if rng.random() < error_rate:
+            field = rng.choice(sorted(schema))
+            if field in samples:
+                document[field] = samples[field][1]
+            else:
+                document[field] = invalid_value(schema[field], rng, size)
+        documents.append(document)
+    return documents
+
+
+def make_nested_documents(case, n, size=10, depth=0, error_rate=0.0, seed=0):
+    """Generate the documents of a case nested ``depth`` levels deep, see
+    :func:`nest_schema`.
+    """
+    documents = make_documents(case.schema, n, size, error_rate, case.samples, seed)
+    for _ in range(depth):
+        documents = [{"child": document} for document in documents]
+    return documents
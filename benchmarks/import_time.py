@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+The import time of ``learn_cerberus``, for the command line tools which
+import it and mostly exit without validating anything.
+
+Every statement runs in a new interpreter, the result is the median of the
+wall times, minus the one of an empty interpreter, and the cumulative import
+time of ``python -X importtime``::
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --repeat 50 --output import_time.json
+"""
+
+from __future__ import print_function
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+from .runner import environment, percentile
+
+STATEMENTS = [
+    ("import learn_cerberus", "import learn_cerberus"),
+    ("cerberus_version()", "import learn_cerberus; learn_cerberus.cerberus_version()"),
+    ("first Validator", "import learn_cerberus; learn_cerberus.Validator({})"),
+    ("import cerberus", "import cerberus"),
+]
+
+
+def _run(statement, options=()):
+    return subprocess.run(
+        [sys.executable] + list(options) + ["-c", statement],
+        check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+
+
+def wall_time(statement, repeat):
+    """The median wall time of a new interpreter running ``statement``."""
+    timer = time.perf_counter
+    times = list()
+    for _ in range(repeat):
+        started = timer()
+        _run(statement)
+        times.append(timer() - started)
+    times.sort()
+    return percentile(times, 0.5)
+
+
+def import_time(statement):
+    """The cumulative import times of ``python -X importtime``, in us, by top
+    level package, e.g. ``cerberus`` for ``cerberus`` and ``cerberus.errors``.
+    """
+    cumulative = dict()
+    for line in _run(statement, ["-X", "importtime"]).stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        if parts[2].startswith("  "):  # imported by another module
+            continue
+        package = parts[2].strip().split(".")[0]
+        cumulative[package] = cumulative.get(package, 0) + int(parts[1])
+    return cumulative
+
+
+def loaded_modules(statement):
+    output = _run(statement + "; import sys; print('\\n'.join(sys.modules))").stdout
+    return output.split()
+
+
+def run(repeat=20):
+    baseline = wall_time("pass", repeat)
+    results = list()
+    for label, statement in STATEMENTS:
+        cumulative = import_time(statement)
+        modules = loaded_modules(statement)
+        results.append({
+            "label": label,
+            "statement": statement,
+            "wall_ms": round((wall_time(statement, repeat) - baseline) * 1e3, 2),
+            "learn_cerberus_us": cumulative.get("learn_cerberus"),
+            "cerberus_us": cumulative.get("cerberus"),
+            "cerberus_loaded": "cerberus" in modules,
+            "n_modules": len(modules),
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.import_time",
+        description="Measure the import time of learn_cerberus.",
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=20,
+                        help="interpreters per statement, default 20")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat)
+    for result in results:
+        print("%-22s %7.2f ms  learn_cerberus %6s us  cerberus %6s us  "
+              "cerberus loaded: %-5s %4d modules" % (
+                  result["label"], result["wall_ms"], result["learn_cerberus_us"],
+                  result["cerberus_us"], result["cerberus_loaded"], result["n_modules"]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(dict(environment(), repeat=args.repeat, results=results), f,
+                      indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
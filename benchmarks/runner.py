@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Run the benchmark cases and write the results as JSON.
+
+Each result is one combination of case, validator (``plain`` is the
+validator class of the case, ``compiled`` is
+:class:`~learn_cerberus.compiled.CompiledValidator`), mode (``validate``,
+``validated``, ``normalized``), container size, nesting depth and error
+rate::
+
+    {"case": "lsn01.regex", "validator": "plain", "mode": "validate",
+     "size": null, "depth": 0, "error_rate": 0.1, "n_documents": 200,
+     "docs_per_sec": 25000.0, "p50_us": 38.2, "p99_us": 61.0,
+     "peak_memory_kb": 12.3, "valid_rate": 0.9}
+
+``size`` is ``null`` for the cases without containers. The latency of every
+document is timed on its own, the peak memory is measured by a separate pass
+with ``tracemalloc``, which slows the code down.
+"""
+
+from __future__ import print_function
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import cerberus
+
+from .cases import get_cases
+from .documents import make_nested_documents, nest_schema
+
+MODES = ("validate", "validated", "normalized")
+VALIDATORS = ("plain", "compiled")
+
+
+def make_validator(case, depth, kind):
+    schema = nest_schema(case.schema, depth)
+    if kind == "compiled":
+        from learn_cerberus.compiled import CompiledValidator
+        return CompiledValidator(schema, case.validator_class)
+    return case.validator_class(schema)
+
+
+def percentile(sorted_values, q):
+    """Nearest rank percentile of a sorted list."""
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def measure(func, documents, repeat=1):
+    """Time ``func(document)`` for every document.
+
+    :return: ``(docs_per_sec, p50 sec, p99 sec, peak memory bytes)``
+    """
+    timer = time.perf_counter
+    latencies = list()
+    for _ in range(repeat):
+        for document in documents:
+            started = timer()
+            func(document)
+            latencies.append(timer() - started)
+    latencies.sort()
+    total = sum(latencies)
+
+    tracemalloc.start()
+    try:
+        for document in documents:
+            func(document)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return (len(latencies) / total if total else float("inf"),
+            percentile(latencies, 0.50), percentile(latencies, 0.99), peak)
+
+
+def run(cases, sizes=(1, 10, 100), depths=(0, 2), error_rates=(0.0, 0.1),
+        validators=VALIDATORS, modes=MODES, n_documents=200, repeat=3,
+        report=None):
+    """Run the benchmarks.
+
+    :param report: called with every result as soon as it is measured.
+    :return: the list of results.
+    """
+    results = list()
+    for case in cases:
+        for depth in depths:
+            for kind in validators:
+                v = make_validator(case, depth, kind)
+                for size in (sizes if case.sized else (None,)):
+                    for error_rate in error_rates:
+                        documents = make_nested_documents(
+                            case, n_documents, size or 1, depth, error_rate)
+                        valid_rate = sum(
+                            bool(v.validate(document)) for document in documents
+                        ) / float(len(documents))
+                        for mode in modes:
+                            func = getattr(v, mode, None)
+                            if func is None:  # no normalized() for CompiledValidator
+                                continue
+                            docs_per_sec, p50, p99, peak = measure(func, documents, repeat)
+                            result = {
+                                "case": case.name,
+                                "validator": kind,
+                                "mode": mode,
+                                "size": size,
+                                "depth": depth,
+                                "error_rate": error_rate,
+                                "n_documents": len(documents),
+                                "docs_per_sec": round(docs_per_sec, 1),
+                                "p50_us": round(p50 * 1e6, 2),
+                                "p99_us": round(p99 * 1e6, 2),
+                                "peak_memory_kb": round(peak / 1024.0, 1),
+                                "valid_rate": valid_rate,
+                            }
+                            results.append(result)
+                            if report is not None:
+                                report(result)
+    return results
+
+
+def environment():
+    return {
+        "cerberus_version": cerberus.__version__,
+        "python_version": platform.python_version(),
+        "python_implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "created_at": datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z",
+    }
+
+
+def _key(result):
+    return (result["case"], result["validator"], result["mode"], result["size"],
+            result["depth"], result["error_rate"])
+
+
+def compare(baseline, current, threshold=0.1):
+    """Find the results which got slower than the baseline.
+
+    :param baseline: the content of an older result file.
+    :param current: the content of a newer one.
+    :param threshold: tolerated drop of the docs/sec, ``0.1`` is 10%.
+
+    :return: ``[(key, baseline docs/sec, current docs/sec), ...]``
+    """
+    old = dict((_key(result), result) for result in baseline["results"])
+    regressions = list()
+    for result in current["results"]:
+        before = old.get(_key(result))
+        if before is None:
+            continue
+        if result["docs_per_sec"] < before["docs_per_sec"] * (1.0 - threshold):
+            regressions.append((_key(result), before["docs_per_sec"], result["docs_per_sec"]))
+    return regressions
+
+
+def _print_result(result):
+    print("%-36s %-8s %-10s size=%-4s depth=%s err=%.2f  %10.0f docs/s  "
+          "p50 %8.1f us  p99 %8.1f us  %8.1f KB" % (
+              result["case"], result["validator"], result["mode"], result["size"],
+              result["depth"], result["error_rate"], result["docs_per_sec"],
+              result["p50_us"], result["p99_us"], result["peak_memory_kb"]))
+
+
+def _floats(text):
+    return [float(x) for x in text.split(",") if x]
+
+
+def _ints(text):
+    return [int(x) for x in text.split(",") if x]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmark the validation rules used in the lessons.",
+    )
+    parser.add_argument("-k", "--cases", nargs="*",
+                        help="only the cases whose name contains one of these")
+    parser.add_argument("--sizes", type=_ints, default=[1, 10, 100],
+                        help="container sizes, default 1,10,100")
+    parser.add_argument("--depths", type=_ints, default=[0, 2],
+                        help="nesting depths, default 0,2")
+    parser.add_argument("--error-rates", type=_floats, default=[0.0, 0.1],
+                        help="rates of invalid documents, default 0,0.1")
+    parser.add_argument("--validators", default=",".join(VALIDATORS),
+                        help="plain and / or compiled, default both")
+    parser.add_argument("--modes", default=",".join(MODES),
+                        help="validate, validated and / or normalized, default all")
+    parser.add_argument("-n", "--documents", type=int, default=200,
+                        help="documents per benchmark, default 200")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="timed passes over the documents, default 3")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="compare with an older JSON result file")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="tolerated docs/sec drop for --compare, default 0.1")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="don't print the results")
+    args = parser.parse_args(argv)
+
+    results = run(
+        get_cases(args.cases), sizes=args.sizes, depths=args.depths,
+        error_rates=args.error_rates,
+        validators=[x for x in args.validators.split(",") if x],
+        modes=[x for x in args.modes.split(",") if x],
+        n_documents=args.documents, repeat=args.repeat,
+        report=None if args.quiet else _print_result,
+    )
+    data = dict(environment(), parameters={
+        "sizes": args.sizes, "depths": args.depths, "error_rates": args.error_rates,
+        "n_documents": args.documents, "repeat": args.repeat,
+    }, results=results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, data, args.threshold)
+        print("compared with cerberus %s: %d regressions" % (
+            baseline.get("cerberus_version"), len(regressions)))
+        for key, before, after in regressions:
+            print("  %s: %.0f -> %.0f docs/s" % (key, before, after))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,68 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+"""
+Importing the package is cheap: cerberus and the helper modules are imported
+when one of their names is used for the first time::
+
+    import learn_cerberus
+
+    learn_cerberus.cerberus_version()  # imports cerberus
+    v = learn_cerberus.cached_validator(schema)  # imports learn_cerberus.cache
+    learn_cerberus.compiled.CompiledValidator  # a module
+
+See ``python -m benchmarks.import_time``.
+"""
+
 __version__ = "0.0.1"
 __short_description__ = "Learn cerberus, a light data validation framework in Python"
 __author__ = "Sanhe Hu"
 __license__ = "MIT"
 
+#: name -> the module which defines it, imported on first use
+_LAZY_ATTRIBUTES = {
+    "Validator": "cerberus",
+    "SchemaError": "cerberus",
+    "DocumentError": "cerberus",
+    "LRUCache": "learn_cerberus.cache",
+    "cached_validator": "learn_cerberus.cache",
+    "prepared_schema": "learn_cerberus.cache",
+    "clear_caches": "learn_cerberus.cache",
+    "SchemaDiskCache": "learn_cerberus.disk_cache",
+    "schema_fingerprint": "learn_cerberus.disk_cache",
+    "CompiledValidator": "learn_cerberus.compiled",
+    "ValidatorPool": "learn_cerberus.pool",
+    "ParallelValidator": "learn_cerberus.parallel",
+    "BulkValidator": "learn_cerberus.bulk",
+    "AsyncValidator": "learn_cerberus.aio",
+    "validate_many": "learn_cerberus.batch",
+    "validate_stream": "learn_cerberus.stream",
+}
+
+_SUBMODULES = frozenset([
+    "aio", "batch", "bulk", "cache", "compiled", "dependencies", "disk_cache", "error_records",
+    "incremental", "lazy_errors", "normalization", "ofrules", "parallel", "pool",
+    "profiling", "rows", "stream", "type_registry", "vectorized",
+])
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(__import__(_LAZY_ATTRIBUTES[name], fromlist=[name]), name)
+    elif name in _SUBMODULES:
+        value = __import__(__name__ + "." + name, fromlist=[name])
+    else:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    globals()[name] = value  # the next lookups don't call __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES) | _SUBMODULES)
 
-import cerberus
 
-print("We are using cerberus %s" % cerberus.__version__)
\ No newline at end of file
+def cerberus_version():
+    """The version of the cerberus in use, e.g. ``"1.3.8"``. Imports it.
+    """
+    import cerberus
+    return cerberus.__version__
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Validate documents from asyncio code without blocking the event loop.
+
+Schemas like the one of ``non_repeat_list`` (``coerce``) or
+``function_based_custom_validators`` (``validator``) run arbitrary callables,
+which may take long. :class:`AsyncValidator` looks at the schema once:
+
+- a cheap schema, only built-in rules and not deeper than ``max_depth``, is
+  validated inline on the event loop with a
+  :class:`~learn_cerberus.compiled.CompiledValidator`.
+- a schema with callables, or a deeply nested one, is validated in an
+  executor. A thread executor borrows validators from a
+  :class:`~learn_cerberus.pool.ValidatorPool`, a ``ProcessPoolExecutor``
+  gets the pickled validator setup, see :mod:`learn_cerberus.parallel`. At
+  most ``max_concurrency`` documents are in the executor at once.
+
+Usage::
+
+    av = AsyncValidator(schema)
+    ok, document, errors = await av.validate(document)
+    async for ok, document, errors in av.validate_stream(documents):
+        ...
+"""
+
+from __future__ import print_function
+import asyncio
+import pickle
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from cerberus import Validator
+from cerberus.platform import Mapping
+
+from .compiled import CompiledValidator
+from .parallel import _dumps_setup
+from .pool import ValidatorPool
+
+#: validators of the current worker process, by pickled setup
+_process_validators = dict()
+
+
+def _validate_in_process(setup, document):
+    v = _process_validators.get(setup)
+    if v is None:
+        validator_class, schema, kwargs = pickle.loads(setup)
+        v = _process_validators[setup] = CompiledValidator(
+            schema, validator_class, **kwargs)
+    ok = v.validate(document)
+    return ok, v.document, v.errors
+
+
+def schema_depth(schema):
+    """Nesting depth of a schema, 1 for a flat one.
+    """
+    depth = 1
+    for rules in schema.values():
+        if not isinstance(rules, Mapping):
+            continue
+        for rule in ("schema", "valuesrules", "keysrules", "valueschema"):
+            sub_schema = rules.get(rule)
+            if not isinstance(sub_schema, Mapping):
+                continue
+            if all(isinstance(value, Mapping) for value in sub_schema.values()):
+                depth = max(depth, 1 + schema_depth(sub_schema))
+            else:  # rules of the items of a list
+                depth = max(depth, 1 + schema_depth({None: sub_schema}))
+    return depth
+
+
+def has_callables(obj):
+    """``True`` if a schema holds a callable anywhere, e.g. a ``coerce`` or a
+    ``validator`` function.
+    """
+    if isinstance(obj, Mapping):
+        return any(has_callables(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(has_callables(value) for value in obj)
+    return callable(obj)
+
+
+class AsyncValidator(object):
+    """Validate documents inline or in an executor, depending on the schema.
+
+    :param schema: the validation schema.
+    :param validator_class: ``Validator`` or a subclass of it.
+    :param executor: a ``concurrent.futures`` executor for the heavy schemas,
+        default is the default executor of the event loop.
+    :param max_concurrency: max number of documents validated in the executor
+        at the same time.
+    :param max_depth: schemas nested deeper than this are validated in the
+        executor.
+    :param kwargs: the options of ``validator_class``.
+    """
+
+    def __init__(self, schema, validator_class=Validator, executor=None,
+                 max_concurrency=16, max_depth=3, **kwargs):
+        self.schema = schema
+        self.validator_class = validator_class
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self.kwargs = kwargs
+        self.offload = has_callables(schema) or schema_depth(schema) > max_depth
+        self._semaphore = None
+        if not self.offload:
+            self._inline = CompiledValidator(schema, validator_class, **kwargs)
+        elif isinstance(executor, ProcessPoolExecutor):
+            self._setup = _dumps_setup(validator_class, schema, kwargs)
+            validator_class(schema, **kwargs)
+        else:
+            self._pool = ValidatorPool(validator_class, max_size=max_concurrency)
+            with self._pool.acquire(schema, **kwargs):  # check the schema
+                pass
+
+    def _validate_pooled(self, document):
+        with self._pool.acquire(self.schema, **self.kwargs) as v:
+            ok = v.validate(document)
+            return ok, v.document, v.errors
+
+    async def validate(self, document):
+        """Validate one document.
+
+        :return: ``(ok, normalized_document, errors)``
+        """
+        if not self.offload:
+            v = self._inline
+            ok = v.validate(document)
+            return ok, v.document, v.errors
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            if isinstance(self.executor, ProcessPoolExecutor):
+                return await loop.run_in_executor(
+                    self.executor, _validate_in_process, self._setup, document)
+            return await loop.run_in_executor(
+                self.executor, self._validate_pooled, document)
+
+    async def validate_stream(self, documents):
+        """Validate an iterable or an async iterable of documents, yield
+        ``(ok, normalized_document, errors)`` in the order of the input.
+
+        At most ``max_concurrency`` documents are pending at once.
+        """
+        pending = deque()
+        if hasattr(documents, "__aiter__"):
+            async for document in documents:
+                pending.append(asyncio.ensure_future(self.validate(document)))
+                if len(pending) >= self.max_concurrency:
+                    yield await pending.popleft()
+        else:
+            for document in documents:
+                pending.append(asyncio.ensure_future(self.validate(document)))
+                if len(pending) >= self.max_concurrency:
+                    yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+
+
+def non_repeat_list(value):
+    seen = set()
+    return [x for x in value if not (x in seen or seen.add(x))]
+
+
+def example_async_validator():
+    async def main():
+        av = AsyncValidator({"name": {"type": "string"}})
+        assert av.offload is False
+        assert await av.validate({"name": 1}) == (
+            False, {"name": 1}, {"name": ["must be of string type"]})
+
+        av = AsyncValidator({"tag": {"type": "list", "coerce": non_repeat_list}})
+        assert av.offload is True
+        ok, document, errors = await av.validate({"tag": ["drama", "crime", "drama"]})
+        assert ok and document == {"tag": ["drama", "crime"]}
+
+        async def documents():
+            for i in range(100):
+                yield {"tag": [i, i, "x"]}
+
+        results = [document async for _, document, _ in av.validate_stream(documents())]
+        assert results == [{"tag": [i, "x"]} for i in range(100)]
+
+        with ProcessPoolExecutor(2) as executor:
+            av = AsyncValidator({"tag": {"type": "list", "coerce": non_repeat_list}},
+                                executor=executor)
+            results = [ok async for ok, _, _ in av.validate_stream(
+                [{"tag": [1, 1]}, {"tag": 1}])]
+            assert results == [True, False]
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    """
+    """
+    example_async_validator()
@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Validate a batch of flat documents column by column.
+
+``validated_method_example`` in ``lsn01_quickstart.py`` calls
+``v.validated(y)`` once per document. :func:`validate_many` transposes the
+batch into one column per field and checks the simple rules (``type``,
+``min``/``max``, ``allowed``, ``minlength``/``maxlength``, ``nullable``,
+``required`` and unknown fields) a whole column at a time, with NumPy for the
+numeric comparisons when it is installed.
+
+The column checks only decide which rows are certainly valid. Every other row
+is validated again by the validator itself, so the result and the errors are
+exactly the ones of ``Validator.validate``. A schema using any other rule, for
+example a ``coerce`` or ``validator`` callable, is validated row by row.
+"""
+
+from __future__ import print_function
+
+from cerberus.platform import Iterable, Mapping
+
+from .compiled import NotCompilable, check_compilable, _compile_type
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+COLUMNAR_RULES = frozenset([
+    "type", "min", "max", "allowed", "minlength", "maxlength",
+    "nullable", "required", "meta",
+])
+
+#: columns shorter than this are compared in pure python, converting them to
+#: an array costs more than it saves
+NUMPY_MIN_ROWS = 64
+
+_MISSING = object()
+
+
+def _plain_validator(validator):
+    """The ``cerberus.Validator`` behind a validator or a
+    :class:`~learn_cerberus.compiled.CompiledValidator`.
+    """
+    return getattr(validator, "validator", validator)
+
+
+def _columnar_schema(validator):
+    """Return ``[(field, rules), ...]`` if every field of the schema can be
+    checked by columns, otherwise ``None``.
+    """
+    plain = _plain_validator(validator)
+    try:
+        check_compilable(plain)
+    except NotCompilable:
+        return None
+    if not isinstance(plain.allow_unknown, bool):
+        return None
+
+    fields = list()
+    for field, rules in plain.schema.items():
+        rules = plain._resolve_rules_set(rules)
+        if set(rules) - COLUMNAR_RULES:
+            return None
+        if rules.get("type"):
+            try:
+                _compile_type(rules["type"], plain.types_mapping)
+            except NotCompilable:
+                return None
+        fields.append((field, rules))
+    return fields
+
+
+def _numeric_array(values):
+    """Return ``values`` as an int64 or float64 array, or ``None`` if that
+    could change the result of a comparison.
+    """
+    if np is None or len(values) < NUMPY_MIN_ROWS:
+        return None
+    value_types = set(map(type, values))
+    try:
+        if value_types == {int}:
+            return np.array(values, dtype=np.int64)
+        if value_types == {float}:
+            return np.array(values, dtype=np.float64)
+    except OverflowError:
+        pass
+    return None
+
+
+def _compare_failures(rows, values, array, compare, bound):
+    """Rows whose value compares ``True`` against ``bound``, the way
+    ``_validate_min`` / ``_validate_max`` treat a ``TypeError`` as a pass.
+    """
+    is_number = isinstance(bound, (int, float)) and not isinstance(bound, bool)
+    if array is not None and is_number:
+        try:
+            return [rows[i] for i in np.flatnonzero(compare(array, bound))]
+        except (OverflowError, TypeError):
+            pass
+
+    failures = list()
+    for row, value in zip(rows, values):
+        try:
+            if compare(value, bound):
+                failures.append(row)
+        except TypeError:
+            pass
+    return failures
+
+
+def _allowed_failures(rows, values, allowed_values):
+    try:
+        allowed_values = frozenset(allowed_values)
+    except TypeError:
+        pass
+
+    def is_allowed(value):
+        if isinstance(value, Iterable) and not isinstance(value, str):
+            return all(x in allowed_values for x in value)
+        return value in allowed_values
+
+    failures = list()
+    for row, value in zip(rows, values):
+        try:
+            if not is_allowed(value):
+                failures.append(row)
+        except TypeError:  # unhashable value, let the validator decide
+            failures.append(row)
+    return failures
+
+
+def _length_failures(rows, values, min_length, max_length):
+    try:
+        lengths = list(map(len, values))
+    except TypeError:
+        lengths = [len(value) if isinstance(value, Iterable) else None
+                   for value in values]
+
+    if np is not None and len(lengths) >= NUMPY_MIN_ROWS and None not in lengths:
+        array = np.array(lengths)
+        bad = np.zeros(len(lengths), dtype=bool)
+        if min_length is not None:
+            bad |= array < min_length
+        if max_length is not None:
+            bad |= array > max_length
+        return [rows[i] for i in np.flatnonzero(bad)]
+
+    failures = list()
+    for row, length in zip(rows, lengths):
+        if length is None:
+            continue
+        if ((min_length is not None and length < min_length) or
+                (max_length is not None and length > max_length)):
+            failures.append(row)
+    return failures
+
+
+def _column_failures(column, rules, types_mapping):
+    """Rows of one column which may break one of its rules.
+    """
+    failures = list()
+    rows = list()
+    values = list()
+    nullable = rules.get("nullable", False)
+    for row, value in enumerate(column):
+        if value is _MISSING:
+            continue
+        if value is None:
+            if not nullable:
+                failures.append(row)
+            continue
+        rows.append(row)
+        values.append(value)
+    if not values:
+        return failures
+
+    if rules.get("type"):
+        is_type = _compile_type(rules["type"], types_mapping)
+        failures.extend(row for row, ok in zip(rows, map(is_type, values))
+                        if not ok)
+
+    if "min" in rules or "max" in rules:
+        array = _numeric_array(values)
+        if "min" in rules:
+            failures.extend(_compare_failures(
+                rows, values, array, lambda a, b: a < b, rules["min"]))
+        if "max" in rules:
+            failures.extend(_compare_failures(
+                rows, values, array, lambda a, b: a > b, rules["max"]))
+
+    if "allowed" in rules:
+        failures.extend(_allowed_failures(rows, values, rules["allowed"]))
+
+    if "minlength" in rules or "maxlength" in rules:
+        failures.extend(_length_failures(
+            rows, values, rules.get("minlength"), rules.get("maxlength")))
+
+    return failures
+
+
+def _columnar_failures(validator, fields, documents):
+    """Indices of the documents which may be invalid.
+    """
+    plain = _plain_validator(validator)
+    failures = set()
+    mappings = list()
+    for row, document in enumerate(documents):
+        if isinstance(document, Mapping):
+            mappings.append(document)
+        else:  # let the validator raise the DocumentError
+            failures.add(row)
+            mappings.append({})
+
+    known = frozenset(field for field, _ in fields)
+    required = frozenset(
+        field for field, rules in fields
+        if rules.get("required", plain.require_all) is True
+    )
+    for row, document in enumerate(mappings):
+        keys = document.keys()
+        if (not plain.allow_unknown and keys - known) or (required - keys):
+            failures.add(row)
+
+    for field, rules in fields:
+        column = [document.get(field, _MISSING) for document in mappings]
+        failures.update(_column_failures(column, rules, plain.types_mapping))
+    return failures
+
+
+def validate_many(validator, documents):
+    """Validate a batch of documents.
+
+    :param validator: a ``cerberus.Validator`` (or subclass) instance, or a
+        :class:`~learn_cerberus.compiled.CompiledValidator`. Rows are
+        validated by its ``validate`` method when the columns can't prove
+        them valid.
+    :param documents: an iterable of documents.
+
+    :return: ``(valid_mask, errors)``, a list of ``bool`` with one entry per
+        document, and a dict mapping the index of every invalid document to
+        its ``errors``.
+    """
+    documents = list(documents)
+    fields = _columnar_schema(validator)
+    if fields is None:
+        suspects = range(len(documents))
+    else:
+        suspects = sorted(_columnar_failures(validator, fields, documents))
+
+    valid_mask = [True] * len(documents)
+    row_errors = dict()
+    for row in suspects:
+        if not validator.validate(documents[row]):
+            valid_mask[row] = False
+            row_errors[row] = validator.errors
+    return valid_mask, row_errors
+
+
+def example_validate_many():
+    import random
+    import timeit
+    from cerberus import Validator
+
+    schema = {
+        "value": {"type": "number", "min": 0, "max": 100},
+        "label": {"type": "string", "allowed": ["a", "b", "c"]},
+        "code": {"type": "string", "minlength": 2, "maxlength": 4},
+    }
+    v = Validator(schema)
+
+    documents = [{"value": 1, "label": "a", "code": "ab"},
+                 {"value": [1, 2, 3], "label": "d", "code": "a"},
+                 {"value": 2, "label": "b", "code": "abc", "memo": None},
+                 {"value": 3}]
+    valid_mask, row_errors = validate_many(v, documents)
+    assert valid_mask == [True, False, False, True]
+    assert row_errors[1] == {
+        "value": ["must be of number type"],
+        "label": ["unallowed value d"],
+        "code": ["min length is 2"],
+    }
+    assert row_errors[2] == {"memo": ["unknown field"]}
+
+    documents = [
+        {"value": random.randint(-1, 100), "label": random.choice("abc"),
+         "code": "x" * random.randint(2, 4)}
+        for _ in range(10000)
+    ]
+    expected = [v.validate(document) for document in documents]
+    assert validate_many(v, documents)[0] == expected
+
+    t_loop = timeit.timeit(
+        lambda: [v.validate(document) for document in documents], number=1)
+    t_batch = timeit.timeit(lambda: validate_many(v, documents), number=1)
+    print("per document: %.3f sec, validate_many: %.3f sec" % (t_loop, t_batch))
+
+
+if __name__ == "__main__":
+    """
+    """
+    example_validate_many()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Find the invalid records of a large NDJSON file, with a pool of worker
+processes reading a memory map of it.
+
+``validated_method_example`` in ``lsn01_quickstart.py`` returns the whole
+normalized documents, and :class:`learn_cerberus.parallel.ParallelValidator`
+pickles every document to a worker and back. When only the invalid records
+matter, e.g. for an audit, most of that is copies. Here:
+
+- the file is cut into chunks of about ``chunk_bytes``, at line ends found in
+  a memory map of the file, nothing is read or copied by the main process.
+- every worker process maps the file itself, and is only sent
+  ``(start, end)`` of a chunk. It finds the records in the map, parses them
+  and checks them with ``CompiledValidator.is_valid``, errors are only built
+  for the invalid ones.
+- only the invalid records come back, as :class:`BadRecord`: the byte offset
+  of the line in the file, the value of ``id_field`` and the errors.
+
+Usage::
+
+    with BulkValidator(schema, id_field="id") as bv:
+        for bad in bv.invalid_records("data.ndjson"):
+            print(bad.offset, bad.id, bad.errors)
+        print(bv.n_records)
+
+Command line usage::
+
+    python -m learn_cerberus.bulk schema.json data.ndjson --id-field id \\
+        --output bad.ndjson
+
+Every line of the output is ``{"offset": 1024, "id": 7, "errors": {...}}``,
+``f.seek(offset)`` then reads the record. See ``python -m
+benchmarks.bulk_ndjson`` for the comparison with the loop of
+``validated_method_example``.
+"""
+
+from __future__ import print_function
+import argparse
+import io
+import json
+import mmap
+import os
+import pickle
+import sys
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from cerberus import Validator
+
+from .compiled import CompiledValidator
+from .parallel import _dumps_setup
+from .stream import load_schema
+
+#: an invalid record: the offset of its line in the file, its id and errors
+BadRecord = namedtuple("BadRecord", "offset id errors")
+
+#: the default size of the chunks of a file, in bytes
+CHUNK_BYTES = 4 * 1024 * 1024
+
+#: the validator of the current worker process
+_worker_validator = None
+
+
+def map_file(path):
+    """A read only memory map of a file, ``None`` for an empty file.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def chunk_ranges(buffer, chunk_bytes=CHUNK_BYTES):
+    """Yield the ``(start, end)`` of chunks of about ``chunk_bytes`` which end
+    at the end of a line.
+    """
+    size = len(buffer)
+    start = 0
+    while start < size:
+        end = start + chunk_bytes
+        if end >= size:
+            end = size
+        else:
+            newline = buffer.find(b"\n", end - 1)
+            end = size if newline == -1 else newline + 1
+        yield start, end
+        start = end
+
+
+def record_ranges(buffer, start=0, end=None):
+    """Yield the ``(start, end)`` of the lines from ``start`` to ``end``,
+    without the line end. Only the line ends are searched, nothing is copied.
+    """
+    if end is None:
+        end = len(buffer)
+    find = buffer.find
+    while start < end:
+        newline = find(b"\n", start, end)
+        if newline == -1:
+            newline = end
+        yield start, newline
+        start = newline + 1
+
+
+def scan(validator, buffer, start=0, end=None, id_field=None):
+    """Validate the NDJSON records from ``start`` to ``end`` of ``buffer``.
+    Blank lines are skipped.
+
+    :param validator: a :class:`~learn_cerberus.compiled.CompiledValidator`.
+
+    :return: ``(n_records, [BadRecord, ...])``
+    """
+    loads = json.loads
+    is_valid = validator.is_valid
+    n_records = 0
+    bad_records = list()
+    for line_start, line_end in record_ranges(buffer, start, end):
+        line = buffer[line_start:line_end]
+        if not line or line.isspace():
+            continue
+        n_records += 1
+        try:
+            record = loads(line)
+        except ValueError as e:
+            bad_records.append(BadRecord(line_start, None, ["invalid JSON: %s" % e]))
+            continue
+        try:
+            if is_valid(record):
+                continue
+            validator.validate(record)
+            errors = validator.errors
+        except Exception as e:  # not a mapping
+            errors = [str(e)]
+        record_id = record.get(id_field) if id_field is not None and \
+            isinstance(record, dict) else None
+        bad_records.append(BadRecord(line_start, record_id, errors))
+    return n_records, bad_records
+
+
+def _init_worker(setup):
+    global _worker_validator
+    validator_class, schema, kwargs = pickle.loads(setup)
+    _worker_validator = CompiledValidator(schema, validator_class, **kwargs)
+
+
+def _scan_chunk(path, start, end, id_field):
+    buffer = map_file(path)
+    try:
+        return scan(_worker_validator, buffer, start, end, id_field)
+    finally:
+        buffer.close()
+
+
+class BulkValidator(object):
+    """Find the invalid records of NDJSON files with a
+    ``ProcessPoolExecutor``.
+
+    :param schema: the validation schema.
+    :param validator_class: ``Validator`` or a subclass of it.
+    :param processes: number of worker processes, default is the number of
+        CPUs.
+    :param chunk_bytes: the size of the chunks a worker validates at once.
+    :param id_field: the field of a record reported as its id.
+    :param kwargs: the options of ``validator_class``.
+
+    :raises learn_cerberus.parallel.NotPicklableError: if the validator
+        class, the schema or the options can't be pickled.
+    """
+
+    def __init__(self, schema, validator_class=Validator, processes=None,
+                 chunk_bytes=CHUNK_BYTES, id_field=None, **kwargs):
+        self._setup = _dumps_setup(validator_class, schema, kwargs)
+        # make sure the schema is valid before starting any process
+        validator_class(schema, **kwargs)
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_bytes = chunk_bytes
+        self.id_field = id_field
+        self.n_records = 0
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                initializer=_init_worker,
+                initargs=(self._setup,),
+            )
+        return self._executor
+
+    def invalid_records(self, path):
+        """Validate all the records of a NDJSON file lazily.
+
+        At most two chunks per worker are in flight. ``n_records`` is the
+        number of records read so far.
+
+        :return: a generator of :class:`BadRecord`, in the order of the file.
+        """
+        self.n_records = 0
+        buffer = map_file(path)
+        if buffer is None:
+            return
+        executor = self._get_executor()
+        max_pending = self.processes * 2
+        pending = deque()
+        try:
+            for start, end in chunk_ranges(buffer, self.chunk_bytes):
+                pending.append(executor.submit(_scan_chunk, path, start, end, self.id_field))
+                if len(pending) >= max_pending:
+                    for bad in self._collect(pending.popleft()):
+                        yield bad
+        finally:
+            buffer.close()
+        while pending:
+            for bad in self._collect(pending.popleft()):
+                yield bad
+
+    def _collect(self, future):
+        n_records, bad_records = future.result()
+        self.n_records += n_records
+        return bad_records
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m learn_cerberus.bulk",
+        description="Find the invalid records of a NDJSON file.",
+    )
+    parser.add_argument("schema", help="JSON or YAML schema file")
+    parser.add_argument("input", help="NDJSON file")
+    parser.add_argument("-o", "--output", default="-",
+                        help="file for the invalid records, default is stdout")
+    parser.add_argument("--id-field", help="field reported as the id of a record")
+    parser.add_argument("-p", "--processes", type=int, default=None,
+                        help="worker processes, default is the number of CPUs")
+    parser.add_argument("--chunk-bytes", type=int, default=CHUNK_BYTES,
+                        help="bytes validated by a worker at once")
+    parser.add_argument("--allow-unknown", action="store_true",
+                        help="allow fields which are not in the schema")
+    args = parser.parse_args(argv)
+
+    output = sys.stdout if args.output == "-" else io.open(args.output, "w", encoding="utf-8")
+    n_invalid = 0
+    try:
+        with BulkValidator(load_schema(args.schema), processes=args.processes,
+                           chunk_bytes=args.chunk_bytes, id_field=args.id_field,
+                           allow_unknown=args.allow_unknown) as bv:
+            for bad in bv.invalid_records(args.input):
+                n_invalid += 1
+                output.write(json.dumps(bad._asdict(), default=str))
+                output.write("\n")
+            print("%d records, %d invalid" % (bv.n_records, n_invalid), file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 1 if n_invalid else 0
+
+
+def example_bulk_validator():
+    import shutil
+    import tempfile
+
+    directory = tempfile.mkdtemp()
+    try:
+        # validated_method_example of lsn01_quickstart.py
+        path = os.path.join(directory, "data.ndjson")
+        with open(path, "wb") as f:
+            f.write(b'{"id": 1, "value": 1}\n{"id": 2, "value": [1, 2, 3]}\n\n'
+                    b'{"id": 3, "value": 2}\nnot json\n[1]\n{"id": 4, "value": "a"}')
+        schema = {"id": {"type": "integer"}, "value": {"type": "number"}}
+        with BulkValidator(schema, processes=2, chunk_bytes=16, id_field="id") as bv:
+            bad_records = list(bv.invalid_records(path))
+            assert bv.n_records == 6
+        assert [bad.id for bad in bad_records] == [2, None, None, 4]
+        assert bad_records[0] == BadRecord(22, 2, {"value": ["must be of number type"]})
+        with open(path, "rb") as f:
+            f.seek(bad_records[1].offset)
+            assert f.readline() == b"not json\n"
+
+        buffer = map_file(path)
+        assert scan(CompiledValidator(schema), buffer, id_field="id") == (6, bad_records)
+        buffer.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Process-wide caches for compiled regular expressions and prepared schemas.
+
+Creating ``Validator(schema)`` expands and validates the schema every time,
+and the ``regex`` rule compiles its pattern on each call. With one validator
+per request that is paid on every request. The caches here are shared by the
+whole process:
+
+- :data:`regex_cache`: ``re.compile`` results, see :func:`compile_regex`.
+- :data:`schema_cache`: prepared (expanded and checked) schemas, validators
+  created by :func:`cached_validator` from equal schemas share one of them
+  instead of preparing it again.
+- :data:`compiled_cache`: the closures of
+  :class:`~learn_cerberus.compiled.CompiledValidator`, shared the same way.
+
+The keys of the prepared schemas and of the closures include the definitions
+of the registry entries the schema refers to, see :func:`registry_key`, so
+adding a rules set again under the same name isn't served from the cache.
+
+Each cache has a configurable size, hit / miss counters and can be
+invalidated explicitly. Don't modify the schema of a validator obtained from
+:func:`cached_validator`, it is shared with the other ones.
+"""
+
+from __future__ import print_function
+import re
+import threading
+from collections import OrderedDict
+
+import cerberus
+from cerberus import Validator
+from cerberus.platform import Mapping
+
+
+class LRUCache(object):
+    """A thread-safe least recently used cache.
+
+    :param maxsize: max number of entries, the least recently used one is
+        dropped when it is exceeded.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key, factory):
+        """Return the value cached for ``key``, or cache and return
+        ``factory()``.
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return value
+
+        value = factory()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def invalidate(self, key=None):
+        """Drop one entry, or all of them when ``key`` is ``None``.
+        """
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def resize(self, maxsize):
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+    @property
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+regex_cache = LRUCache(maxsize=512)
+schema_cache = LRUCache(maxsize=256)
+compiled_cache = LRUCache(maxsize=256)
+
+
+class _Identity(object):
+    """A key of an unhashable object, equal only to the keys of the same
+    object. It keeps the object alive, so its id can't be reused while the
+    key is cached.
+    """
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __hash__(self):
+        return id(self.obj)
+
+    def __eq__(self, other):
+        return isinstance(other, _Identity) and other.obj is self.obj
+
+    def __ne__(self, other):
+        return not self == other
+
+
+def schema_key(schema):
+    """A hashable key which is equal for equal schemas.
+
+    Mappings compare regardless of their order, sequences keep it. Scalars are
+    paired with their type, so ``{"min": 1}`` and ``{"min": True}`` (which
+    produce different error messages) get different keys. Functions and
+    classes, e.g. ``coerce`` callables, and the other unhashable objects
+    compare by identity.
+    """
+    if isinstance(schema, Mapping):
+        return (dict, frozenset((key, schema_key(value))
+                                for key, value in schema.items()))
+    if isinstance(schema, (list, tuple)):
+        return (list, tuple(schema_key(value) for value in schema))
+    if isinstance(schema, (set, frozenset)):
+        return (set, frozenset(schema_key(value) for value in schema))
+    try:
+        hash(schema)
+    except TypeError:
+        return (type(schema), _Identity(schema))
+    return (type(schema), schema)
+
+
+def registry_entries(schema, rules_set_registry=None, schema_registry=None):
+    """The definitions of the registry entries ``schema`` may refer to, and
+    of the ones they refer to, ``{(registry, name): definition}``. Every
+    string of the schema which is a registered name counts.
+
+    :param rules_set_registry: ``cerberus.rules_set_registry`` by default.
+    :param schema_registry: ``cerberus.schema_registry`` by default.
+    """
+    registries = (
+        ("rules_set", cerberus.rules_set_registry if rules_set_registry is None
+         else rules_set_registry),
+        ("schema", cerberus.schema_registry if schema_registry is None
+         else schema_registry),
+    )
+    entries = dict()
+    stack = [schema]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, str):
+            for kind, registry in registries:
+                definition = registry.get(obj)
+                if definition is not None and (kind, obj) not in entries:
+                    entries[(kind, obj)] = definition
+                    stack.append(definition)
+        elif isinstance(obj, Mapping):
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+    return entries
+
+
+def registry_key(schema, rules_set_registry=None, schema_registry=None):
+    """A hashable key of :func:`registry_entries`, to be added to the key of
+    anything built from ``schema``.
+    """
+    return schema_key(registry_entries(schema, rules_set_registry, schema_registry))
+
+
+def compile_regex(pattern, flags=0):
+    """Cached ``re.compile``.
+    """
+    return regex_cache.get_or_create((pattern, flags),
+                                     lambda: re.compile(pattern, flags))
+
+
+def prepared_schema(schema, validator_class=Validator, key=None):
+    """The expanded and checked schema of ``validator_class(schema)``, shared
+    by all equal schemas.
+
+    :param key: ``schema_key(schema)`` if it is already known.
+
+    :raises cerberus.SchemaError: if the schema is invalid, nothing is cached
+        then.
+    """
+    if key is None:
+        key = schema_key(schema)
+    return schema_cache.get_or_create(
+        (validator_class, key, registry_key(schema)),
+        lambda: validator_class(schema).schema,
+    )
+
+
+def cached_validator(schema, validator_class=Validator, **kwargs):
+    """Create ``validator_class(schema, **kwargs)`` with a shared prepared
+    schema.
+    """
+    return validator_class(prepared_schema(schema, validator_class), **kwargs)
+
+
+def cache_info():
+    """Stats of all the caches.
+    """
+    return {
+        "regex": regex_cache.stats,
+        "schema": schema_cache.stats,
+        "compiled": compiled_cache.stats,
+    }
+
+
+def clear_caches():
+    """Invalidate all the caches.
+    """
+    regex_cache.invalidate()
+    schema_cache.invalidate()
+    compiled_cache.invalidate()
+
+
+def example_cached_validator():
+    import timeit
+
+    clear_caches()
+    email_regex = "[a-z0-9.]+@[a-z0-9.]+"
+
+    def make_schema():
+        return {"email": {"type": "string", "regex": email_regex}}
+
+    v1 = cached_validator(make_schema())
+    v2 = cached_validator(make_schema())
+    assert v1 is not v2
+    assert v1.schema is v2.schema
+    assert cache_info()["schema"]["hits"] == 1
+    assert v2.validate({"email": "example@gmail.com"}) is True
+    assert v1.validate({"email": "123456"}) is False
+
+    assert compile_regex(email_regex) is compile_regex(email_regex)
+
+    # a rules set added again under the same name
+    cerberus.rules_set_registry.add("example_email", {"type": "string"})
+    try:
+        assert cached_validator({"email": "example_email"}).validate({"email": "a"})
+        cerberus.rules_set_registry.add("example_email", {"type": "integer"})
+        assert not cached_validator({"email": "example_email"}).validate({"email": "a"})
+    finally:
+        cerberus.rules_set_registry.remove("example_email")
+
+    n = 200
+    t_plain = timeit.timeit(lambda: Validator(make_schema()), number=n)
+    t_cached = timeit.timeit(lambda: cached_validator(make_schema()), number=n)
+    print("Validator(): %.1f us, cached_validator(): %.1f us" % (
+        t_plain / n * 1e6, t_cached / n * 1e6))
+    print(cache_info())
+
+
+if __name__ == "__main__":
+    """
+    """
+    example_cached_validator()
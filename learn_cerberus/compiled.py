@@ -0,0 +1,873 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compile a cerberus schema once into specialized closures.
+
+``cerberus.Validator`` looks up the handler of every rule of every field again
+on each ``validate()`` call. :class:`CompiledValidator` resolves the rules of
+a schema a single time: each field becomes one closure which only performs the
+checks its rules ask for, and the nested ``"type": "dict"`` schemas are
+flattened into one list of levels, see :func:`compile_mapping`. The result,
+``document`` and ``errors`` are the same as the ones of
+``Validator.validate``, errors are made of the same
+``cerberus.errors.ValidationError`` objects and formatted by the validator's
+own error handler.
+
+Compiled rules: ``type``, ``min``, ``max``, ``minlength``, ``maxlength``,
+``regex``, ``allowed``, ``empty``, ``nullable``, ``required``,
+``dependencies`` (see :mod:`learn_cerberus.dependencies`) and ``schema`` for
+``"type": "dict"`` fields. A schema using any other rule is handed to a
+plain validator instance, so the result is always the same.
+
+Compiled validators of equal schemas share their prepared schema and their
+closures, see :mod:`learn_cerberus.cache`.
+
+When only valid / invalid matters, :meth:`CompiledValidator.is_valid` (or
+``validate(document, fail_fast=True)``) stops at the first broken rule and
+builds no error at all. It checks unknown and required fields first, then the
+cheap rules of every field, then the costly ones, see :data:`RULE_COSTS`.
+
+ref: http://docs.python-cerberus.org/en/stable/validation-rules.html
+"""
+
+from __future__ import print_function
+from collections import namedtuple
+from copy import copy
+
+from cerberus import Validator, DocumentError, errors
+from cerberus.errors import ValidationError
+from cerberus.platform import Iterable, Mapping, Sized
+
+from .cache import compiled_cache, compile_regex, prepared_schema, registry_key, schema_key
+from .dependencies import PrecomputedDependencies, dependency_graph_of, warn_cycles
+
+COMPILED_RULES = frozenset([
+    "type", "min", "max", "minlength", "maxlength", "regex", "allowed",
+    "empty", "nullable", "required", "schema", "allow_unknown", "require_all",
+    "meta", "dependencies",
+])
+
+#: rules skipped for empty values when ``empty`` is defined, see
+#: ``Validator._validate_empty``
+_DROPPED_BY_EMPTY = frozenset(["allowed", "minlength", "maxlength", "regex"])
+
+#: validator options the compiled code knows how to honour, keys of
+#: ``Validator._config`` starting with an underscore are processing state
+_COMPILED_OPTIONS = frozenset([
+    "schema", "allow_unknown", "require_all", "schema_registry",
+    "rules_set_registry",
+])
+
+
+class NotCompilable(Exception):
+    """Raised when a schema uses a rule or option the compiler can't handle.
+    """
+
+
+def _compile_type(data_type, types_mapping):
+    """Return ``is_type(value)`` for a single type name or a list of them.
+    """
+    type_names = (data_type,) if isinstance(data_type, str) else data_type
+    definitions = list()
+    for type_name in type_names:
+        type_definition = types_mapping.get(type_name)
+        if type_definition is None:  # custom _validate_type_<name> method
+            raise NotCompilable("type %r" % type_name)
+        definitions.append((type_definition.included_types,
+                            type_definition.excluded_types))
+
+    if len(definitions) == 1:
+        included, excluded = definitions[0]
+        if not excluded:
+            return lambda value: isinstance(value, included)
+        return lambda value: (isinstance(value, included) and
+                              not isinstance(value, excluded))
+
+    def is_type(value):
+        for included, excluded in definitions:
+            if isinstance(value, included) and not isinstance(value, excluded):
+                return True
+        return False
+
+    return is_type
+
+
+def _compile_field(field, rules, validator, document_path, schema_path,
+                   allow_unknown, require_all, levels):
+    """Compile the rules of one field, a nested schema is compiled as one more
+    level of ``levels``, see :func:`_compile_level`.
+
+    :return: ``(check, is_valid_cheap, is_valid_costly, child)``
+
+        - ``check(value, errs, update, dependency_failures, nested)`` appends
+          the errors of the value to ``errs`` as ``ValidationError``, exactly
+          as ``Validator._error`` would have created them.
+          ``dependency_failures`` is ``{field: [(error definition, info)]}``
+          from the dependency graph of the mapping, ``nested`` the errors of
+          the nested mappings by level.
+        - ``is_valid_cheap(value)`` tells if the value passes the cheap rules,
+          without building any error.
+        - ``is_valid_costly(value, update)`` does the same for the costly
+          rules, a value is only given to it if it passed the cheap ones.
+          ``None`` if the field has no costly rule.
+        - ``child``: the level of the nested schema, ``None`` if there is
+          none.
+    """
+    unknown_rules = set(rules) - COMPILED_RULES
+    if unknown_rules:
+        raise NotCompilable("rules %s of field %r" % (sorted(unknown_rules), field))
+
+    field_path = document_path + (field,)
+
+    def error(rule, definition, constraint, value, *info):
+        return ValidationError(field_path, schema_path + (field, rule),
+                               definition.code, rule, constraint, value, info)
+
+    nullable = rules.get("nullable", False)
+    is_type = None
+    if rules.get("type"):
+        is_type = _compile_type(rules["type"], validator.types_mapping)
+
+    tests = list()  # (cost, rule, test, make_error)
+    for rule, constraint in rules.items():
+        make_rule = _RULES.get(rule)
+        if make_rule is not None:
+            test, make_error = make_rule(error, constraint)
+            tests.append((RULE_COSTS[rule], rule, test, make_error))
+
+    child = None
+    if rules.get("schema") is not None:
+        if rules.get("type") not in ("dict", ["dict"], ("dict",)):
+            # a sequence value would be validated item by item
+            raise NotCompilable("schema rule of non dict field %r" % field)
+        sub_schema = rules["schema"]
+        child = _compile_level(
+            validator._resolve_schema(sub_schema), validator, levels,
+            document_path=field_path,
+            schema_path=schema_path + (field, "schema"),
+            allow_unknown=rules.get("allow_unknown", allow_unknown),
+            require_all=rules.get("require_all", require_all),
+        )
+
+    def schema_errors(value, update, dependency_failures, nested):
+        child_errors = nested[child]
+        if child_errors:
+            return [error("schema", errors.MAPPING_SCHEMA, sub_schema, value,
+                          child_errors)]
+        return ()
+
+    def dependency_errors(value, update, dependency_failures, nested):
+        return [error("dependencies", definition, rules["dependencies"], value, *info)
+                for definition, info in dependency_failures.get(field, ())]
+
+    # the errors are created in the order of Validator, the rules after the
+    # priority ones in the order of the schema
+    by_rule = dict((rule, (test, make_error)) for _, rule, test, make_error in tests)
+    sequence = list()
+    for rule in rules:
+        if rule in by_rule:
+            sequence.append((rule, by_rule[rule]))
+        elif rule == "schema" and child is not None:
+            sequence.append((rule, (None, schema_errors)))
+        elif rule == "dependencies":
+            sequence.append((rule, (None, dependency_errors)))
+    checks = tuple(pair for _, pair in sequence)
+    empty_checks = tuple(pair for rule, pair in sequence if rule not in _DROPPED_BY_EMPTY)
+    none_checks = tuple(pair for rule, pair in sequence if rule == "dependencies")
+
+    tests.sort(key=lambda item: item[0])
+    cheap = tuple(test for cost, _, test, _ in tests if cost <= CHEAP_COST)
+    cheap_empty = tuple(test for cost, rule, test, _ in tests
+                        if cost <= CHEAP_COST and rule not in _DROPPED_BY_EMPTY)
+    costly = tuple(test for cost, _, test, _ in tests if cost > CHEAP_COST)
+    costly_empty = tuple(test for cost, rule, test, _ in tests
+                         if cost > CHEAP_COST and rule not in _DROPPED_BY_EMPTY)
+
+    has_empty = "empty" in rules
+    empty = rules.get("empty")
+
+    def is_empty(value):
+        return has_empty and isinstance(value, Sized) and len(value) == 0
+
+    def check(value, errs, update, dependency_failures, nested):
+        if value is None:
+            if not nullable:
+                errs.append(error("nullable", errors.NOT_NULLABLE, nullable, value))
+            remaining = none_checks
+        elif is_type is not None and not is_type(value):
+            errs.append(error("type", errors.BAD_TYPE, rules["type"], value))
+            return
+        else:
+            remaining = checks
+            if is_empty(value):
+                if not empty:
+                    errs.append(error("empty", errors.EMPTY_NOT_ALLOWED, empty, value))
+                remaining = empty_checks
+        for test, make_error in remaining:
+            if test is None:
+                errs.extend(make_error(value, update, dependency_failures, nested))
+            elif not test(value):
+                errs.append(make_error(value))
+
+    def is_valid_cheap(value):
+        if value is None:
+            return nullable
+        if is_type is not None and not is_type(value):
+            return False
+        remaining = cheap
+        if is_empty(value):
+            if not empty:
+                return False
+            remaining = cheap_empty
+        for test in remaining:
+            if not test(value):
+                return False
+        return True
+
+    def is_valid_costly(value, update):
+        if value is None:
+            return True
+        for test in (costly_empty if is_empty(value) else costly):
+            if not test(value):
+                return False
+        return True
+
+    return check, is_valid_cheap, is_valid_costly if costly else None, child
+
+
+def _rule_allowed(error, allowed_values):
+    def test(value):
+        if isinstance(value, Iterable) and not isinstance(value, str):
+            for x in value:
+                if x not in allowed_values:
+                    return False
+            return True
+        return value in allowed_values
+
+    def make_error(value):
+        if isinstance(value, Iterable) and not isinstance(value, str):
+            unallowed = tuple(x for x in value if x not in allowed_values)
+            return error("allowed", errors.UNALLOWED_VALUES,
+                         allowed_values, value, unallowed)
+        return error("allowed", errors.UNALLOWED_VALUE,
+                     allowed_values, value, value)
+
+    return test, make_error
+
+
+def _rule_min(error, min_value):
+    def test(value):
+        try:
+            return not value < min_value
+        except TypeError:
+            return True
+
+    return test, lambda value: error("min", errors.MIN_VALUE, min_value, value)
+
+
+def _rule_max(error, max_value):
+    def test(value):
+        try:
+            return not value > max_value
+        except TypeError:
+            return True
+
+    return test, lambda value: error("max", errors.MAX_VALUE, max_value, value)
+
+
+def _rule_minlength(error, min_length):
+    def test(value):
+        return not (isinstance(value, Iterable) and len(value) < min_length)
+
+    return test, lambda value: error("minlength", errors.MIN_LENGTH,
+                                     min_length, value, len(value))
+
+
+def _rule_maxlength(error, max_length):
+    def test(value):
+        return not (isinstance(value, Iterable) and len(value) > max_length)
+
+    return test, lambda value: error("maxlength", errors.MAX_LENGTH,
+                                     max_length, value, len(value))
+
+
+def _rule_regex(error, pattern):
+    match = compile_regex(pattern if pattern.endswith("$") else pattern + "$").match
+
+    def test(value):
+        return not isinstance(value, str) or match(value) is not None
+
+    return test, lambda value: error("regex", errors.REGEX_MISMATCH, pattern, value)
+
+
+#: ``make_rule(error, constraint)`` returns ``(test, make_error)``
+_RULES = {
+    "allowed": _rule_allowed,
+    "min": _rule_min,
+    "max": _rule_max,
+    "minlength": _rule_minlength,
+    "maxlength": _rule_maxlength,
+    "regex": _rule_regex,
+}
+
+#: relative cost of the rules, the fail fast mode checks cheap rules of all
+#: the fields before it runs any costly one
+RULE_COSTS = {
+    "required": 0,
+    "type": 0,
+    "nullable": 0,
+    "empty": 0,
+    "allowed": 1,
+    "min": 1,
+    "max": 1,
+    "minlength": 1,
+    "maxlength": 1,
+    "dependencies": 1,
+    "regex": 2,
+    "schema": 3,
+}
+CHEAP_COST = 1
+
+
+CompiledSchema = namedtuple("CompiledSchema", "check is_valid levels")
+
+#: a mapping schema of a compiled schema, ``fields`` are its
+#: ``(document path, rules)`` entries, ``children`` the ``(field, level,
+#: is_type)`` of its nested schemas
+_Level = namedtuple("_Level", "document_path fields check is_valid children")
+
+
+def compile_mapping(schema, validator, document_path=(), schema_path=(),
+                    allow_unknown=False, require_all=False):
+    """Compile a mapping schema and its nested schemas into one flat list of
+    levels, evaluated in a single walk over the document: no function is
+    called per nested mapping, the errors of the nested mappings are
+    computed first and attached to their parent field afterwards.
+
+    :param schema: the (expanded) schema of the mapping.
+    :param validator: the ``Validator`` instance the schema belongs to, used to
+        resolve registries and type definitions.
+
+    :return: a :class:`CompiledSchema` of two closures and the levels:
+
+        - ``check(mapping, update)`` returns the sorted ``ErrorList`` of the
+          mapping, empty when the mapping is valid.
+        - ``is_valid(mapping, update)`` returns ``False`` at the first broken
+          rule without building any error. It checks unknown and required
+          fields first, then the cheap rules of all the fields, then the
+          costly ones, then the nested mappings.
+    """
+    levels = list()
+    _compile_level(schema, validator, levels, document_path, schema_path,
+                   allow_unknown, require_all)
+    levels = tuple(levels)
+
+    if len(levels) == 1:
+        check_level, is_valid_level = levels[0].check, levels[0].is_valid
+        return CompiledSchema(lambda mapping, update: check_level(mapping, update, None),
+                              is_valid_level, levels)
+
+    # the levels are in pre-order, a mapping is found before its children
+    def nested_mappings(mapping):
+        mappings = [None] * len(levels)
+        mappings[0] = mapping
+        for level, mapping in zip(levels, mappings):
+            if mapping is not None:
+                for field, child, is_type in level.children:
+                    value = mapping.get(field)
+                    if value is not None and is_type(value):
+                        mappings[child] = value
+        return mappings
+
+    def check(mapping, update):
+        mappings = nested_mappings(mapping)
+        nested = [None] * len(levels)
+        for index in range(len(levels) - 1, -1, -1):  # the children first
+            if mappings[index] is not None:
+                nested[index] = levels[index].check(mappings[index], update, nested)
+        return nested[0]
+
+    def is_valid(mapping, update):
+        mappings = [None] * len(levels)
+        mappings[0] = mapping
+        for level, mapping in zip(levels, mappings):
+            if mapping is None:
+                continue
+            if not level.is_valid(mapping, update):
+                return False
+            for field, child, is_type in level.children:
+                value = mapping.get(field)
+                if value is not None and is_type(value):
+                    mappings[child] = value
+        return True
+
+    return CompiledSchema(check, is_valid, levels)
+
+
+def _compile_level(schema, validator, levels, document_path=(), schema_path=(),
+                   allow_unknown=False, require_all=False):
+    """Compile one mapping schema into a :class:`_Level` of ``levels``, after
+    it the levels of its nested schemas.
+
+    :return: the index of the level.
+    """
+    if not isinstance(allow_unknown, bool):
+        raise NotCompilable("allow_unknown schema")
+
+    index = len(levels)
+    levels.append(None)  # the nested levels come after this one
+
+    fields = dict()
+    cheap = dict()
+    costly = list()
+    required = list()
+    children = list()
+    for field, rules in schema.items():
+        rules = validator._resolve_rules_set(rules)
+        fields[field], cheap[field], is_valid_costly, child = _compile_field(
+            field, rules, validator, document_path, schema_path,
+            allow_unknown, require_all, levels,
+        )
+        if is_valid_costly is not None:
+            costly.append((field, is_valid_costly))
+        if child is not None:
+            children.append((field, child, _compile_type(rules["type"], validator.types_mapping)))
+        constraint = rules.get("required", require_all)
+        if constraint is True:
+            if "required" in rules:
+                required_path = schema_path + (field, "required")
+            else:
+                required_path = "__require_all__"
+            required.append((field, document_path + (field,), required_path))
+
+    graph = dependency_graph_of(validator, schema)
+    if graph.has_root_paths and document_path:
+        raise NotCompilable("dependencies on the root document")
+    # a field of the wrong type skips its dependencies rule
+    dependency_types = dict()
+    for field in graph.dependencies:
+        rules = validator._resolve_rules_set(schema[field])
+        if rules.get("type"):
+            dependency_types[field] = _compile_type(rules["type"], validator.types_mapping)
+
+    # the keys of each level are checked with one set difference, a mapping
+    # with more keys than its schema, e.g. pass-through keys allowed by
+    # allow_unknown, is walked through the fields of the schema
+    known_fields = frozenset(fields)
+    field_checks = tuple(fields.items())
+    get_check = fields.get
+    unknown_code = errors.UNKNOWN_FIELD.code
+    required_code = errors.REQUIRED_FIELD.code
+
+    def check(mapping, update, nested):
+        errs = errors.ErrorList()
+        dependency_failures = dict()
+        if graph:
+            # one pass over the dependency graph, the fields of the wrong type
+            # skip their dependencies rule
+            skip = [field for field, is_type in dependency_types.items()
+                    if mapping.get(field) is not None and not is_type(mapping[field])]
+            for field, _, definition, info in graph.failures(mapping, skip=skip):
+                dependency_failures.setdefault(field, []).append((definition, info))
+        # several dependencies errors of a field are ordered by the errors
+        # submitted before them, in the order of the document
+        replay = bool(dependency_failures) and \
+            any(len(failures) > 1 for failures in dependency_failures.values())
+        if len(mapping) > len(field_checks) and not replay and \
+                (allow_unknown or not mapping.keys() - known_fields):
+            for field, field_check in field_checks:
+                if field in mapping:
+                    field_check(mapping[field], errs, update, dependency_failures, nested)
+        else:
+            for field, value in mapping.items():
+                field_check = get_check(field)
+                if field_check is not None:
+                    field_check(value, errs, update, dependency_failures, nested)
+                elif not allow_unknown:
+                    errs.append(ValidationError(document_path + (field,), schema_path,
+                                                unknown_code, None, None, value, ()))
+        if not update:
+            for field, field_path, required_path in required:
+                if field not in mapping:
+                    errs.append(ValidationError(field_path, required_path,
+                                                required_code, "required",
+                                                True, None, ()))
+        if errs:
+            if replay:
+                errs = _sort_like_validator(errs)
+            else:
+                errs.sort()
+        return errs
+
+    required_fields = frozenset(field for field, _, _ in required)
+    cheap_checks = tuple(cheap.items())
+    get_cheap = cheap.get
+
+    def is_valid(mapping, update):
+        keys = mapping.keys()
+        if not allow_unknown and keys - known_fields:
+            return False
+        if not update and any(field not in mapping for field in required_fields):
+            return False
+        if len(mapping) > len(cheap_checks):
+            for field, is_valid_cheap in cheap_checks:
+                if field in mapping and not is_valid_cheap(mapping[field]):
+                    return False
+        else:
+            for field, value in mapping.items():
+                is_valid_cheap = get_cheap(field)
+                if is_valid_cheap is not None and not is_valid_cheap(value):
+                    return False
+        if graph and not graph.is_satisfied(mapping):
+            return False
+        for field, is_valid_costly in costly:
+            if field in mapping and not is_valid_costly(mapping[field], update):
+                return False
+        return True
+
+    levels[index] = _Level(
+        document_path,
+        tuple((document_path + (field,), validator._resolve_rules_set(rules))
+              for field, rules in schema.items()),
+        check, is_valid, tuple(children),
+    )
+    return index
+
+
+def _sort_like_validator(errs):
+    """``Validator._error`` sorts the errors after each one it adds, which
+    only makes a difference for errors of the same path, e.g. the ones of a
+    ``dependencies`` list. Replay that.
+    """
+    result = errors.ErrorList()
+    for error in errs:
+        result.append(error)
+        result.sort()
+    return result
+
+
+def check_compilable(validator):
+    """Make sure the options and the class of a ``Validator`` instance
+    behave like the compiled rules.
+
+    :raises NotCompilable: if an option is set the compiler doesn't know, or a
+        compiled rule is overridden by the validator class.
+    """
+    unknown_options = set(
+        key for key, value in validator._config.items()
+        if value and key not in _COMPILED_OPTIONS and not key.startswith("_")
+    )
+    if unknown_options:
+        raise NotCompilable("options %s" % sorted(unknown_options))
+    for rule in COMPILED_RULES:
+        method_name = "_validate_" + rule
+        if getattr(type(validator), method_name, None) is not getattr(Validator, method_name, None):
+            raise NotCompilable("overridden rule %r" % rule)
+
+
+def compile_schema(validator):
+    """Compile the schema of a ``Validator`` instance into a
+    :class:`CompiledSchema`, see :func:`compile_mapping`.
+
+    :raises NotCompilable: if the schema, the options or the validator class
+        use anything the compiler doesn't handle.
+    """
+    check_compilable(validator)
+    return compile_mapping(
+        validator.schema, validator,
+        allow_unknown=validator.allow_unknown,
+        require_all=validator.require_all,
+    )
+
+
+class _FirstError(Exception):
+    pass
+
+
+def _stop_at_first_error(*args):
+    """Replaces ``Validator._error`` in fail fast mode.
+    """
+    if len(args) == 1 and not args[0]:  # empty bulk of errors
+        return
+    raise _FirstError
+
+
+class CompiledValidator(object):
+    """A drop-in replacement of ``cerberus.Validator`` for the common rules.
+
+    Usage::
+
+        >>> v = CompiledValidator({"name": {"type": "string"}})
+        >>> v.validate({"name": 1})
+        False
+        >>> v.errors
+        {'name': ['must be of string type']}
+
+    :param schema: the validation schema.
+    :param validator_class: ``Validator`` or a subclass of it, used for schema
+        checking and for the schemas which can't be compiled.
+    :param kwargs: the options of ``validator_class``.
+    """
+
+    def __init__(self, schema, validator_class=Validator, **kwargs):
+        self._schema_key = schema_key(schema)
+        self.validator = validator_class(
+            prepared_schema(schema, validator_class, key=self._schema_key),
+            **kwargs
+        )
+        self.document = None
+        self._errors = errors.ErrorList()
+        if not isinstance(self.validator, PrecomputedDependencies):  # it warned already
+            warn_cycles(self.validator)
+        self._compile()
+
+    def _compile(self):
+        def compile_or_none():
+            try:
+                return compile_schema(self.validator)
+            except NotCompilable:
+                return None
+
+        options = dict(
+            (key, value) for key, value in self.validator._config.items()
+            if key != "schema" and not key.startswith("_")
+        )
+        key = (type(self.validator), self._schema_key, schema_key(options),
+               registry_key(self.validator.schema, self.validator.rules_set_registry,
+                            self.validator.schema_registry))
+        self._check = compiled_cache.get_or_create(key, compile_or_none)
+
+    @property
+    def is_compiled(self):
+        """``False`` if the schema is validated by the plain validator.
+        """
+        return self._check is not None
+
+    @property
+    def schema(self):
+        return self.validator.schema
+
+    @property
+    def allow_unknown(self):
+        return self.validator.allow_unknown
+
+    @allow_unknown.setter
+    def allow_unknown(self, value):
+        self.validator.allow_unknown = value
+        self._compile()
+
+    @property
+    def errors(self):
+        """The errors of the last validation, formatted by the error handler
+        of the validator.
+        """
+        return self.validator.error_handler(self._errors)
+
+    def _check_document(self, document):
+        if document is None:
+            raise DocumentError(errors.DOCUMENT_MISSING)
+        if not isinstance(document, Mapping):
+            raise DocumentError(errors.DOCUMENT_FORMAT.format(document))
+
+    def is_valid(self, document, update=False, normalize=True):
+        """Tell if a document is valid, stop at the first broken rule.
+
+        Nothing is recorded: ``document`` and ``errors`` are left as they
+        are, and no error object is created. Cheap rules (``required``,
+        ``type``, ``allowed``, ...) of all the fields are checked before the
+        costly ones (``regex``, nested schemas).
+
+        A schema which can't be compiled is validated by the plain validator,
+        which then stops at its first error.
+        """
+        if self._check is None:
+            validator = self.validator
+            validator._error = _stop_at_first_error
+            try:
+                return validator.validate(document, update=update,
+                                          normalize=normalize)
+            except _FirstError:
+                return False
+            finally:
+                del validator._error
+        self._check_document(document)
+        return self._check.is_valid(document, update)
+
+    def validate(self, document, schema=None, update=False, normalize=True,
+                 fail_fast=False):
+        """Same as ``cerberus.Validator.validate``.
+
+        :param fail_fast: stop at the first error, see :meth:`is_valid`.
+            ``errors`` is empty afterwards, even if the document is invalid.
+        """
+        if fail_fast and schema is None:
+            self._errors = errors.ErrorList()
+            result = self.is_valid(document, update, normalize)
+            if self._check is None:
+                self.document = self.validator.document
+            else:
+                self.document = copy(document)
+            return result
+
+        if self._check is None or schema is not None:
+            result = self.validator.validate(document, schema, update, normalize)
+            self.document = self.validator.document
+            self._errors = self.validator._errors
+            return result
+
+        self._check_document(document)
+        self.document = copy(document)
+        self._errors = self._check.check(self.document, update)
+        return not self._errors
+
+    __call__ = validate
+
+    def validated(self, *args, **kwargs):
+        """Same as ``cerberus.Validator.validated``.
+        """
+        always_return_document = kwargs.pop("always_return_document", False)
+        result = self.validate(*args, **kwargs)
+        if not result and not always_return_document:
+            return None
+        return self.document
+
+
+def example_compiled_validator():
+    import timeit
+
+    schema = {
+        "name": {"type": "string", "minlength": 2, "maxlength": 10, "empty": False},
+        "email": {"type": "string", "regex": "[a-z0-9.]+@[a-z0-9.]+"},
+        "age": {"type": "integer", "min": 0, "max": 150, "required": True},
+        "role": {"type": "string", "allowed": ["agent", "client", "supplier"]},
+        "memo": {"type": "string", "nullable": True},
+    }
+    documents = [
+        {"name": "John", "email": "john@example.com", "age": 32, "role": "agent"},
+        {"name": "", "email": "john", "age": -1, "role": "boss", "memo": None},
+        {"name": 1, "age": 200, "sex": "M"},
+        {"email": None},
+    ]
+    v = Validator(schema)
+    cv = CompiledValidator(schema)
+    assert cv.is_compiled
+    for document in documents:
+        assert cv.validate(document) is v.validate(document)
+        assert cv.errors == v.errors
+        assert cv.is_valid(document) is v.validate(document)
+        assert cv.validate(document, fail_fast=True) is v.validate(document)
+        assert cv.errors == {}
+
+    n = 2000
+    t_plain = timeit.timeit(lambda: v.validate(documents[0]), number=n)
+    t_compiled = timeit.timeit(lambda: cv.validate(documents[0]), number=n)
+    print("Validator: %.2f us/doc, CompiledValidator: %.2f us/doc, %.1fx" % (
+        t_plain / n * 1e6, t_compiled / n * 1e6, t_plain / t_compiled))
+
+    # fail fast: an invalid document is rejected at its first broken rule
+    t_full = timeit.timeit(lambda: cv.validate(documents[1]), number=n)
+    t_fast = timeit.timeit(lambda: cv.is_valid(documents[1]), number=n)
+    print("invalid document, validate: %.2f us/doc, is_valid: %.2f us/doc" % (
+        t_full / n * 1e6, t_fast / n * 1e6))
+
+    # a schema which can't be compiled stops at its first error too
+    cv = CompiledValidator({"name": {"type": "string", "forbidden": ["root"]}})
+    assert not cv.is_compiled
+    assert cv.is_valid({"name": "john"}) is True
+    assert cv.is_valid({"name": "root"}) is False
+    assert cv.validated({"name": "root"}, fail_fast=True) is None
+
+    # a rules set added again under the same name isn't compiled from the cache
+    from cerberus import rules_set_registry
+    rules_set_registry.add("example_id", {"type": "integer"})
+    try:
+        assert not CompiledValidator({"a": "example_id"}).validate({"a": "x"})
+        rules_set_registry.add("example_id", {"type": "string"})
+        assert CompiledValidator({"a": "example_id"}).validate({"a": "x"})
+    finally:
+        rules_set_registry.remove("example_id")
+
+
+def example_pass_through_keys():
+    import timeit
+
+    # example_allow_unknown of p2_validation_rules/p1_allow_unknown.py, with
+    # events carrying hundreds of pass-through keys
+    schema = {
+        "name": {"type": "string"},
+        "profile": {
+            "type": "dict",
+            "allow_unknown": True,
+            "schema": {
+                "email": {"type": "string"},
+                "phone": {"type": "string"},
+            },
+        },
+    }
+    event = {"name": "John", "profile": {"email": "john@example.com"}}
+    for i in range(300):
+        event["attr%d" % i] = i
+        event["profile"]["attr%d" % i] = i
+    documents = [
+        event,
+        dict(event, name=1, profile=dict(event["profile"], phone=2)),
+        {"name": "John", "profile": {"age": 32}},
+    ]
+    for kwargs in ({"allow_unknown": True}, {}):
+        v = Validator(schema, **kwargs)
+        cv = CompiledValidator(schema, **kwargs)
+        assert cv.is_compiled
+        for document in documents:
+            assert cv.validate(document) is v.validate(document)
+            assert cv.errors == v.errors
+            assert cv.is_valid(document) is v.validate(document)
+
+    v = Validator(schema, allow_unknown=True)
+    cv = CompiledValidator(schema, allow_unknown=True)
+    n = 1000
+    t_plain = timeit.timeit(lambda: v.validate(event), number=n)
+    t_compiled = timeit.timeit(lambda: cv.validate(event), number=n)
+    t_is_valid = timeit.timeit(lambda: cv.is_valid(event), number=n)
+    print("600 pass-through keys, Validator: %.1f us/doc, CompiledValidator: %.1f us/doc, "
+          "is_valid: %.1f us/doc" % (t_plain / n * 1e6, t_compiled / n * 1e6,
+                                     t_is_valid / n * 1e6))
+
+
+def example_nested_levels():
+    import timeit
+
+    # 8 levels of nested dicts
+    schema = {"name": {"type": "string"}, "age": {"type": "integer", "min": 0}}
+    document = {"name": "x", "age": 1}
+    for _ in range(8):
+        schema = {"name": {"type": "string"}, "age": {"type": "integer", "min": 0},
+                  "child": {"type": "dict", "schema": schema}}
+        document = {"name": "x", "age": 1, "child": document}
+
+    v, cv = Validator(schema), CompiledValidator(schema)
+    assert cv.is_compiled
+    assert len(cv._check.levels) == 9
+    assert v.validate(document) is cv.validate(document) is True
+
+    invalid = document
+    for _ in range(5):
+        invalid = invalid["child"]
+    invalid["age"], invalid["child"]["name"] = -1, 1
+    assert v.validate(document) is cv.validate(document) is False
+    assert cv.errors == v.errors
+    assert [e.document_path for e in cv._errors] == [e.document_path for e in v._errors]
+    invalid["age"], invalid["child"]["name"] = 1, "x"
+
+    t_plain = timeit.timeit(lambda: v.validate(document), number=200) / 200
+    t_compiled = timeit.timeit(lambda: cv.validate(document), number=2000) / 2000
+    print("8 nested levels, Validator: %.1f us/doc, CompiledValidator: %.1f us/doc" % (
+        t_plain * 1e6, t_compiled * 1e6))
+
+
+if __name__ == "__main__":
+    """
+    """
+    example_compiled_validator()
+    example_pass_through_keys()
+    example_nested_levels()
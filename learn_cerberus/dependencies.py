@@ -0,0 +1,463 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Resolve the ``dependencies`` rules of a schema once, into a dependency graph.
+
+``cerberus.Validator`` parses every dependency path (``"a_dict.foo"``,
+``"^root_field"``) again for every field of every document, see
+``p2_validation_rules/p3_dependencies.py``. :class:`DependencyGraph` does it
+once per schema level:
+
+- every dependency path becomes an accessor tuple, ``("a_dict", "foo")``.
+- the fields are sorted so a field comes after the fields it depends on, the
+  dependency cycles are listed in :attr:`DependencyGraph.cycles`. A cycle is
+  legal for cerberus (``a`` and ``b`` both need each other), but it usually
+  is a schema mistake: the validators warn with a
+  :class:`DependencyCycleWarning` when they are created, see
+  :func:`warn_cycles`.
+- a document is checked by a single pass over the sorted fields, see
+  :meth:`DependencyGraph.failures`.
+
+Errors are the ones of ``cerberus.Validator``: ``field 'a_dict.bar' is
+required`` and ``depends on these values: {...}``.
+
+Usage::
+
+    v = DependencyGraphValidator(schema)  # or class MyValidator(PrecomputedDependencies, Validator)
+
+The graph is also used by :class:`~learn_cerberus.compiled.CompiledValidator`.
+"""
+
+from __future__ import print_function
+import warnings
+
+from cerberus import Validator, errors
+from cerberus.platform import Iterable, Mapping, Sequence
+
+from .cache import LRUCache
+
+
+class DependencyCycleWarning(UserWarning):
+    """Fields of a schema depend on each other in a cycle.
+    """
+
+
+def parse_path(path):
+    """Split a dependency path into ``(from_root, parts)``, the same way as
+    ``Validator._lookup_field``: a leading ``^`` refers to the root document,
+    ``^^`` is a literal ``^``.
+    """
+    from_root = False
+    if path.startswith("^"):
+        path = path[1:]
+        from_root = not path.startswith("^")
+    return from_root, tuple(path.split("."))
+
+
+_MISSING = object()
+
+
+def lookup(context, parts):
+    """The value at ``parts`` in a document, ``_MISSING`` if there is none.
+    """
+    for part in parts:
+        if part not in context:
+            return _MISSING
+        context = context.get(part, {})
+    return context
+
+
+def compile_dependencies(dependencies):
+    """Normalize the constraint of a ``dependencies`` rule, the same way as
+    ``Validator._validate_dependencies``.
+
+    :return: ``(by_value, [(name, from_root, parts, allowed_values), ...])``,
+        ``allowed_values`` is ``None`` for a plain field dependency.
+    """
+    if isinstance(dependencies, str) or not isinstance(dependencies, (Iterable, Mapping)):
+        dependencies = (dependencies,)
+
+    accessors = list()
+    if isinstance(dependencies, Sequence):
+        for name in dependencies:
+            accessors.append((name,) + parse_path(name) + (None,))
+        return False, accessors
+    if isinstance(dependencies, Mapping):
+        for name, values in dependencies.items():
+            if not isinstance(values, Sequence) or isinstance(values, str):
+                values = [values]
+            accessors.append((name,) + parse_path(name) + (values,))
+        return True, accessors
+    return False, accessors  # a set, cerberus checks nothing
+
+
+def find_cycles(edges):
+    """Find the cycles of a directed graph.
+
+    :param edges: ``{node: [node, ...]}``
+    :return: a list of cycles, each one a list of nodes, the strongly
+        connected components with more than one node.
+    """
+    index = dict()
+    low = dict()
+    stack = list()
+    on_stack = set()
+    cycles = list()
+
+    def visit(node):  # Tarjan
+        index[node] = low[node] = len(index)
+        stack.append(node)
+        on_stack.add(node)
+        for other in edges.get(node, ()):
+            if other not in index:
+                visit(other)
+                low[node] = min(low[node], low[other])
+            elif other in on_stack:
+                low[node] = min(low[node], index[other])
+        if low[node] == index[node]:
+            component = list()
+            while True:
+                other = stack.pop()
+                on_stack.discard(other)
+                component.append(other)
+                if other == node:
+                    break
+            if len(component) > 1:
+                cycles.append(component[::-1])
+
+    for node in edges:
+        if node not in index:
+            visit(node)
+    return cycles
+
+
+def topological_order(edges):
+    """Sort the nodes of ``edges`` so every node comes after the nodes it
+    points to. Nodes of a cycle keep their original order.
+    """
+    order = list()
+    done = set()
+
+    def visit(node, visiting):
+        if node in done or node in visiting:
+            return
+        visiting.add(node)
+        for other in edges.get(node, ()):
+            if other in edges:
+                visit(other, visiting)
+        done.add(node)
+        order.append(node)
+
+    for node in edges:
+        visit(node, set())
+    return order
+
+
+class DependencyGraph(object):
+    """The ``dependencies`` rules of one level of a schema.
+
+    :param schema: the (expanded) mapping schema.
+    :param resolve_rules_set: ``Validator._resolve_rules_set`` for the rules
+        set registry references.
+    """
+
+    def __init__(self, schema, resolve_rules_set=None):
+        self.dependencies = dict()  # field -> (constraint, by_value, accessors)
+        edges = dict()
+        for field, rules in schema.items():
+            if resolve_rules_set is not None:
+                rules = resolve_rules_set(rules)
+            if not rules or "dependencies" not in rules:
+                continue
+            constraint = rules["dependencies"]
+            by_value, accessors = compile_dependencies(constraint)
+            self.dependencies[field] = (constraint, by_value, accessors)
+            edges[field] = [parts[0] for _, from_root, parts, _ in accessors
+                            if not from_root and parts[0] != field]
+
+        self.has_root_paths = any(
+            from_root
+            for _, _, accessors in self.dependencies.values()
+            for _, from_root, _, _ in accessors
+        )
+        #: the fields which depend on each other, ``[[field, ...], ...]``
+        self.cycles = find_cycles(edges)
+        self.order = [
+            (field,) + self.dependencies[field]
+            for field in topological_order(edges)
+        ]
+
+    def __bool__(self):
+        return bool(self.dependencies)
+
+    __nonzero__ = __bool__
+
+    def field_failures(self, field, document, root=None):
+        """The errors of the dependencies of one field, as a list of
+        ``(error definition, info)``.
+        """
+        constraint, by_value, accessors = self.dependencies[field]
+        return self._failures(by_value, accessors, document, root)
+
+    @staticmethod
+    def _failures(by_value, accessors, document, root):
+        if not by_value:
+            return [
+                (errors.DEPENDENCIES_FIELD, (name,))
+                for name, from_root, parts, _ in accessors
+                if lookup(root if from_root else document, parts) is _MISSING
+            ]
+        error_info = dict()
+        for name, from_root, parts, values in accessors:
+            value = lookup(root if from_root else document, parts)
+            if value is _MISSING:
+                value = None
+            if value not in values:
+                error_info[name] = value
+        if error_info:
+            return [(errors.DEPENDENCIES_FIELD_VALUE, (error_info,))]
+        return []
+
+    def failures(self, document, root=None, skip=()):
+        """Check the dependencies of the fields of a document in a single
+        pass.
+
+        :param root: the root document, for the ``^`` paths.
+        :param skip: fields not to check, e.g. the ones of the wrong type.
+
+        :return: ``[(field, constraint, error definition, info), ...]``
+        """
+        if root is None:
+            root = document
+        result = list()
+        for field, constraint, by_value, accessors in self.order:
+            if field not in document or field in skip:
+                continue
+            for definition, info in self._failures(by_value, accessors, document, root):
+                result.append((field, constraint, definition, info))
+        return result
+
+    def is_satisfied(self, document, root=None, skip=()):
+        """``True`` if the dependencies of all the fields are met, stops at the
+        first failure.
+        """
+        if root is None:
+            root = document
+        for field, constraint, by_value, accessors in self.order:
+            if field not in document or field in skip:
+                continue
+            if self._failures(by_value, accessors, document, root):
+                return False
+        return True
+
+
+def dependency_graph_of(validator, schema):
+    """The :class:`DependencyGraph` of a mapping schema of ``validator``,
+    cached in the ``_dependency_graphs`` option when the validator has one.
+    """
+    graphs = validator._config.get("_dependency_graphs")
+    if graphs is None:
+        return DependencyGraph(schema, validator._resolve_rules_set)
+
+    def create():
+        return schema, DependencyGraph(schema, validator._resolve_rules_set)
+
+    cached = graphs.get_or_create(id(schema), create)
+    if cached[0] is not schema:  # the id of a dropped schema
+        graphs.invalidate(id(schema))
+        cached = graphs.get_or_create(id(schema), create)
+    return cached[1]
+
+
+def _nested_schema(validator, rules):
+    # the mapping schema of the values of a field, or of the items of a list
+    rules = validator._resolve_rules_set(rules)
+    if not isinstance(rules, Mapping) or "schema" not in rules:
+        return None
+    schema = validator._resolve_schema(rules["schema"])
+    types = rules.get("type", ())
+    if isinstance(types, str):
+        types = (types,)
+    if "list" in types and "dict" not in types:
+        return _nested_schema(validator, schema)  # the rules of the items
+    return schema if isinstance(schema, Mapping) else None
+
+
+def schema_levels(validator, schema=None, document_path=()):
+    """Yield ``(document path, mapping schema)`` for the schema of a validator
+    and its nested mapping schemas, the items of a list have the path of the
+    list.
+    """
+    seen = set()
+    pending = [(document_path, validator.schema if schema is None else schema)]
+    while pending:
+        path, schema = pending.pop()
+        if schema is None or id(schema) in seen:  # recursive schemas of the registry
+            continue
+        seen.add(id(schema))
+        yield path, schema
+        for field, rules in schema.items():
+            pending.append((path + (field,), _nested_schema(validator, rules)))
+
+
+def warn_cycles(validator):
+    """Warn with a :class:`DependencyCycleWarning` about every dependency cycle
+    of the schema of a validator.
+
+    :return: ``[(document path, cycle), ...]``
+    """
+    found = list()
+    for path, schema in schema_levels(validator):
+        for cycle in dependency_graph_of(validator, schema).cycles:
+            found.append((path, cycle))
+            warnings.warn(
+                "fields %s of %s depend on each other" % (
+                    " -> ".join(repr(field) for field in cycle + cycle[:1]),
+                    "'%s'" % ".".join(map(str, path)) if path else "the document"),
+                DependencyCycleWarning, stacklevel=3,
+            )
+    return found
+
+
+class PrecomputedDependencies(object):
+    """Mixin for ``Validator`` and its subclasses, evaluates the
+    ``dependencies`` rules with the pre-resolved accessors of a
+    :class:`DependencyGraph`. The graphs are built once per schema level when
+    the validator is created, and shared with the child validators in the
+    ``_dependency_graphs`` option.
+
+    ``Validator`` checks the rules field by field, so does this mixin. The
+    single pass over a document is done by
+    :class:`~learn_cerberus.compiled.CompiledValidator`.
+    """
+
+    _dependencies = (None, None)  # (schema, graph)
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("_dependency_graphs", LRUCache(maxsize=256))
+        super(PrecomputedDependencies, self).__init__(*args, **kwargs)
+        if not self.is_child and self.schema is not None:
+            warn_cycles(self)
+
+    @property
+    def dependency_graph(self):
+        """The :class:`DependencyGraph` of the schema, looked up again when
+        another schema is set.
+        """
+        schema, graph = self._dependencies
+        if schema is not self.schema:
+            schema = self.schema
+            graph = dependency_graph_of(self, schema)
+            self._dependencies = (schema, graph)
+        return graph
+
+    def _validate_dependencies(self, dependencies, field, value):
+        """{'type': ('dict', 'hashable', 'list'), 'check_with': 'dependencies'}"""
+        failures = self.dependency_graph.field_failures(
+            field, self.document, self.root_document)
+        for definition, info in failures:
+            self._error(field, definition, *info)
+        # same as Validator._validate_dependencies, without the lookup when
+        # no error was added
+        if failures and self.document_error_tree.fetch_node_from(
+                self.schema_path + (field, "dependencies")) is not None:
+            return True
+
+
+class DependencyGraphValidator(PrecomputedDependencies, Validator):
+    """``cerberus.Validator`` with precomputed ``dependencies`` rules.
+    """
+
+
+def example_dependency_graph():
+    import timeit
+
+    from .compiled import CompiledValidator
+
+    schema = {
+        "test_field": {"dependencies": ["a_dict.foo", "a_dict.bar"]},
+        "a_dict": {
+            "type": "dict",
+            "schema": {
+                "foo": {"type": "string"},
+                "bar": {"type": "string", "dependencies": {"^mode": ["strict", "lax"]}},
+            },
+        },
+        "mode": {"type": "string"},
+        "field2": {"dependencies": {"field1": ["one", "two"]}},
+        "field1": {"dependencies": "mode"},
+    }
+    documents = [
+        {"test_field": "foobar", "a_dict": {"foo": "foo"}},
+        {"test_field": "foobar", "a_dict": {"foo": "foo", "bar": "bar"}},
+        {"test_field": "foobar", "a_dict": {"foo": "foo", "bar": "bar"}, "mode": "lax"},
+        {"field1": "one", "field2": 1, "mode": "x"},
+        {"field1": "three", "field2": 1},
+    ]
+    v = Validator(schema)
+    dv = DependencyGraphValidator(schema)
+    for document in documents:
+        assert dv.validate(document) is v.validate(document)
+        assert dv.errors == v.errors
+    dv.validate(documents[0])
+    assert dv.errors == {"test_field": ["field 'a_dict.bar' is required"]}
+
+    graph = DependencyGraph(schema)
+    assert [field for field, _, _, _ in graph.order] == ["test_field", "field1", "field2"]
+    assert graph.failures({"field2": 1}) == [
+        ("field2", {"field1": ["one", "two"]}, errors.DEPENDENCIES_FIELD_VALUE,
+         ({"field1": None},)),
+    ]
+
+    graph = DependencyGraph({"a": {"dependencies": "b"}, "b": {"dependencies": ["a"]}})
+    assert graph.cycles == [["a", "b"]]
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        DependencyGraphValidator({"rows": {"type": "list", "schema": {
+            "type": "dict", "schema": {"a": {"dependencies": "b"},
+                                       "b": {"dependencies": ["a"]}}}}})
+        CompiledValidator({"a": {"dependencies": "b"}, "b": {"dependencies": ["a"]}})
+    assert [str(w.message) for w in caught] == [
+        "fields 'a' -> 'b' -> 'a' of 'rows' depend on each other",
+        "fields 'a' -> 'b' -> 'a' of the document depend on each other"]
+
+    # the graphs of the nested schemas are built once, for all the documents
+    dv = DependencyGraphValidator(schema)
+    n_levels = len(list(schema_levels(dv)))
+    for document in documents * 3:
+        dv.validate(document)
+    graphs = dv._config["_dependency_graphs"]
+    assert len(graphs) == n_levels and graphs.misses == n_levels
+
+    # an order schema with 150 fields which all depend on a few others
+    schema = dict(("f%d" % i, {"dependencies": ["f%d" % (i // 2), "f%d" % (i // 3)]})
+                  for i in range(1, 150))
+    schema["f0"] = {"type": "integer"}
+    document = dict(("f%d" % i, i) for i in range(150))
+
+    v, dv, cv = Validator(schema), DependencyGraphValidator(schema), CompiledValidator(schema)
+    assert dv.validate(document) is v.validate(document) is cv.validate(document) is True
+    n = 20
+    for name, validator in [("Validator", v), ("DependencyGraphValidator", dv),
+                            ("CompiledValidator", cv)]:
+        t = min(timeit.repeat(lambda: validator.validate(document, normalize=False),
+                              number=n, repeat=5))
+        print("150 fields with dependencies, %s: %.0f us/doc" % (name, t / n * 1e6))
+
+    # 20 rows, a child validator each, which share the graph of the rows
+    row_schema = dict(("f%d" % i, {"dependencies": ["f%d" % (i // 2)]}) for i in range(1, 30))
+    row_schema["f0"] = {"type": "integer"}
+    schema = {"rows": {"type": "list", "schema": {"type": "dict", "schema": row_schema}}}
+    document = {"rows": [dict(("f%d" % i, i) for i in range(30)) for _ in range(20)]}
+    v, dv = Validator(schema), DependencyGraphValidator(schema)
+    assert dv.validate(document) is v.validate(document) is True
+    for name, validator in [("Validator", v), ("DependencyGraphValidator", dv)]:
+        t = min(timeit.repeat(lambda: validator.validate(document), number=n, repeat=5))
+        print("20 rows with dependencies, %s: %.0f us/doc" % (name, t / n * 1e6))
+
+
+if __name__ == "__main__":
+    """
+    """
+    example_dependency_graph()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+A persistent cache of prepared schemas, for processes which start often and
+create many validators, e.g. serverless workers.
+
+``Validator(schema)`` expands and validates the schema, which is the most of
+the cost of creating a validator in a new process (cerberus only remembers
+the valid schemas per process). :class:`SchemaDiskCache` stores the expanded
+schema in a directory, under
+
+- :func:`schema_fingerprint`: a digest of the schema which is the same in
+  every process, functions (``coerce``, ``check_with``) count by their module
+  and name.
+- :func:`rules_fingerprint`: a digest of the cerberus and python versions
+  and of the rules and types of the validator class, so the entries of a
+  custom rule set which changed, or of another cerberus version, are not
+  used any more.
+
+A later process loads the schema without expanding or validating it again.
+The in-process cache of :mod:`learn_cerberus.cache` is checked first.
+
+Usage::
+
+    disk_cache = SchemaDiskCache("/tmp/schemas")
+    v = disk_cache.cached_validator(schema, MyValidator)
+
+The entries are pickles: the default directory belongs to the current user,
+is created with mode ``0o700``, and a directory or entry which another user
+owns or can write to is never read (see :func:`is_private`). Schemas with
+lambdas or local functions are cached in memory only.
+"""
+
+from __future__ import print_function
+import hashlib
+import os
+import pickle
+import re
+import sys
+import tempfile
+
+import cerberus
+import cerberus.schema
+from cerberus import Validator, errors
+from cerberus.platform import Mapping
+from cerberus.schema import DefinitionSchema, SchemaValidationSchema
+
+from .cache import registry_entries, registry_key, schema_cache, schema_key
+
+#: changed when the content of the entries changes
+FORMAT_VERSION = 1
+
+
+def default_directory():
+    """``$LEARN_CERBERUS_SCHEMA_CACHE``, or a directory of the user cache
+    directory, ``$XDG_CACHE_HOME`` or ``~/.cache``, or of the temporary
+    directory, suffixed with the uid.
+    """
+    directory = os.environ.get("LEARN_CERBERUS_SCHEMA_CACHE")
+    if directory:
+        return directory
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    if os.path.isabs(cache_home):
+        return os.path.join(cache_home, "learn_cerberus", "schemas")
+    return os.path.join(tempfile.gettempdir(),
+                        "learn_cerberus_schemas-%s" % getattr(os, "getuid", lambda: "")())
+
+
+def is_private(stat_result):
+    """``True`` if a file or directory is owned by the current user and no
+    other user can write to it. Always ``True`` where there are no uids.
+    """
+    if not hasattr(os, "getuid"):  # pragma: no cover
+        return True
+    return stat_result.st_uid == os.getuid() and not stat_result.st_mode & 0o022
+
+
+def _canonical(obj):
+    """A representation of ``obj`` which is the same in every process.
+    """
+    if isinstance(obj, Mapping):
+        return ("dict", sorted((repr(_canonical(key)), _canonical(value))
+                               for key, value in obj.items()))
+    if isinstance(obj, (list, tuple)):
+        return ("list", [_canonical(value) for value in obj])
+    if isinstance(obj, (set, frozenset)):
+        return ("set", sorted(repr(_canonical(value)) for value in obj))
+    if isinstance(obj, type(re.compile(""))):
+        return ("regex", obj.pattern, obj.flags)
+    if callable(obj):
+        name = "%s.%s" % (getattr(obj, "__module__", None),
+                          getattr(obj, "__qualname__", getattr(obj, "__name__", None)))
+        code = getattr(obj, "__code__", None)
+        if "<" in name and code is not None:  # a lambda or a local function
+            name += ":" + hashlib.sha256(code.co_code + repr(code.co_consts).encode()).hexdigest()
+        return ("callable", name)
+    return (type(obj).__name__, repr(obj))
+
+
+def schema_fingerprint(schema):
+    """A hex digest of a schema, equal for equal schemas in every process.
+    """
+    return hashlib.sha256(repr(_canonical(schema)).encode("utf-8")).hexdigest()
+
+
+def rules_fingerprint(validator_class=Validator):
+    """A hex digest of the cerberus and python versions and the rule set of
+    ``validator_class``: the rules, the normalization rules, the types.
+    """
+    return hashlib.sha256(repr((
+        FORMAT_VERSION,
+        cerberus.__version__,
+        tuple(sys.version_info[:2]),
+        validator_class.__module__ + "." + validator_class.__name__,
+        _canonical(validator_class.validation_rules),
+        _canonical(validator_class.normalization_rules),
+        sorted(validator_class.types),
+    )).encode("utf-8")).hexdigest()
+
+
+def _definition_schema(validator, expanded):
+    """A ``DefinitionSchema`` of an already expanded and validated schema, the
+    same as ``DefinitionSchema(validator, expanded)`` without expanding and
+    validating it.
+    """
+    definition = DefinitionSchema.__new__(DefinitionSchema)  # creates SchemaValidator
+    definition.validator = validator
+    definition.validation_schema = SchemaValidationSchema(validator)
+    definition.schema_validator = cerberus.schema.SchemaValidator(
+        None,
+        allow_unknown=definition.validation_schema,
+        error_handler=errors.SchemaErrorHandler,
+        target_schema=expanded,
+        target_validator=validator,
+    )
+    definition.schema = expanded
+    return definition
+
+
+class SchemaDiskCache(object):
+    """Prepared schemas stored in a directory, one file per schema and rule
+    set.
+
+    :param directory: created with mode ``0o700`` if needed, see
+        :func:`default_directory` for the default one.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or default_directory()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._rules_fingerprints = dict()
+
+    def key(self, schema, validator_class=Validator):
+        rules = self._rules_fingerprints.get(validator_class)
+        if rules is None:
+            rules = self._rules_fingerprints[validator_class] = rules_fingerprint(validator_class)
+        return "%s-%s" % (rules[:16], schema_fingerprint((schema, registry_entries(schema))))
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".pickle")
+
+    def _private_directory(self, create=False):
+        """``True`` if the directory exists, or was created, and is private.
+        """
+        if create and not os.path.isdir(self.directory):
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        try:
+            return is_private(os.stat(self.directory))
+        except OSError:
+            return False
+
+    def load(self, key):
+        """The expanded schema stored under ``key``, ``None`` if there is
+        none, it can't be read, or the directory or the file isn't private.
+        """
+        try:
+            if not self._private_directory():
+                raise IOError("not a private directory: %r" % self.directory)
+            with open(self._path(key), "rb") as f:
+                if not is_private(os.fstat(f.fileno())):
+                    raise IOError("not a private file: %r" % self._path(key))
+                stored_key, expanded = pickle.load(f)
+        except (IOError, OSError, EOFError, ValueError, pickle.UnpicklingError,
+                AttributeError, ImportError):
+            self.misses += 1
+            return None
+        if stored_key != key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return expanded
+
+    def store(self, key, expanded):
+        """Write an expanded schema, atomically.
+
+        :return: ``False`` if it can't be pickled, e.g. it has a lambda, or the
+            directory isn't private.
+        """
+        try:
+            data = pickle.dumps((key, expanded), pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, AttributeError, TypeError):
+            return False
+        if not self._private_directory(create=True):
+            return False
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.writes += 1
+        return True
+
+    def prepared_schema(self, schema, validator_class=Validator):
+        """The prepared schema of ``validator_class(schema)``, from the
+        in-process cache, this directory, or prepared and stored.
+
+        :raises cerberus.SchemaError: if the schema is invalid, nothing is
+            cached then.
+        """
+        def create():
+            key = self.key(schema, validator_class)
+            expanded = self.load(key)
+            if expanded is not None:
+                validator = validator_class()
+                definition = validator.schema = _definition_schema(validator, expanded)
+                return definition
+            definition = validator_class(schema).schema
+            self.store(key, definition.schema)
+            return definition
+
+        return schema_cache.get_or_create(
+            (validator_class, schema_key(schema), registry_key(schema)), create)
+
+    def cached_validator(self, schema, validator_class=Validator, **kwargs):
+        """Create ``validator_class(schema, **kwargs)`` with a prepared schema
+        of this cache.
+        """
+        return validator_class(self.prepared_schema(schema, validator_class), **kwargs)
+
+    def clear(self):
+        """Delete all the stored schemas.
+        """
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".pickle"):
+                    os.unlink(os.path.join(self.directory, name))
+
+    @property
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "writes": self.writes}
+
+
+def example_disk_cache():
+    import shutil
+    import time
+
+    from .cache import clear_caches
+
+    class MyValidator(Validator):
+        def _validate_isodd(self, isodd, field, value):
+            """{'type': 'boolean'}"""
+            if isodd and not bool(value & 1):
+                self._error(field, "Must be an odd number")
+
+    def make_schemas():
+        return [
+            {
+                "name_%d" % i: {"type": "string", "minlength": 1, "regex": "[a-z]+"},
+                "age_%d" % i: {"type": "integer", "min": 0, "isodd": True},
+                "tags_%d" % i: {"type": "list", "schema": {"type": "string"}},
+                "value_%d" % i: {"anyof_type": ["integer", "string"], "coerce": int},
+            }
+            for i in range(100)
+        ]
+
+    assert schema_fingerprint(make_schemas()[0]) == schema_fingerprint(make_schemas()[0])
+    assert schema_fingerprint(make_schemas()[0]) != schema_fingerprint(make_schemas()[1])
+    assert rules_fingerprint(MyValidator) != rules_fingerprint(Validator)
+
+    directory = tempfile.mkdtemp()
+    try:
+        def start_process():  # a new process has none of the in-process caches
+            clear_caches()
+            MyValidator.clear_caches()
+            started = time.perf_counter()
+            validators = [disk_cache.cached_validator(schema, MyValidator)
+                          for schema in make_schemas()]
+            return validators, time.perf_counter() - started
+
+        disk_cache = SchemaDiskCache(directory)
+        validators, t_cold = start_process()
+        assert disk_cache.stats == {"hits": 0, "misses": 100, "writes": 100}
+        validators, t_warm = start_process()
+        assert disk_cache.stats["hits"] == 100
+
+        v = validators[3]
+        assert v.validate({"name_3": "alice", "age_3": 7, "value_3": "12"}) is True
+        assert v.validate({"name_3": "Alice", "age_3": 8}) is False
+        assert v.errors == {"age_3": ["Must be an odd number"],
+                            "name_3": ["value does not match regex '[a-z]+'"]}
+        assert "anyof" in v.schema["value_3"]  # the expanded schema
+
+        os.chmod(directory, 0o777)  # other users could plant entries
+        start_process()
+        assert disk_cache.stats["hits"] == 100 and disk_cache.stats["writes"] == 100
+        os.chmod(directory, 0o700)
+        print("100 schemas, prepared: %.1f ms, loaded from %s: %.1f ms" % (
+            t_cold * 1e3, directory, t_warm * 1e3))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    """
+    """
+    example_disk_cache()
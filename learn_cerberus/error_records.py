@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compact validation errors, see ``p4_error_handling``.
+
+A ``cerberus.errors.ValidationError`` has a ``__dict__``, new document and
+schema path tuples and a reference to the invalid value, which keeps large
+payloads alive as long as the error. For workers which hold many errors:
+
+- :class:`ErrorRecord`: a ``ValidationError`` with ``__slots__``, same
+  attributes and behavior.
+- :class:`PathInterner`: one tuple per distinct path, shared by the errors of
+  all the documents of the same shape. :data:`path_interner` is the process
+  wide one.
+- :class:`CompactErrors`: mixin for ``Validator`` which creates
+  :class:`ErrorRecord` with interned paths, and without the value with
+  ``keep_error_values=False``.
+- :class:`ErrorArray`: stores errors column wise in ``array.array``, with the
+  row they belong to, for hundreds of thousands of errors.
+
+Without the values, the ``info`` of the errors which may hold one, e.g. the
+unallowed values of ``allowed``, is shortened too, see :func:`summarize_info`.
+
+Usage::
+
+    v = CompactErrorsValidator(schema, keep_error_values=False)
+    store = ErrorArray(keep_values=False)
+    for row, document in enumerate(documents):
+        if not v.validate(document):
+            store.extend(v._errors, row)
+"""
+
+from __future__ import print_function
+from array import array
+
+from cerberus import Validator, errors
+from cerberus.errors import ValidationError
+
+_MISSING = object()
+
+#: the longest ``info`` item kept by :func:`summarize_info`
+MAX_INFO_LENGTH = 80
+
+
+def _summarize(item, limit):
+    if item is None or isinstance(item, (bool, int, float)):
+        return item
+    text = item if isinstance(item, str) else repr(item)
+    if len(text) > limit:
+        text = text[:limit - 3] + "..."
+    return text
+
+
+def summarize_info(info, limit=MAX_INFO_LENGTH):
+    """The ``info`` of an error without the values it may hold: numbers,
+    booleans and ``None`` are kept, anything else is replaced by its
+    ``repr``, shortened to ``limit`` characters.
+    """
+    return tuple(_summarize(item, limit) for item in info)
+
+
+class PathInterner(object):
+    """Returns one shared tuple for equal paths.
+
+    :param maxsize: paths seen after this many distinct ones aren't interned
+        any more, e.g. the indexes of an unexpectedly long list.
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._paths = dict()
+
+    def __len__(self):
+        return len(self._paths)
+
+    def intern(self, path):
+        interned = self._paths.get(path, _MISSING)
+        if interned is not _MISSING:
+            return interned
+        if len(self._paths) >= self.maxsize:
+            return path
+        return self._paths.setdefault(path, path)
+
+    def clear(self):
+        self._paths.clear()
+
+
+path_interner = PathInterner()
+
+
+class ErrorRecord(object):
+    """A ``cerberus.errors.ValidationError`` without ``__dict__``."""
+
+    __slots__ = ("document_path", "schema_path", "code", "rule", "constraint",
+                 "value", "info")
+
+    __init__ = ValidationError.__init__
+    __eq__ = ValidationError.__eq__
+    __hash__ = ValidationError.__hash__
+    __lt__ = ValidationError.__lt__
+    __repr__ = ValidationError.__repr__
+    child_errors = ValidationError.child_errors
+    definitions_errors = ValidationError.definitions_errors
+    field = ValidationError.field
+    is_group_error = ValidationError.is_group_error
+    is_logic_error = ValidationError.is_logic_error
+    is_normalization_error = ValidationError.is_normalization_error
+
+    @classmethod
+    def from_error(cls, error, keep_value=True, interner=path_interner):
+        """Convert a ``ValidationError``, and the errors of a group error.
+        """
+        info = error.info
+        if error.is_group_error:
+            child_errors = errors.ErrorList(
+                cls.from_error(child, keep_value, interner) for child in info[0])
+            rest = tuple(info[1:]) if keep_value else summarize_info(info[1:])
+            info = (child_errors,) + rest
+        elif not keep_value:
+            info = summarize_info(info)
+        return cls(
+            interner.intern(error.document_path), interner.intern(error.schema_path),
+            error.code, error.rule, error.constraint,
+            error.value if keep_value else None, info,
+        )
+
+
+class CompactErrors(object):
+    """Mixin for ``Validator`` and its subclasses, submits
+    :class:`ErrorRecord` with interned paths instead of ``ValidationError``.
+
+    ``keep_error_values=False`` doesn't keep the invalid values, the messages
+    which show it, e.g. ``unallowed value ...``, show ``None``, and shortens
+    the ``info`` which may hold them, see :func:`summarize_info`. The
+    interner is given by the ``_error_paths`` option, :data:`path_interner`
+    by default, and is shared with the child validators.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("_error_paths", path_interner)
+        super(CompactErrors, self).__init__(*args, **kwargs)
+
+    def _error(self, *args):
+        if len(args) < 2 or isinstance(args[1], str):  # bulk or custom error
+            super(CompactErrors, self)._error(*args)
+            return
+
+        # same as Validator._error, with an ErrorRecord
+        field, definition, info = args[0], args[1], args[2:]
+        code, rule = definition.code, definition.rule
+        interner = self._config["_error_paths"]
+
+        document_path = self.document_path + (field,)
+        schema_path = self.schema_path
+        if code != errors.UNKNOWN_FIELD.code and rule is not None:
+            schema_path += (field, rule)
+
+        if not rule:
+            constraint = None
+        else:
+            rules_set = self._resolve_rules_set(self._resolve_schema(self.schema)[field])
+            if rule == "nullable":
+                constraint = rules_set.get(rule, False)
+            elif rule == "required":
+                constraint = rules_set.get(rule, self.require_all)
+                if rule not in rules_set:
+                    schema_path = "__require_all__"
+            else:
+                constraint = rules_set[rule]
+
+        if self._config.get("keep_error_values", True):
+            value = self.document.get(field)
+        else:
+            value = None
+            if not code & errors.ERROR_GROUP.code:
+                info = summarize_info(info)
+
+        self.recent_error = ErrorRecord(
+            interner.intern(document_path), interner.intern(schema_path),
+            code, rule, constraint, value, info,
+        )
+        self._error([self.recent_error])
+
+
+class CompactErrorsValidator(CompactErrors, Validator):
+    """``cerberus.Validator`` which submits :class:`ErrorRecord`.
+    """
+
+
+class ErrorArray(object):
+    """Errors of many documents, stored column wise. The codes, paths and
+    rules are ``array.array`` of small integers, the paths and rules are
+    stored once in a table.
+
+    :param keep_values: ``False`` to drop the invalid values, and shorten the
+        ``info`` which may hold them.
+    """
+
+    def __init__(self, keep_values=True):
+        self.keep_values = keep_values
+        self.rows = array("l")
+        self.codes = array("H")
+        self.document_paths = array("l")
+        self.schema_paths = array("l")
+        self.rules = array("l")
+        self.constraints = list()
+        self.infos = list()
+        self.values = list() if keep_values else None
+        self._table = list()  # the distinct paths and rules
+        self._index = dict()
+        self._by_row = dict()  # row -> the indexes of its errors
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _index_of(self, item):
+        index = self._index.get(item)
+        if index is None:
+            index = self._index[item] = len(self._table)
+            self._table.append(item)
+        return index
+
+    def append(self, error, row=0):
+        info = error.info or ()
+        if error.is_group_error:
+            error = ErrorRecord.from_error(error, self.keep_values)
+            info = error.info
+        elif not self.keep_values and info:
+            info = summarize_info(info)
+        self._by_row.setdefault(row, []).append(len(self.codes))
+        self.rows.append(row)
+        self.codes.append(error.code)
+        self.document_paths.append(self._index_of(error.document_path))
+        self.schema_paths.append(self._index_of(error.schema_path))
+        self.rules.append(self._index_of(error.rule))
+        self.constraints.append(error.constraint)
+        self.infos.append(info)
+        if self.keep_values:
+            self.values.append(error.value)
+
+    def extend(self, validation_errors, row=0):
+        for error in validation_errors:
+            self.append(error, row)
+
+    def __getitem__(self, i):
+        table = self._table
+        return ErrorRecord(
+            table[self.document_paths[i]], table[self.schema_paths[i]], self.codes[i],
+            table[self.rules[i]], self.constraints[i],
+            self.values[i] if self.keep_values else None, self.infos[i],
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def errors_of(self, row):
+        """The errors of one row, as a ``cerberus.errors.ErrorList``.
+        """
+        return errors.ErrorList(self[i] for i in self._by_row.get(row, ()))
+
+
+def example_error_records():
+    import sys
+    import tracemalloc
+
+    schema = {
+        "sku": {"type": "string", "regex": "sku-[0-9]+"},
+        "price": {"type": "integer", "min": 0},
+        "tags": {"type": "list", "schema": {"type": "string"}},
+        "value": {"anyof": [{"type": "string"}, {"type": "integer"}]},
+    }
+
+    def make_documents():  # large invalid payloads, only kept alive by the errors
+        for i in range(2000):
+            yield {"sku": "x" * 1000, "price": -i, "tags": ["a", i], "value": 1.5}
+
+    documents = list(make_documents())[:50]
+
+    v, cv = Validator(schema), CompactErrorsValidator(schema)
+    for document in documents:
+        assert cv.validate(document) is v.validate(document)
+        assert cv.errors == v.errors
+        assert all(isinstance(error, ErrorRecord) for error in cv._errors)
+
+    store = ErrorArray(keep_values=False)
+    store.extend(v._errors, row=7)
+    assert store.errors_of(7) == v._errors
+    assert v.error_handler(store.errors_of(7)) == v.errors
+    assert store.errors_of(8) == []
+
+    # the unallowed values of ``allowed`` are in the info, shortened without the values
+    v = Validator({"codes": {"type": "list", "allowed": ["a", "b"]}})
+    v.validate({"codes": ["a"] + ["x" * 1000] * 100})
+    store = ErrorArray(keep_values=False)
+    store.extend(v._errors, row=0)
+    info = store.errors_of(0)[0].info
+    assert len(info[0]) == MAX_INFO_LENGTH and info[0].endswith("...")
+
+    def hold_errors(validator):
+        held = list()
+        for document in make_documents():
+            validator.validate(document)
+            held.append(validator._errors)
+        return held
+
+    def hold_in_array(validator):
+        store = ErrorArray(keep_values=False)
+        for row, document in enumerate(make_documents()):
+            validator.validate(document)
+            store.extend(validator._errors, row)
+        return store
+
+    for label, func, validator in [
+        ("ValidationError", hold_errors, Validator(schema)),
+        ("ErrorRecord", hold_errors, CompactErrorsValidator(schema, keep_error_values=False)),
+        ("ErrorArray", hold_in_array, Validator(schema)),
+    ]:
+        tracemalloc.start()
+        held = func(validator)
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        n = len(held) if label == "ErrorArray" else sum(len(errs) for errs in held)
+        print("%-16s %6d errors held: %8.1f KB" % (label, n, current / 1024.0))
+        del held
+    print("ErrorRecord: %d bytes, ValidationError: %d bytes + its __dict__" % (
+        sys.getsizeof(cv._errors[0]), sys.getsizeof(v._errors[0])))
+
+
+if __name__ == "__main__":
+    """
+    """
+    example_error_records()
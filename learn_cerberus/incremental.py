@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Incremental re-validation of a document of which only a few fields changed,
+e.g. after a PATCH.
+
+:class:`IncrementalChecks` remembers the last validated document and the
+errors of each of its top level fields. Given the paths which changed, it
+normalizes and validates only the affected top level fields again and keeps
+the results of the other ones:
+
+- the top level fields of the changed paths, ``customer`` for
+  ``customer.age``. A field is always checked as a whole, so the ``*of``
+  rules enclosing a changed path are checked again with it.
+- the fields whose ``dependencies`` refer to one of them, also through a
+  ``^root`` path in a sub-schema or a ``*of`` definition.
+- all the fields involved in ``excludes`` rules, when one of them is
+  affected, as they decide together which fields are required.
+
+Usage::
+
+    v = IncrementalValidator(schema)
+    v.validate(document)
+    v.validate(new_document, changed=["customer.age"])
+    # or
+    v.patch({"customer": {"age": 31}})
+
+Schemas which ``rename`` top level fields, and validators which purge
+unknown or read only fields, are always validated as a whole. A
+``default_setter`` sees the already normalized values of the unchanged
+fields.
+"""
+
+from __future__ import print_function
+
+from cerberus import Validator, errors
+from cerberus.platform import Mapping
+
+from .compiled import _sort_like_validator
+from .dependencies import compile_dependencies
+
+_OF_RULES = ("allof", "anyof", "noneof", "oneof")
+_RENAME_RULES = ("rename", "rename_handler")
+
+#: removes a field with :meth:`IncrementalChecks.patch`
+DELETE = object()
+
+
+def split_path(path):
+    """``"customer.age"`` or ``("customer", "age")`` -> ``("customer", "age")``
+    """
+    if isinstance(path, tuple):
+        return path
+    return tuple(path.split("."))
+
+
+def merge_patch(document, diff):
+    """Apply a JSON merge patch style ``diff`` to a copy of ``document``.
+    Nested dicts are merged, :data:`DELETE` removes a field, only the dicts
+    on the way to the changes are copied.
+
+    :return: ``(new document, changed paths)``
+    """
+    result = dict(document)
+    changed = list()
+    for field, value in diff.items():
+        if value is DELETE:
+            result.pop(field, None)
+            changed.append((field,))
+        elif isinstance(value, Mapping) and isinstance(result.get(field), Mapping):
+            result[field], sub_changed = merge_patch(result[field], value)
+            changed.extend((field,) + path for path in sub_changed)
+        else:
+            result[field] = value
+            changed.append((field,))
+    return result, changed
+
+
+def _is_required_error(error):
+    """Submitted by the required fields check, after all the other errors."""
+    return error.code == errors.REQUIRED_FIELD.code and len(error.document_path) == 1
+
+
+def _errors_by_field(validation_errors):
+    by_field = dict()
+    for error in validation_errors:
+        by_field.setdefault(error.document_path[0], list()).append(error)
+    return by_field
+
+
+class IncrementalChecks(object):
+    """Mixin for ``Validator`` and its subclasses, validates only the fields
+    affected by a change when ``validate`` gets the ``changed`` paths.
+    """
+
+    _affected = None  # the top level fields checked by the running validation
+    _submitted = None  # the errors in the order they were submitted
+    _last = None  # (document, update, normalize, {field: submitted errors})
+    _dependents = None
+
+    def _referenced_fields(self, rules, nested):
+        """The top level fields the ``dependencies`` in ``rules`` refer to:
+        all of them at the top level, the ``^`` ones in the sub-schemas.
+        """
+        names = set()
+        rules = self._resolve_rules_set(rules)
+        if not isinstance(rules, Mapping):
+            return names
+        if "dependencies" in rules:
+            for _, from_root, parts, _ in compile_dependencies(rules["dependencies"])[1]:
+                if from_root or not nested:
+                    names.add(parts[0])
+        for operator in _OF_RULES:
+            for definition in rules.get(operator, ()):
+                names |= self._referenced_fields(definition, nested)
+        for rule in ("keysrules", "valuesrules", "keyschema", "valueschema"):
+            if rule in rules:
+                names |= self._referenced_fields(rules[rule], True)
+        for definition in rules.get("items", ()):
+            names |= self._referenced_fields(definition, True)
+        schema = rules.get("schema")
+        if schema is not None:
+            schema = self._resolve_schema(schema)
+            if any(rule in self.rules for rule in schema):  # the rules of list items
+                names |= self._referenced_fields(schema, True)
+            else:
+                for field_rules in schema.values():
+                    names |= self._referenced_fields(field_rules, True)
+        return names
+
+    def _dependency_map(self):
+        """``({field: fields depending on it}, fields of excludes rules,
+        can validate incrementally)``, computed once per schema.
+        """
+        schema = self.schema
+        if self._dependents is not None and self._dependents[0] is schema:
+            return self._dependents[1]
+
+        dependents = dict()
+        exclusive = set()
+        incremental = not (self.purge_unknown or self.purge_readonly)
+        for field, rules in schema.items():
+            rules = self._resolve_rules_set(rules)
+            for name in self._referenced_fields(rules, False):
+                dependents.setdefault(name, set()).add(field)
+            if "excludes" in rules:
+                excludes = rules["excludes"]
+                exclusive.add(field)
+                exclusive.update([excludes] if isinstance(excludes, str) else excludes)
+            if any(rule in rules for rule in _RENAME_RULES):
+                incremental = False
+        result = (dependents, exclusive, incremental)
+        self._dependents = (schema, result)
+        return result
+
+    def affected_fields(self, changed):
+        """The top level fields to check again when the ``changed`` paths
+        changed.
+        """
+        dependents, exclusive, _ = self._dependency_map()
+        changed_fields = set(split_path(path)[0] for path in changed)
+        affected = set(changed_fields)
+        for field in changed_fields:
+            affected |= dependents.get(field, set())
+        if affected & exclusive:
+            affected |= exclusive
+        return affected
+
+    @property
+    def field_errors(self):
+        """``{top level field: errors}`` of the last validation.
+        """
+        if self._last is None:
+            return dict()
+        return dict((field, errors.ErrorList(sorted(field_errors)))
+                    for field, field_errors in self._last[3].items())
+
+    def _error(self, *args):
+        if len(args) == 1 and self._submitted is not None:
+            args = (list(args[0]),)
+            self._submitted.extend(args[0])
+        super(IncrementalChecks, self)._error(*args)
+
+    def validate(self, document, schema=None, update=False, normalize=True, changed=None):
+        """``Validator.validate``, with the ``changed`` paths (dotted strings
+        or tuples) between the last validated document and this one. The
+        unchanged fields of ``document`` are ignored, the ones of the last
+        document are used.
+        """
+        if (
+            self.is_child
+            or changed is None
+            or schema is not None
+            or self._last is None
+            or self._last[1:3] != (update, normalize)
+            or not self._dependency_map()[2]
+        ):
+            self._submitted = None if self.is_child else list()
+            try:
+                result = super(IncrementalChecks, self).validate(
+                    document, schema, update, normalize)
+            finally:
+                submitted, self._submitted = self._submitted, None
+            if not self.is_child:
+                self._last = (self.document, update, normalize,
+                              _errors_by_field(submitted))
+            return result
+
+        last_document, _, _, last_errors = self._last
+        affected = self.affected_fields(changed)
+        working = dict()  # in the order of document, like Validator
+        for field in document:
+            if field in affected:
+                working[field] = document[field]
+            elif field in last_document:
+                working[field] = last_document[field]
+        for field in last_document:  # e.g. the default values
+            if field not in working and field not in affected:
+                working[field] = last_document[field]
+
+        self._affected, self._submitted = affected, list()
+        try:
+            super(IncrementalChecks, self).validate(working, None, update, normalize)
+        finally:
+            submitted, self._affected, self._submitted = self._submitted, None, None
+
+        by_field = dict(
+            (field, kept) for field, kept in last_errors.items() if field not in affected)
+        for field, new_errors in _errors_by_field(submitted).items():
+            if field in affected:
+                by_field[field] = new_errors
+        self._last = (self.document, update, normalize, by_field)
+
+        # submit them in the order of Validator: the fields in the order of
+        # the document, then the required fields
+        ordered = list()
+        for field in self.document:
+            ordered.extend(error for error in by_field.get(field, ())
+                           if not _is_required_error(error))
+        ordered.extend(error for error in submitted
+                       if _is_required_error(error) and error.document_path[0] in affected)
+        for field, kept in by_field.items():
+            if field not in affected:
+                ordered.extend(error for error in kept if _is_required_error(error))
+        self._errors = _sort_like_validator(ordered)
+        self.document_error_tree = errors.DocumentErrorTree(ordered)
+        self.schema_error_tree = errors.SchemaErrorTree(ordered)
+        return not self._errors
+
+    __call__ = validate
+
+    def patch(self, diff, update=False, normalize=True):
+        """Apply a merge patch to the last validated document, see
+        :func:`merge_patch`, and validate the affected fields.
+        """
+        if self._last is None:
+            raise ValueError("validate a document before patching it")
+        document, changed = merge_patch(self._last[0], diff)
+        return self.validate(document, update=update, normalize=normalize, changed=changed)
+
+    # the top level steps of Validator.validate, restricted to the affected fields
+
+    def _BareValidator__normalize_mapping(self, mapping, schema):
+        if self._affected is not None and mapping is self.document:
+            schema = dict(
+                (field, schema[field]) for field in self._affected if field in schema)
+        return super(IncrementalChecks, self)._BareValidator__normalize_mapping(
+            mapping, schema)
+
+    def _BareValidator__validate_definitions(self, definitions, field):
+        if self._affected is None or field in self._affected:
+            super(IncrementalChecks, self)._BareValidator__validate_definitions(
+                definitions, field)
+
+    def _BareValidator__validate_unknown_fields(self, field):
+        if self._affected is None or field in self._affected:
+            super(IncrementalChecks, self)._BareValidator__validate_unknown_fields(field)
+
+
+class IncrementalValidator(IncrementalChecks, Validator):
+    """``cerberus.Validator`` with incremental re-validation.
+    """
+
+
+def example_incremental():
+    import random
+    import timeit
+
+    # the customer of dict_type_example in lsn01_quickstart.py, in a large document
+    schema = {
+        "customer": {
+            "type": "dict",
+            "required": True,
+            "schema": {
+                "firstname": {"type": "string", "required": True},
+                "lastname": {"type": "string", "required": True},
+                "age": {"type": "integer", "required": True, "min": 0},
+            },
+        },
+        "email": {"type": "string", "dependencies": "customer.firstname"},
+        "rank": {"anyof": [{"type": "integer", "min": 1},
+                           {"type": "string", "allowed": ["vip"]}]},
+        "coupon": {"type": "string", "excludes": "discount"},
+        "discount": {"type": "number", "excludes": "coupon"},
+    }
+    for i in range(200):
+        schema["item%d" % i] = {"type": "dict", "schema": {
+            "sku": {"type": "string", "regex": "sku-[0-9]+"},
+            "quantity": {"type": "integer", "min": 1},
+        }}
+    document = {
+        "customer": {"firstname": "Alice", "lastname": "Doe", "age": 30},
+        "email": "alice@example.com", "rank": 3, "coupon": "SPRING",
+    }
+    for i in range(200):
+        document["item%d" % i] = {"sku": "sku-%d" % i, "quantity": i + 1}
+
+    v, iv = Validator(schema), IncrementalValidator(schema)
+    assert iv.validate(document) is True
+
+    patches = [
+        {"customer": {"age": -1}},
+        {"customer": {"firstname": DELETE}},  # email depends on it
+        {"customer": {"firstname": "Bob", "age": 31}},
+        {"rank": "gold"},
+        {"rank": "vip"},
+        {"discount": 0.1},  # excludes coupon
+        {"coupon": DELETE},
+        {"item7": {"quantity": 0}, "unknown": 1},
+        {"item7": {"quantity": 2}, "unknown": DELETE},
+    ]
+    current = document
+    for diff in patches:
+        current = merge_patch(current, diff)[0]
+        assert iv.patch(diff) is v.validate(current), diff
+        assert iv.errors == v.errors, (diff, iv.errors, v.errors)
+        assert iv.document == v.document
+
+    random.seed(0)
+    diffs = [{"item%d" % random.randrange(200): {"quantity": random.randint(0, 5)}}
+             for _ in range(100)]
+    t_full = timeit.timeit(
+        lambda: [v.validate(merge_patch(current, diff)[0]) for diff in diffs], number=1)
+    t_incremental = timeit.timeit(lambda: [iv.patch(diff) for diff in diffs], number=1)
+    print("PATCH of one field of %d, full: %.0f us, incremental: %.0f us" % (
+        len(schema), t_full / len(diffs) * 1e6, t_incremental / len(diffs) * 1e6))
+
+
+if __name__ == "__main__":
+    """
+    """
+    example_incremental()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Lazy error trees, see ``p4_error_handling``.
+
+``cerberus.Validator`` adds every error to ``document_error_tree`` and
+``schema_error_tree`` as soon as it is submitted, in every child validator
+too, and formats ``errors`` again at every read. When only the number of
+errors is used, most of that work is wasted.
+
+:class:`LazyErrorTrees` keeps the errors flat: ``_errors``, and the errors in
+the order they were submitted. The trees are built when they are read for the
+first time, from the submitted errors, so they are the same as the ones of
+``cerberus.Validator``, and are kept up to date afterwards. ``errors`` is
+formatted at the first read and cached until the next error, every read
+returns a copy of it.
+
+``Validator`` also reads ``document_error_tree`` in the ``dependencies`` and
+``readonly`` rules and between the coercers of a ``coerce`` chain. Those
+lookups are answered from the submitted errors here, the tree isn't built
+for them.
+
+The errors themselves stay ``ValidationError``: ``Validator.validate`` reads
+``_errors`` at the end of every validation, and the child validators pass
+their ``_errors`` to the parent, so a more compact form would be converted
+back for every invalid document anyway.
+
+Usage::
+
+    class MyValidator(LazyErrorTrees, Validator):
+        ...
+
+    v = LazyErrorsValidator(schema)
+    if not v.validate(document):
+        log.info("%d errors", v.error_count)
+"""
+
+from __future__ import print_function
+
+from cerberus import Validator, errors
+from cerberus.platform import Iterable, Mapping, Sequence
+
+
+def _is_empty(tree):
+    return not tree.errors and not tree.descendants
+
+
+def _copy_errors(item):
+    if isinstance(item, dict):
+        return dict((key, _copy_errors(value)) for key, value in item.items())
+    if isinstance(item, list):
+        return [_copy_errors(value) for value in item]
+    return item
+
+
+class LazyErrorTrees(object):
+    """Mixin for ``Validator`` and its subclasses, builds the error trees and
+    the ``errors`` dict only when they are read.
+
+    Assigning an empty tree, as ``Validator`` does at the start of the
+    processing, resets the errors.
+    """
+
+    _document_error_tree = None
+    _schema_error_tree = None
+    _formatted_errors = None
+
+    def _reset_lazy_errors(self):
+        self._error_log = list()  # the errors in the order they were submitted
+        self._formatted_errors = None
+
+    @property
+    def document_error_tree(self):
+        if self._document_error_tree is None:
+            self._document_error_tree = errors.DocumentErrorTree(self._error_log)
+        return self._document_error_tree
+
+    @document_error_tree.setter
+    def document_error_tree(self, tree):
+        self._reset_lazy_errors()
+        self._document_error_tree = None if _is_empty(tree) else tree
+
+    @property
+    def schema_error_tree(self):
+        if self._schema_error_tree is None:
+            self._schema_error_tree = errors.SchemaErrorTree(self._error_log)
+        return self._schema_error_tree
+
+    @schema_error_tree.setter
+    def schema_error_tree(self, tree):
+        self._reset_lazy_errors()
+        self._schema_error_tree = None if _is_empty(tree) else tree
+
+    @property
+    def errors(self):
+        """The errors formatted by the error handler, formatted once until the
+        next error, a copy at every read.
+        """
+        if self._formatted_errors is None:
+            self._formatted_errors = self.error_handler(self._errors)
+        return _copy_errors(self._formatted_errors)
+
+    def _logged_errors(self):
+        # the submitted errors and the errors of the groups, as in the trees
+        pending = list(self._error_log)
+        while pending:
+            error = pending.pop()
+            yield error
+            if error.is_group_error:
+                pending.extend(error.child_errors)
+
+    def _has_error(self, document_path, definition):
+        """``definition in document_error_tree.fetch_errors_from(document_path)``
+        without building the tree.
+        """
+        if self._document_error_tree is not None:
+            return definition in self._document_error_tree.fetch_errors_from(document_path)
+        code = definition.code
+        return any(error.code == code and error.document_path == document_path
+                   for error in self._logged_errors())
+
+    def _has_error_node(self, path):
+        """``document_error_tree.fetch_node_from(path) is not None`` without
+        building the tree.
+        """
+        if self._document_error_tree is not None:
+            return self._document_error_tree.fetch_node_from(path) is not None
+        n = len(path)
+        return any(error.document_path[:n] == path for error in self._logged_errors())
+
+    # the rules of Validator which read the document error tree
+
+    def _validate_dependencies(self, dependencies, field, value):
+        """{'type': ('dict', 'hashable', 'list'), 'check_with': 'dependencies'}"""
+        if isinstance(dependencies, str) or not isinstance(dependencies, (Iterable, Mapping)):
+            dependencies = (dependencies,)
+        if isinstance(dependencies, Sequence):
+            self._BareValidator__validate_dependencies_sequence(dependencies, field)
+        elif isinstance(dependencies, Mapping):
+            self._BareValidator__validate_dependencies_mapping(dependencies, field)
+        if self._has_error_node(self.schema_path + (field, "dependencies")):
+            return True
+
+    def _validate_readonly(self, readonly, field, value):
+        """{'type': 'boolean'}"""
+        if readonly:
+            if not self._is_normalized:
+                self._error(field, errors.READONLY_FIELD)
+            if self._is_normalized and \
+                    self._has_error(self.document_path + (field,), errors.READONLY_FIELD):
+                self._drop_remaining_rules()
+
+    def _BareValidator__normalize_coerce(self, processor, field, value, nullable, error):
+        if isinstance(processor, str) or not isinstance(processor, Iterable):
+            return super(LazyErrorTrees, self)._BareValidator__normalize_coerce(
+                processor, field, value, nullable, error)
+        result = value
+        for p in processor:
+            result = self._BareValidator__normalize_coerce(p, field, result, nullable, error)
+            if self._has_error(self.document_path + (field,), errors.COERCION_FAILED):
+                break
+        return result
+
+    @property
+    def error_count(self):
+        """The number of errors of the last processing, doesn't build
+        anything.
+        """
+        return len(self._errors)
+
+    def _error(self, *args):
+        if len(args) != 1:  # creates the error, then calls _error([error])
+            super(LazyErrorTrees, self)._error(*args)
+            return
+
+        new_errors = list(args[0])
+        self._errors.extend(new_errors)
+        self._errors.sort()
+        self._error_log.extend(new_errors)
+        self._formatted_errors = None
+        for error in new_errors:
+            if self._document_error_tree is not None:
+                self._document_error_tree.add(error)
+            if self._schema_error_tree is not None:
+                self._schema_error_tree.add(error)
+            self.error_handler.emit(error)
+
+
+class LazyErrorsValidator(LazyErrorTrees, Validator):
+    """``cerberus.Validator`` with lazy error trees.
+    """
+
+
+def _tree_nodes(node, path=()):
+    yield path, list(node.errors)
+    for key in sorted(node.descendants, key=repr):
+        for item in _tree_nodes(node.descendants[key], path + (key,)):
+            yield item
+
+
+def example_lazy_errors():
+    import timeit
+
+    schema = {
+        "name": {"type": "string"},
+        "age": {"type": "integer", "min": 0},
+        "email": {"type": "string", "dependencies": "name"},
+        "tags": {"type": "list", "schema": {"type": "string", "maxlength": 5}},
+        "address": {"type": "dict", "schema": {"city": {"type": "string"},
+                                               "zip": {"type": "string"}}},
+        "value": {"anyof": [{"type": "string"}, {"type": "integer", "min": 0}]},
+        "id": {"readonly": True},
+        "count": {"type": "integer", "coerce": [int, abs]},
+    }
+    documents = [
+        {"name": 1, "age": -1, "tags": ["python", 2, "go"] * 5},
+        {"email": "a@b.c", "address": {"city": 1, "zip": 2}, "value": -1},
+        {"name": "alice", "age": 30, "unknown": 1, "tags": []},
+        {"id": 1, "count": "x", "email": "a@b.c"},
+        {"name": "bob", "count": "-3"},
+    ]
+    v, lv = Validator(schema), LazyErrorsValidator(schema)
+    for document in documents:
+        assert lv.validate(document) is v.validate(document)
+        assert lv._document_error_tree is None  # dependencies, readonly, coerce
+        assert lv.error_count == len(v._errors)
+        assert lv.document == v.document
+        assert lv.errors == v.errors and lv.errors is not lv.errors
+        if lv.errors:
+            lv.errors.clear()
+            assert lv.errors == v.errors
+        assert list(_tree_nodes(lv.document_error_tree)) == \
+            list(_tree_nodes(v.document_error_tree))
+        assert list(_tree_nodes(lv.schema_error_tree)) == \
+            list(_tree_nodes(v.schema_error_tree))
+
+    # a pipeline which only logs the number of errors
+    n = 100 * len(documents)
+    t_plain = min(timeit.repeat(
+        lambda: [v.validate(d) or len(v._errors) for d in documents], number=100, repeat=5))
+    t_lazy = min(timeit.repeat(
+        lambda: [lv.validate(d) or lv.error_count for d in documents], number=100, repeat=5))
+    print("Validator: %.0f us/doc, LazyErrorsValidator: %.0f us/doc" % (
+        t_plain / n * 1e6, t_lazy / n * 1e6))
+
+
+if __name__ == "__main__":
+    """
+    """
+    example_lazy_errors()
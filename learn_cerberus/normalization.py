@@ -0,0 +1,393 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Cheaper normalization, see ``type_coercion_example`` and ``non_repeat_list``
+of ``lsn01_quickstart.py``.
+
+``cerberus.Validator`` normalizes every dict and list which has a
+``schema``, ``items``, ``keysrules`` or ``valuesrules`` rule with a child
+validator, which copies it and builds a new one, even when none of their
+rules changes anything. For large documents those copies cost more than the
+validation. Here:
+
+- :class:`CopyOnWriteNormalization`: mixin for ``Validator``, only the
+  containers whose rules may change something (``coerce``, ``default``,
+  ``default_setter``, ``rename``, ``rename_handler``, ``readonly``,
+  ``purge_unknown``, at any depth) are normalized and copied, the other ones
+  are the objects of the input document. ``memoize_coercers=[int, ...]``
+  also memoizes the given ``coerce`` functions, see below.
+- :class:`MemoizedCoercer` / :func:`memoize`: remembers the immutable results
+  of a pure coercer for the hashable values, in a bounded LRU cache. A
+  mutable result, e.g. a list, would be shared by all the documents, the
+  coercer is called again for its value instead.
+- common coercers: :func:`unique` (an O(n) ``non_repeat_list``),
+  :func:`strip`, :func:`lower`, :func:`to_int`, :func:`to_float`,
+  :func:`to_bool`, :func:`split_commas`, :func:`empty_to_none`.
+
+Usage::
+
+    schema = {"tag": {"type": "list", "coerce": unique},
+              "date": {"type": "datetime", "coerce": memoize(parse_date)}}
+    v = CopyOnWriteValidator(schema)
+
+The document of a :class:`CopyOnWriteNormalization` validator shares the
+unchanged dicts and lists with the input document, copy it before
+modifying them.
+"""
+
+from __future__ import print_function
+import datetime
+import decimal
+
+from cerberus import Validator
+from cerberus.platform import Mapping
+
+from .cache import LRUCache
+
+#: the rules which can change a document
+NORMALIZING_RULES = frozenset([
+    "coerce", "default", "default_setter", "rename", "rename_handler", "readonly",
+    "purge_unknown",
+])
+
+_SUBRULES = ("keysrules", "valuesrules", "keyschema", "valueschema")
+
+#: the types of the results a :class:`MemoizedCoercer` remembers, subclasses
+#: may have mutable attributes
+IMMUTABLE_TYPES = frozenset([
+    type(None), bool, int, float, complex, str, bytes, frozenset, decimal.Decimal,
+    datetime.date, datetime.datetime, datetime.time, datetime.timedelta,
+])
+
+_NOT_REMEMBERED = object()
+
+
+def is_immutable(value):
+    """``True`` for the values of :data:`IMMUTABLE_TYPES`, and the tuples of
+    them.
+    """
+    if type(value) is tuple:
+        return all(is_immutable(item) for item in value)
+    return type(value) in IMMUTABLE_TYPES
+
+
+class MemoizedCoercer(object):
+    """A coercer which remembers its immutable results, for the hashable
+    values. Only for pure functions, the errors it raises aren't remembered.
+
+    :param func: the coercer.
+    :param maxsize: the number of values remembered.
+    """
+
+    def __init__(self, func, maxsize=1024):
+        self.func = func
+        self.maxsize = maxsize
+        self.cache = LRUCache(maxsize=maxsize)
+
+    def __call__(self, value):
+        try:
+            key = (type(value), value)  # 1, 1.0 and True are equal keys
+            hash(key)
+        except TypeError:
+            return self.func(value)
+        result = self.cache.get_or_create(key, lambda: self._remembered(value))
+        if result is _NOT_REMEMBERED:
+            return self.func(value)
+        return result
+
+    def _remembered(self, value):
+        result = self.func(value)
+        return result if is_immutable(result) else _NOT_REMEMBERED
+
+    def __reduce__(self):  # for the worker processes, without the cache
+        return type(self), (self.func, self.maxsize)
+
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, self.func)
+
+
+def memoize(func=None, maxsize=1024):
+    """Decorator, ``func`` as a :class:`MemoizedCoercer`::
+
+        @memoize
+        def parse_date(value):
+            ...
+    """
+    if func is None:
+        return lambda func: MemoizedCoercer(func, maxsize)
+    return MemoizedCoercer(func, maxsize)
+
+
+# common coercers
+
+def unique(value):
+    """The items of a list without the repeated ones, in their first order,
+    as ``non_repeat_list``: ``[2, 1, 2, 3] -> [2, 1, 3]``.
+    """
+    try:
+        return list(dict.fromkeys(value))
+    except TypeError:  # unhashable items
+        pass
+    seen = set()
+    seen_unhashable = list()
+    result = list()
+    for item in value:
+        try:
+            if item in seen:
+                continue
+            seen.add(item)
+        except TypeError:
+            if item in seen_unhashable:
+                continue
+            seen_unhashable.append(item)
+        result.append(item)
+    return result
+
+
+def strip(value):
+    return value.strip()
+
+
+def lower(value):
+    return value.lower()
+
+
+def to_int(value):
+    """``int``, except for floats with a fraction: ``"12" -> 12``,
+    ``2.0 -> 2``, ``2.5`` fails.
+    """
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError("%r is not an integer" % value)
+    return int(value)
+
+
+def to_float(value):
+    return float(value)
+
+
+_TRUE = frozenset(["true", "yes", "y", "on", "1"])
+_FALSE = frozenset(["false", "no", "n", "off", "0", ""])
+
+
+def to_bool(value):
+    """``"yes"``, ``"True"``, ``"1"``, ``1`` -> ``True``, ``"no"``, ``"0"``,
+    ``""``, ``0`` -> ``False``.
+    """
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in _TRUE:
+            return True
+        if text in _FALSE:
+            return False
+        raise ValueError("%r is not a boolean" % value)
+    if value in (0, 1):
+        return bool(value)
+    raise ValueError("%r is not a boolean" % value)
+
+
+def split_commas(value):
+    """``"a, b,,c" -> ["a", "b", "c"]``, lists are left as they are."""
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(",") if item.strip()]
+    return value
+
+
+def empty_to_none(value):
+    """``""`` and blank strings -> ``None``."""
+    if isinstance(value, str) and not value.strip():
+        return None
+    return value
+
+
+class CopyOnWriteNormalization(object):
+    """Mixin for ``Validator`` and its subclasses, normalizes only the
+    containers whose rules may change them. The results of the rules
+    analysis are cached in the validator options, shared with the child
+    validators.
+
+    With ``purge_unknown`` or an ``allow_unknown`` rules set all the
+    containers are normalized, as ``Validator`` does.
+
+    ``memoize_coercers`` is a collection of pure coercers of the schema, e.g.
+    ``[int, parse_date]``, used as :class:`MemoizedCoercer`. The other ones
+    are called for every value.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("_normalizing_rules", LRUCache(maxsize=256))
+        kwargs.setdefault("_memoized_coercers", dict())
+        super(CopyOnWriteNormalization, self).__init__(*args, **kwargs)
+
+    def _rules_normalize(self, rules, seen):
+        """``True`` if ``rules`` or a sub-schema has a normalization rule, or
+        may have one.
+        """
+        rules = self._resolve_rules_set(rules)
+        if not isinstance(rules, Mapping):
+            return True
+        if id(rules) in seen:  # a recursive schema of the registry
+            return False
+        seen.add(id(rules))
+        if not NORMALIZING_RULES.isdisjoint(rules):
+            return True
+        if isinstance(rules.get("allow_unknown"), Mapping) and \
+                self._rules_normalize(rules["allow_unknown"], seen):
+            return True
+        for rule in _SUBRULES:
+            if rule in rules and self._rules_normalize(rules[rule], seen):
+                return True
+        items = rules.get("items")
+        if isinstance(items, (list, tuple)) and \
+                any(self._rules_normalize(item_rules, seen) for item_rules in items):
+            return True
+        if "schema" in rules:
+            schema = self._resolve_schema(rules["schema"])
+            if not isinstance(schema, Mapping):
+                return True
+            # the rules of the list items, or the schema of a dict
+            if self._rules_normalize(schema, seen):
+                return True
+            for value in schema.values():
+                if isinstance(value, str) and self.rules_set_registry.get(value) is None:
+                    continue  # a constraint, e.g. of 'type'
+                if isinstance(value, (Mapping, str)) and self._rules_normalize(value, seen):
+                    return True
+        return False
+
+    def _needs_normalization(self, rules):
+        cache = self._config["_normalizing_rules"]
+
+        def create():
+            return rules, self._rules_normalize(rules, set())
+
+        cached = cache.get_or_create(id(rules), create)
+        if cached[0] is not rules:  # the id of dropped rules
+            cache.invalidate(id(rules))
+            cached = cache.get_or_create(id(rules), create)
+        return cached[1]
+
+    def _BareValidator__normalize_containers(self, mapping, schema):
+        if self.purge_unknown or isinstance(self.allow_unknown, Mapping):
+            super(CopyOnWriteNormalization, self)._BareValidator__normalize_containers(
+                mapping, schema)
+            return
+        needed = dict(
+            (field, rules) for field, rules in schema.items()
+            if field in mapping and self._needs_normalization(rules)
+        )
+        if needed:  # the other fields aren't touched
+            super(CopyOnWriteNormalization, self)._BareValidator__normalize_containers(
+                mapping, needed)
+
+    def _BareValidator__normalize_coerce(self, processor, field, value, nullable, error):
+        pure_coercers = self._config.get("memoize_coercers")
+        if pure_coercers and callable(processor) \
+                and not isinstance(processor, MemoizedCoercer):
+            memoized = self._config["_memoized_coercers"]  # coercer -> the one to call
+            try:
+                processor = memoized[processor]
+            except KeyError:
+                processor = memoized.setdefault(
+                    processor,
+                    MemoizedCoercer(processor) if processor in pure_coercers else processor)
+            except TypeError:  # not hashable
+                pass
+        return super(CopyOnWriteNormalization, self)._BareValidator__normalize_coerce(
+            processor, field, value, nullable, error)
+
+
+class CopyOnWriteValidator(CopyOnWriteNormalization, Validator):
+    """``cerberus.Validator`` which copies only the normalized containers.
+    """
+
+
+def example_normalization():
+    import datetime
+    import random
+    import timeit
+
+    def non_repeat_list(value):  # lsn01_quickstart.py
+        new_value = list()
+        for item in value:
+            if item not in new_value:
+                new_value.append(item)
+        return new_value
+
+    for value in (["drama", "crime", "drama"], [1, True, 1.0, 2], [[1], [1], {"a": 1}, 2, 2]):
+        assert unique(value) == non_repeat_list(value)
+
+    # type_coercion_example and non_repeat_list of lsn01_quickstart.py
+    for schema, document in [
+        ({"value": {"type": "number", "coerce": int}}, {"value": "1"}),
+        ({"value": {"type": "number", "coerce": int}}, {"value": "a"}),
+        ({"tag": {"type": "list", "coerce": unique}}, {"tag": ["drama", "crime", "drama"]}),
+        ({"rows": {"type": "list", "schema": {"type": "dict", "schema": {
+            "sku": {"type": "string", "coerce": strip},
+            "price": {"type": "integer", "default": 0}}}}},
+         {"rows": [{"sku": " a "}, {"sku": "b", "price": 1}]}),
+    ]:
+        v, cv = Validator(schema), CopyOnWriteValidator(schema, memoize_coercers=[int, strip])
+        assert cv.validate(document) is v.validate(document)
+        assert cv.document == v.document and cv.errors == v.errors
+
+    # a ~1MB document, the only normalized field is a small one
+    random.seed(0)
+    schema = {
+        "id": {"type": "integer", "coerce": int},
+        "created": {"type": "datetime",
+                    "coerce": lambda s: datetime.datetime.strptime(s, "%Y-%m-%d")},
+        "tags": {"type": "list", "coerce": unique, "schema": {"type": "string"}},
+        "events": {"type": "list", "schema": {"type": "dict", "schema": {
+            "kind": {"type": "string", "allowed": ["click", "view", "buy"]},
+            "at": {"type": "integer", "min": 0},
+            "attrs": {"type": "dict", "valuesrules": {"type": "string"}},
+        }}},
+    }
+    document = {
+        "id": "42", "created": "2020-01-01",
+        "tags": [random.choice("abcdefgh") * 3 for _ in range(2000)],
+        "events": [{"kind": random.choice(["click", "view", "buy"]),
+                    "at": random.randint(0, 10 ** 6),
+                    "attrs": {"page": "/p/%d" % i, "ref": "search"}}
+                   for i in range(8000)],
+    }
+    v, cv = Validator(schema), CopyOnWriteValidator(schema)
+    assert cv.validate(document) is v.validate(document) is True
+    assert cv.document == v.document
+    assert cv.document["events"] is document["events"]  # not copied
+    for label, method in (("normalized", "normalized"), ("validate", "validate")):
+        t_plain = timeit.timeit(lambda: getattr(v, method)(document), number=3) / 3
+        t_cow = timeit.timeit(lambda: getattr(cv, method)(document), number=3) / 3
+        print("~1MB document, %s, Validator: %.0f ms, CopyOnWriteValidator: %.0f ms" % (
+            label, t_plain * 1e3, t_cow * 1e3))
+
+    # memoized coercion of repeated values
+    parse_date = memoize(lambda s: datetime.datetime.strptime(s, "%Y-%m-%d"))
+    dates = ["2020-01-%02d" % random.randint(1, 28) for _ in range(20000)]
+    t_plain = timeit.timeit(
+        lambda: [datetime.datetime.strptime(s, "%Y-%m-%d") for s in dates], number=1)
+    t_memo = timeit.timeit(lambda: [parse_date(s) for s in dates], number=1)
+    print("20k dates, strptime: %.0f ms, memoized: %.0f ms, %s" % (
+        t_plain * 1e3, t_memo * 1e3, parse_date.cache.stats))
+
+    # only the marked coercers are memoized, and only their immutable results
+    calls = list()
+
+    def tag(value):  # impure
+        calls.append(value)
+        return value
+
+    schema = {"n": {"type": "integer", "coerce": tag},
+              "tags": {"type": "list", "coerce": memoize(split_commas)}}
+    cv = CopyOnWriteValidator(schema, memoize_coercers=[int])
+    first = cv.normalized({"n": 1, "tags": "a,b"})
+    second = cv.normalized({"n": 1, "tags": "a,b"})
+    assert calls == [1, 1]
+    assert first["tags"] == second["tags"] and first["tags"] is not second["tags"]
+
+
+if __name__ == "__main__":
+    """
+    """
+    example_normalization()
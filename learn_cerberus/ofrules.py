@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Short-circuit evaluation of the ``allof``, ``anyof``, ``noneof`` and
+``oneof`` rules, see ``p2_validation_rules/p2_ofrules.py``.
+
+``cerberus.Validator`` creates a child validator for every branch of a
+\\*of rule and always validates all the branches, even when the result is
+already known. :class:`ShortCircuitOfRules` stops as soon as the result is
+decided:
+
+- ``anyof``: at the first branch which passes.
+- ``allof``: at the first branch which fails.
+- ``noneof``: at the first branch which passes.
+- ``oneof``: at the second branch which passes.
+
+The branches are tried in the order which decides the result the fastest,
+from their measured mean cost and pass rate, and one child validator is
+reused for all the branches of a rule. When the rule fails, the branches
+which were skipped are validated afterwards, so ``errors`` is exactly the one
+of ``cerberus.Validator``. Pass ``ofrules_full_errors=False`` to skip that
+and report the errors of the evaluated branches only.
+
+Usage::
+
+    class MyValidator(ShortCircuitOfRules, Validator):
+        ...
+
+    v = ShortCircuitValidator(schema)
+"""
+
+from __future__ import print_function
+import time
+
+from cerberus import Validator, errors
+
+
+class OfRuleStats(object):
+    """The branch schemas, measured cost and pass rate of the branches of one
+    \\*of rule.
+    """
+
+    #: the branches are re-ordered every ``reorder_interval`` evaluations
+    reorder_interval = 32
+
+    def __init__(self, field_rules, allow_unknown, schemas):
+        self.field_rules = field_rules
+        self.allow_unknown = allow_unknown
+        self.schemas = schemas
+        n = len(schemas)
+        self.calls = [0] * n
+        self.passes = [0] * n
+        self.elapsed = [0.0] * n
+        self.order = list(range(n))
+        self.n_evaluations = 0
+
+    def matches(self, field_rules, allow_unknown):
+        return self.field_rules is field_rules and self.allow_unknown == allow_unknown
+
+    def record(self, index, passed, elapsed):
+        self.calls[index] += 1
+        self.passes[index] += passed
+        self.elapsed[index] += elapsed
+
+    def cost(self, index):
+        calls = self.calls[index]
+        return self.elapsed[index] / calls if calls else 0.0
+
+    def pass_rate(self, index):
+        # smoothed, an unseen branch has a pass rate of 0.5
+        return (self.passes[index] + 1.0) / (self.calls[index] + 2.0)
+
+    def reorder(self, stop_on_pass):
+        """Sort the branches by expected cost per decisive outcome, the
+        classic ordering for short-circuit ``or`` (``stop_on_pass``) and
+        ``and`` evaluation.
+        """
+        if stop_on_pass:
+            def key(i):
+                return self.cost(i) / self.pass_rate(i)
+        else:
+            def key(i):
+                return self.cost(i) / (1.0 - self.pass_rate(i))
+        self.order = sorted(range(len(self.schemas)), key=key)
+
+    def summary(self):
+        return [
+            {
+                "branch": i,
+                "calls": self.calls[i],
+                "pass_rate": float(self.passes[i]) / self.calls[i] if self.calls[i] else None,
+                "mean_time": self.cost(i),
+            }
+            for i in self.order
+        ]
+
+
+#: operator -> (error definition, stop on pass, is_decided(valids, failures))
+_OPERATORS = {
+    "anyof": (errors.ANYOF, True, lambda valids, failures: valids > 0),
+    "allof": (errors.ALLOF, False, lambda valids, failures: failures > 0),
+    "noneof": (errors.NONEOF, True, lambda valids, failures: valids > 0),
+    "oneof": (errors.ONEOF, True, lambda valids, failures: valids > 1),
+}
+
+
+def _is_valid(operator, valids, n_definitions):
+    if operator == "anyof":
+        return valids >= 1
+    if operator == "allof":
+        return valids == n_definitions
+    if operator == "noneof":
+        return valids == 0
+    return valids == 1
+
+
+class ShortCircuitOfRules(object):
+    """Mixin for ``Validator`` and its subclasses, evaluates the \\*of rules
+    with short-circuit. The branch statistics are kept in the validator
+    options, so they are shared with the child validators.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("_ofrules_stats", dict())
+        super(ShortCircuitOfRules, self).__init__(*args, **kwargs)
+
+    @property
+    def ofrules_stats(self):
+        """``{schema path of the rule: OfRuleStats}``
+        """
+        return self._config["_ofrules_stats"]
+
+    def _ofrule_stats(self, operator, definitions, field):
+        path = self.schema_path + (field, operator)
+        field_rules = self.schema[field]
+        stats = self.ofrules_stats.get(path)
+        if stats is None or not stats.matches(field_rules, self.allow_unknown):
+            schemas = list()
+            for definition in definitions:  # same as Validator.__validate_logical
+                schema = {field: definition.copy()}
+                for rule in ("allow_unknown", "type"):
+                    if rule not in schema[field] and rule in field_rules:
+                        schema[field][rule] = field_rules[rule]
+                if "allow_unknown" not in schema[field]:
+                    schema[field]["allow_unknown"] = self.allow_unknown
+                schemas.append(schema)
+            stats = self.ofrules_stats[path] = OfRuleStats(
+                field_rules, self.allow_unknown, schemas)
+        return stats
+
+    def _evaluate_ofrule(self, operator, definitions, field, value):
+        definition, stop_on_pass, is_decided = _OPERATORS[operator]
+        stats = self._ofrule_stats(operator, definitions, field)
+        results = [None] * len(definitions)  # None, True or the errors
+        child = list()
+
+        def evaluate(index):
+            if not child:
+                child.append(self._get_child_validator(
+                    schema_crumb=(field, operator, index),
+                    schema=stats.schemas[index], allow_unknown=True,
+                ))
+            validator = child[0]
+            validator.schema = stats.schemas[index]
+            validator.schema_path = self.schema_path + (field, operator, index)
+            started = time.perf_counter()
+            passed = validator(self.document, update=self.update, normalize=False)
+            stats.record(index, passed, time.perf_counter() - started)
+            if passed:
+                results[index] = True
+            else:
+                self._drop_nodes_from_errorpaths(validator._errors, [], [3])
+                results[index] = list(validator._errors)
+            return passed
+
+        valids = failures = 0
+        for index in stats.order:
+            if evaluate(index):
+                valids += 1
+            else:
+                failures += 1
+            if is_decided(valids, failures):
+                break
+
+        stats.n_evaluations += 1
+        if stats.n_evaluations % stats.reorder_interval == 0:
+            stats.reorder(stop_on_pass)
+
+        if _is_valid(operator, valids, len(definitions)):
+            return
+
+        if self._config.get("ofrules_full_errors", True):
+            for index, result in enumerate(results):
+                if result is None and evaluate(index):
+                    valids += 1
+        _errors = errors.ErrorList()
+        for result in results:
+            if result is not None and result is not True:
+                _errors.extend(result)
+        self._error(field, definition, _errors, valids, len(definitions))
+
+    def _validate_anyof(self, definitions, field, value):
+        """{'type': 'list', 'logical': 'anyof'}"""
+        self._evaluate_ofrule("anyof", definitions, field, value)
+
+    def _validate_allof(self, definitions, field, value):
+        """{'type': 'list', 'logical': 'allof'}"""
+        self._evaluate_ofrule("allof", definitions, field, value)
+
+    def _validate_noneof(self, definitions, field, value):
+        """{'type': 'list', 'logical': 'noneof'}"""
+        self._evaluate_ofrule("noneof", definitions, field, value)
+
+    def _validate_oneof(self, definitions, field, value):
+        """{'type': 'list', 'logical': 'oneof'}"""
+        self._evaluate_ofrule("oneof", definitions, field, value)
+
+
+class ShortCircuitValidator(ShortCircuitOfRules, Validator):
+    """``cerberus.Validator`` with short-circuit \\*of rules.
+    """
+
+
+def example_short_circuit():
+    import random
+    import timeit
+
+    # a product schema with many variants, most documents match the last one
+    variants = [{"type": "string", "regex": "sku-%02d-[0-9]+" % i} for i in range(20)]
+    variants.append({"type": "integer", "min": 0})
+    schema = {"sku": {"anyof": variants, "required": True}}
+    v = Validator(schema)
+    sv = ShortCircuitValidator(schema)
+
+    random.seed(0)
+    documents = [{"sku": random.randint(0, 1000)} for _ in range(200)]
+    documents += [{"sku": "sku-03-12"}, {"sku": "sku-99-1"}, {"sku": -1}, {"sku": None}]
+    for document in documents:
+        assert sv.validate(document) is v.validate(document)
+        assert sv.errors == v.errors
+
+    for operator in ("allof", "anyof", "noneof", "oneof"):
+        schema = {"value": {"type": "number",
+                            operator: [{"min": 25, "max": 50}, {"min": 50, "max": 75}]}}
+        v, sv = Validator(schema), ShortCircuitValidator(schema)
+        for value in range(0, 101, 5):
+            assert sv.validate({"value": value}) is v.validate({"value": value})
+            assert sv.errors == v.errors
+
+    schema = {"sku": {"anyof": variants, "required": True}}
+    v, sv = Validator(schema), ShortCircuitValidator(schema)
+    # normalize=False, the normalization of the schema costs the same for both
+    t_plain = timeit.timeit(
+        lambda: [v.validate(d, normalize=False) for d in documents[:50]], number=5)
+    t_short = timeit.timeit(
+        lambda: [sv.validate(d, normalize=False) for d in documents[:50]], number=5)
+    print("anyof of %d variants, Validator: %.0f us/doc, ShortCircuitValidator: %.0f us/doc" % (
+        len(variants), t_plain / 250 * 1e6, t_short / 250 * 1e6))
+    print(sv.ofrules_stats[("sku", "anyof")].summary()[:3])
+
+
+if __name__ == "__main__":
+    """
+    """
+    example_short_circuit()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Validate a stream of documents with a pool of worker processes.
+
+Validation is pure python, a single process only ever uses one core.
+:class:`ParallelValidator` pickles the validator class, the schema and the
+options once, every worker process builds its own validator from them at
+start up. Documents are then sent in chunks, and the results come back in the
+order of the input.
+
+The validator class and everything in the schema (``coerce`` functions,
+``validator`` functions, ...) must be picklable, i.e. defined at module level.
+Classes or functions defined inside another function, like the ones in
+``lsn02_custom_validator.py``, are reported with :class:`NotPicklableError`.
+"""
+
+from __future__ import print_function
+import os
+import pickle
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from cerberus import Validator
+
+from .compiled import CompiledValidator
+
+#: the validator of the current worker process
+_worker_validator = None
+
+
+class NotPicklableError(TypeError):
+    """Raised when the validator can't be sent to the worker processes.
+    """
+
+
+def _find_unpicklable(validator_class, schema, kwargs):
+    """Describe the first part of the validator setup which can't be pickled.
+    """
+    def picklable(obj):
+        try:
+            pickle.dumps(obj)
+            return True
+        except Exception:
+            return False
+
+    if not picklable(validator_class):
+        return "validator class %r" % validator_class
+    for field, rules in schema.items():
+        if picklable(rules):
+            continue
+        if isinstance(rules, dict):
+            for rule, constraint in rules.items():
+                if not picklable(constraint):
+                    return "rule %r of field %r: %r" % (rule, field, constraint)
+        return "field %r" % field
+    for key, value in kwargs.items():
+        if not picklable(value):
+            return "option %r: %r" % (key, value)
+    return "validator setup"
+
+
+def _dumps_setup(validator_class, schema, kwargs):
+    try:
+        return pickle.dumps((validator_class, schema, kwargs))
+    except Exception as e:
+        raise NotPicklableError(
+            "can't send %s to the worker processes (%s), define it at module "
+            "level" % (_find_unpicklable(validator_class, schema, kwargs), e)
+        )
+
+
+def _init_worker(setup):
+    global _worker_validator
+    validator_class, schema, kwargs = pickle.loads(setup)
+    _worker_validator = CompiledValidator(schema, validator_class, **kwargs)
+
+
+def _validate_chunk(documents):
+    v = _worker_validator
+    results = list()
+    for document in documents:
+        ok = v.validate(document)
+        results.append((ok, v.document, v.errors))
+    return results
+
+
+class ParallelValidator(object):
+    """Validate documents with a ``ProcessPoolExecutor``.
+
+    Usage::
+
+        with ParallelValidator(schema) as pv:
+            for ok, document, errors in pv.imap(documents):
+                ...
+
+    :param schema: the validation schema.
+    :param validator_class: ``Validator`` or a subclass of it.
+    :param processes: number of worker processes, default is the number of
+        CPUs.
+    :param chunksize: number of documents sent to a worker at once.
+    :param kwargs: the options of ``validator_class``.
+
+    :raises NotPicklableError: if the validator class, the schema or the
+        options can't be pickled.
+    """
+
+    def __init__(self, schema, validator_class=Validator, processes=None,
+                 chunksize=500, **kwargs):
+        self._setup = _dumps_setup(validator_class, schema, kwargs)
+        # make sure the schema is valid before starting any process
+        validator_class(schema, **kwargs)
+        self.processes = processes or os.cpu_count() or 1
+        self.chunksize = chunksize
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                initializer=_init_worker,
+                initargs=(self._setup,),
+            )
+        return self._executor
+
+    def imap(self, documents):
+        """Validate an iterable of documents lazily.
+
+        At most two chunks per worker are in flight, so memory doesn't grow
+        with the length of ``documents``.
+
+        :return: a generator of ``(ok, normalized_document, errors)``, in the
+            order of ``documents``.
+        """
+        executor = self._get_executor()
+        max_pending = self.processes * 2
+        pending = deque()
+        chunk = list()
+        for document in documents:
+            chunk.append(document)
+            if len(chunk) == self.chunksize:
+                pending.append(executor.submit(_validate_chunk, chunk))
+                chunk = list()
+                if len(pending) >= max_pending:
+                    for result in pending.popleft().result():
+                        yield result
+        if chunk:
+            pending.append(executor.submit(_validate_chunk, chunk))
+        while pending:
+            for result in pending.popleft().result():
+                yield result
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# the custom validators of lsn02_custom_validator.py, at module level so they
+# can be pickled
+def validate_oddity(field, value, error):
+    if not bool(value & 1):
+        error(field, "Must be an odd number")
+
+
+class OddValidator(Validator):
+    def _validate_isodd(self, isodd, field, value):
+        """{'type': 'boolean'}"""
+        if isodd and not bool(value & 1):
+            self._error(field, "Must be an odd number")
+
+
+def example_parallel_validator():
+    documents = [{"oddity": i} for i in range(10000)]
+
+    with ParallelValidator({"oddity": {"validator": validate_oddity}},
+                           chunksize=1000) as pv:
+        results = list(pv.imap(documents))
+    assert [ok for ok, _, _ in results] == [bool(i & 1) for i in range(10000)]
+    assert results[0] == (False, {"oddity": 0}, {"oddity": ["Must be an odd number"]})
+
+    with ParallelValidator({"oddity": {"isodd": True, "type": "integer"}},
+                           validator_class=OddValidator) as pv:
+        assert [ok for ok, _, _ in pv.imap(documents[:4])] == [False, True, False, True]
+
+    def local_oddity(field, value, error):
+        pass
+
+    try:
+        ParallelValidator({"oddity": {"validator": local_oddity}})
+        raise AssertionError
+    except NotPicklableError as e:
+        print(e)
+
+
+if __name__ == "__main__":
+    """
+    """
+    example_parallel_validator()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+A pool of reusable validator instances for threaded servers.
+
+A ``Validator`` keeps its state on the instance: ``v.allow_unknown = True``
+in ``allow_unknown_example`` changes it for every later call, ``v.errors`` and
+``v.document`` are overwritten by the next ``validate()``. So an instance
+can't be shared by threads, and building one per request is expensive.
+
+:class:`ValidatorPool` hands out validator instances, keyed by the schema and
+the options, through a context manager. An instance is used by one thread at
+a time, and is reset to its initial options and schema when it comes back to
+the pool. Usage::
+
+    pool = ValidatorPool(max_size=8)
+
+    with pool.acquire(schema) as v:
+        if not v.validate(document):
+            return v.errors
+"""
+
+from __future__ import print_function
+import threading
+import time
+from contextlib import contextmanager
+
+from cerberus import Validator, errors
+
+from .cache import cached_validator, schema_key
+
+
+class PoolTimeout(RuntimeError):
+    """Raised when no validator becomes available within the timeout.
+    """
+
+
+class _Slot(object):
+    """The validators of one schema, ``available`` is notified when one of
+    them is released.
+    """
+
+    def __init__(self, lock):
+        self.idle = list()  # [(validator, released_at), ...]
+        self.size = 0  # idle and in use
+        self.available = threading.Condition(lock)
+
+
+def _snapshot(validator):
+    return dict(validator._config), validator._schema
+
+
+def _reset(validator, snapshot):
+    """Restore the options and the schema of a validator and forget the last
+    processed document.
+    """
+    config, schema = snapshot
+    validator._config = dict(config)
+    validator._schema = schema
+    validator.document = None
+    validator._errors = errors.ErrorList()
+    validator.recent_error = None
+    validator.document_error_tree = errors.DocumentErrorTree()
+    validator.schema_error_tree = errors.SchemaErrorTree()
+    validator.update = False
+
+
+class ValidatorPool(object):
+    """Thread-safe pool of validators.
+
+    :param validator_class: ``Validator`` or a subclass of it.
+    :param max_size: max number of validators per schema, a thread waits when
+        all of them are in use.
+    :param idle_timeout: seconds after which an unused validator is dropped.
+        The idle validators are checked at most once per ``idle_timeout``,
+        when a validator is released, or by :meth:`evict_idle`.
+    """
+
+    def __init__(self, validator_class=Validator, max_size=8, idle_timeout=300.0):
+        self.validator_class = validator_class
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._slots = dict()
+        self._snapshots = dict()  # id(validator) -> snapshot
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.evictions = 0
+        self._next_eviction = time.monotonic() + idle_timeout
+
+    def _key(self, schema, kwargs):
+        return schema_key(schema), schema_key(kwargs)
+
+    def _checkout(self, key, schema, kwargs, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._slots[key] = _Slot(self._lock)
+            waited = False
+            started = time.monotonic()
+            while not slot.idle and slot.size >= self.max_size:
+                if not waited:
+                    waited = True
+                    self.waits += 1
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise PoolTimeout("no validator available after %s sec" % timeout)
+                slot.available.wait(remaining)
+            if waited:
+                self.wait_time += time.monotonic() - started
+
+            if slot.idle:
+                self.hits += 1
+                return slot.idle.pop()[0]
+            self.misses += 1
+            slot.size += 1
+
+        try:
+            validator = cached_validator(schema, self.validator_class, **kwargs)
+        except Exception:
+            with self._lock:
+                slot.size -= 1
+                slot.available.notify()
+            raise
+        with self._lock:
+            self._snapshots[id(validator)] = _snapshot(validator)
+        return validator
+
+    def _checkin(self, key, validator):
+        now = time.monotonic()
+        with self._lock:
+            _reset(validator, self._snapshots[id(validator)])
+            slot = self._slots[key]
+            slot.idle.append((validator, now))
+            slot.available.notify()
+            if now >= self._next_eviction:
+                self._evict(now)
+
+    @contextmanager
+    def acquire(self, schema, timeout=None, **kwargs):
+        """Borrow a validator of ``validator_class(schema, **kwargs)``.
+
+        :param timeout: max seconds to wait when ``max_size`` validators of
+            this schema are in use, default is to wait forever.
+
+        :raises PoolTimeout: if no validator became available in time.
+        """
+        key = self._key(schema, kwargs)
+        validator = self._checkout(key, schema, kwargs, timeout)
+        try:
+            yield validator
+        finally:
+            self._checkin(key, validator)
+
+    def evict_idle(self, now=None):
+        """Drop the validators unused for more than ``idle_timeout`` seconds.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._evict(now)
+
+    def _evict(self, now):
+        # with the lock held
+        self._next_eviction = now + self.idle_timeout
+        for key, slot in list(self._slots.items()):
+            kept = list()
+            for validator, released_at in slot.idle:
+                if now - released_at > self.idle_timeout:
+                    del self._snapshots[id(validator)]
+                    slot.size -= 1
+                    self.evictions += 1
+                else:
+                    kept.append((validator, released_at))
+            slot.idle = kept
+            if not slot.size:
+                del self._slots[key]
+
+    @property
+    def stats(self):
+        with self._lock:
+            n_idle = sum(len(slot.idle) for slot in self._slots.values())
+            n_total = sum(slot.size for slot in self._slots.values())
+            n_acquired = self.hits + self.misses
+            return {
+                "schemas": len(self._slots),
+                "idle": n_idle,
+                "in_use": n_total - n_idle,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": float(self.hits) / n_acquired if n_acquired else 0.0,
+                "waits": self.waits,
+                "wait_time": self.wait_time,
+                "evictions": self.evictions,
+            }
+
+
+def example_validator_pool():
+    from concurrent.futures import ThreadPoolExecutor
+
+    pool = ValidatorPool(max_size=2)
+    schema = {"name": {"type": "string", "maxlength": 10}}
+
+    with pool.acquire(schema) as v:
+        v.allow_unknown = True
+        assert v.validate({"name": "john", "sex": "M"}) is True
+    with pool.acquire(schema) as v:  # the same instance, reset
+        assert v.allow_unknown is False
+        assert v.errors == {}
+        assert v.validate({"name": "john", "sex": "M"}) is False
+    assert pool.stats["hits"] == 1
+
+    def check(i):
+        with pool.acquire(schema) as v:
+            if v.validate({"name": "x" * (i % 20)}):
+                return {}
+            return v.errors
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(check, range(1000)))
+    assert results[15] == {"name": ["max length is 10"]}
+    assert all(result == ({} if i % 20 <= 10 else {"name": ["max length is 10"]})
+               for i, result in enumerate(results))
+    assert pool.stats["in_use"] == 0
+    print(pool.stats)
+
+    pool.evict_idle(now=time.monotonic() + pool.idle_timeout + 1)
+    assert pool.stats["idle"] == 0
+
+    # a release wakes the threads waiting for the same schema
+    pool = ValidatorPool(max_size=1)
+    other_schema = {"name": {"type": "string"}}
+    acquired = list()
+
+    def wait_for(label, schema):
+        with pool.acquire(schema, timeout=5):
+            acquired.append(label)
+
+    with pool.acquire(schema):
+        with pool.acquire(other_schema):
+            waiters = [threading.Thread(target=wait_for, args=("a", schema)),
+                       threading.Thread(target=wait_for, args=("b", other_schema))]
+            for waiter in waiters:
+                waiter.start()
+                time.sleep(0.1)
+        time.sleep(0.2)
+        assert acquired == ["b"]
+    for waiter in waiters:
+        waiter.join()
+    assert acquired == ["b", "a"]
+
+    # a release only checks the idle validators once per idle_timeout
+    pool = ValidatorPool(max_size=2, idle_timeout=0.05)
+    with pool.acquire(schema):
+        pass
+    with pool.acquire(schema, maxlength=1):
+        pass
+    assert pool.stats["idle"] == 2
+    time.sleep(0.1)
+    with pool.acquire(schema):  # evicts the other, then takes the idle one
+        pass
+    assert pool.stats["idle"] == 1 and pool.stats["evictions"] == 1
+
+
+if __name__ == "__main__":
+    """
+    """
+    example_validator_pool()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Per rule profiling: the number of calls, the total time and the number of
+failures of every rule, per field path.
+
+:class:`ProfilingValidator` is a mixin for ``Validator`` and its subclasses,
+including the ones with custom rules and types (``_validate_isodd``,
+``_validate_type_objectid``, see ``lsn02_custom_validator.py``)::
+
+    class MyProfilingValidator(ProfilingValidator, MyValidator):
+        pass
+
+    profile = RuleProfile()
+    v = MyProfilingValidator(schema, profile=profile)
+    v.validate(document)
+    print(profile.table())
+    print(profile.prometheus())
+
+When ``profile`` is not given nothing is changed, the rules are the methods
+of the class and the overhead is one dict lookup when the validator is
+created. Otherwise the rule handlers of the instance are wrapped with a
+timer, and so are the ones of the child validators, which share the profile
+through the validator options. The ``coerce`` normalization rule is measured
+too.
+
+The time of a rule includes the rules it runs itself, e.g. the time of a
+``schema`` rule includes the rules of the sub-document. The list indexes,
+and the keys of ``keysrules``, ``valuesrules`` and unknown fields, are
+reported as ``*``, e.g. ``tags.*``.
+"""
+
+from __future__ import print_function
+import re
+import time
+
+from cerberus import Validator
+
+_OF_RULES = ("allof", "anyof", "noneof", "oneof")
+_ANY_KEY_RULES = ("keysrules", "valuesrules")
+_ALLOW_UNKNOWN_CRUMBS = ("allow_unknown", "__allow_unknown__")
+_COERCE_HANDLER = "_BareValidator__normalize_coerce"
+
+
+def field_label(schema_path):
+    """The dotted field path of a rule, from the schema path of the validator
+    plus the field.
+
+    >>> field_label(("customer", "schema", "age"))
+    'customer.age'
+    >>> field_label(("tags", "schema", 3))
+    'tags.*'
+    >>> field_label(("value", "anyof", 0, "value"))
+    'value'
+    """
+    labels = list()
+    wildcard = False
+    i = 0
+    while i < len(schema_path):
+        crumb = schema_path[i]
+        if crumb in _ALLOW_UNKNOWN_CRUMBS:
+            wildcard = True
+            i += 1
+            continue
+        labels.append("*" if wildcard or isinstance(crumb, int) else str(crumb))
+        rule = schema_path[i + 1] if i + 1 < len(schema_path) else None
+        if rule in _OF_RULES:  # (field, operator, index), then the same field
+            labels.pop()
+            wildcard = False
+            i += 3
+            continue
+        wildcard = rule in _ANY_KEY_RULES
+        i += 2
+    return ".".join(labels)
+
+
+class RuleProfile(object):
+    """The statistics of the rules, shared by a validator and its child
+    validators.
+
+    :param callback: called with ``(field, rule, elapsed, failed)`` after
+        every rule, e.g. to feed a histogram of a metrics library.
+
+    Updating the statistics isn't locked, use one profile per thread.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.stats = dict()  # {(field, rule): [calls, seconds, failures]}
+        self._labels = dict()
+
+    def reset(self):
+        self.stats.clear()
+
+    def record(self, schema_path, rule, elapsed, failed):
+        field = self._labels.get(schema_path)
+        if field is None:
+            field = self._labels[schema_path] = field_label(schema_path)
+        stats = self.stats.get((field, rule))
+        if stats is None:
+            stats = self.stats[(field, rule)] = [0, 0.0, 0]
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] += failed
+        if self.callback is not None:
+            self.callback(field, rule, elapsed, failed)
+
+    def rows(self, sort_by="seconds"):
+        """The statistics as a list of dict, the slowest first by default.
+
+        :param sort_by: ``seconds``, ``calls``, ``failures`` or ``mean``.
+        """
+        rows = [
+            {
+                "field": field,
+                "rule": rule,
+                "calls": calls,
+                "seconds": seconds,
+                "failures": failures,
+                "mean": seconds / calls,
+            }
+            for (field, rule), (calls, seconds, failures) in self.stats.items()
+        ]
+        rows.sort(key=lambda row: (-row[sort_by], row["field"], row["rule"]))
+        return rows
+
+    def table(self, sort_by="seconds", limit=None):
+        """The statistics as a text table.
+        """
+        rows = self.rows(sort_by)[:limit]
+        width = max([len(row["field"]) for row in rows] + [len("field")])
+        lines = ["%-*s  %-12s %9s %9s %11s %11s" % (
+            width, "field", "rule", "calls", "failures", "total ms", "mean us")]
+        for row in rows:
+            lines.append("%-*s  %-12s %9d %9d %11.3f %11.2f" % (
+                width, row["field"], row["rule"], row["calls"], row["failures"],
+                row["seconds"] * 1e3, row["mean"] * 1e6))
+        return "\n".join(lines)
+
+    def prometheus(self, prefix="cerberus_rule"):
+        """The statistics in the Prometheus text exposition format.
+        """
+        metrics = [
+            ("calls_total", "Number of evaluations of the rule.", 0),
+            ("seconds_total", "Time spent in the rule.", 1),
+            ("failures_total", "Number of evaluations which added errors.", 2),
+        ]
+        lines = list()
+        for name, help_text, index in metrics:
+            lines.append("# HELP %s_%s %s" % (prefix, name, help_text))
+            lines.append("# TYPE %s_%s counter" % (prefix, name))
+            for (field, rule), stats in sorted(self.stats.items()):
+                lines.append('%s_%s{field="%s",rule="%s"} %r' % (
+                    prefix, name, _escape(field), _escape(rule), stats[index]))
+        return "\n".join(lines) + "\n"
+
+
+def _escape(label_value):
+    return label_value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _timed_rule(validator, profile, rule, handler):
+    timer = time.perf_counter
+
+    def timed(constraint, field, value):
+        n_errors = len(validator._errors)
+        started = timer()
+        try:
+            return handler(constraint, field, value)
+        finally:
+            profile.record(validator.schema_path + (field,), rule, timer() - started,
+                           len(validator._errors) > n_errors)
+
+    return timed
+
+
+def _timed_coerce(validator, profile, handler):
+    timer = time.perf_counter
+
+    def timed(processor, field, value, nullable, error):
+        if isinstance(processor, (list, tuple)):  # a chain, its coercers are timed
+            return handler(processor, field, value, nullable, error)
+        n_errors = len(validator._errors)
+        started = timer()
+        try:
+            return handler(processor, field, value, nullable, error)
+        finally:
+            profile.record(validator.schema_path + (field,), "coerce", timer() - started,
+                           len(validator._errors) > n_errors)
+
+    return timed
+
+
+class ProfilingValidator(object):
+    """Mixin for ``Validator`` and its subclasses, measures the rules when it
+    is created with ``profile=True`` or ``profile=RuleProfile(...)``, or after
+    :meth:`start_profiling`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        profile = kwargs.pop("profile", None)
+        if profile is True:
+            profile = RuleProfile()
+        if profile is not None:
+            kwargs["_profile"] = profile
+        super(ProfilingValidator, self).__init__(*args, **kwargs)
+        if self._config.get("_profile") is not None:
+            self._wrap_rule_handlers(self._config["_profile"])
+
+    @property
+    def profile(self):
+        """The :class:`RuleProfile`, ``None`` when the profiling is off.
+        """
+        return self._config.get("_profile")
+
+    def start_profiling(self, profile=None):
+        """Measure the rules from now on, also in the child validators created
+        afterwards.
+
+        :return: the :class:`RuleProfile`
+        """
+        self.stop_profiling()
+        profile = profile or RuleProfile()
+        self._config["_profile"] = profile
+        self._wrap_rule_handlers(profile)
+        return profile
+
+    def stop_profiling(self):
+        if self._config.pop("_profile", None) is not None:
+            for name in list(self.__dict__):
+                if name.startswith("_validate_") or name == _COERCE_HANDLER:
+                    del self.__dict__[name]
+
+    def _wrap_rule_handlers(self, profile):
+        cls = type(self)
+        for rule in self.validation_rules:
+            name = "_validate_" + rule.replace(" ", "_")
+            if callable(getattr(cls, name, None)):
+                setattr(self, name, _timed_rule(self, profile, rule, getattr(self, name)))
+        if hasattr(cls, _COERCE_HANDLER):
+            setattr(self, _COERCE_HANDLER,
+                    _timed_coerce(self, profile, getattr(self, _COERCE_HANDLER)))
+
+
+_OBJECTID_REGEX = re.compile("[a-f0-9]{16}")  # objectid_regex of lsn02_custom_validator.py
+
+
+class _MyValidator(Validator):
+    """The custom rule and type of ``lsn02_custom_validator.py``."""
+
+    def _validate_isodd(self, isodd, field, value):
+        """{'type': 'boolean'}"""
+        if isodd and not bool(value & 1):
+            self._error(field, "Must be an odd number")
+
+    def _validate_type_objectid(self, value):
+        return isinstance(value, str) and _OBJECTID_REGEX.match(value) is not None
+
+
+class _MyProfilingValidator(ProfilingValidator, _MyValidator):
+    pass
+
+
+def example_profiling():
+    import timeit
+
+    schema = {
+        "_id": {"type": "objectid"},
+        "email": {"type": "string", "regex": "[a-z0-9.]+@[a-z0-9.]+"},
+        "age": {"type": "integer", "coerce": int, "min": 0},
+        "lucky": {"type": "integer", "isodd": True},
+        "tags": {"type": "list", "schema": {"type": "string", "maxlength": 10}},
+        "address": {
+            "type": "dict",
+            "schema": {"city": {"type": "string"}, "zip": {"type": "string",
+                                                           "regex": "[0-9]{5}"}},
+        },
+    }
+    documents = [
+        {"_id": "0123456789abcdef", "email": "alice@example.com", "age": "%d" % i,
+         "lucky": i, "tags": ["a", "b", "c"] * 3,
+         "address": {"city": "Boston", "zip": "0211%d" % (i % 10)}}
+        for i in range(200)
+    ]
+
+    profile = RuleProfile()
+    v = _MyProfilingValidator(schema, profile=profile)
+    plain = _MyValidator(schema)
+    assert plain.validate({"_id": "0123456789"}) is False  # custom_data_types of lsn02
+    for document in documents:
+        assert v.validate(document) is plain.validate(document)
+        assert v.errors == plain.errors
+    print(profile.table(limit=12))
+    print(profile.prometheus().splitlines()[2])
+
+    calls = list()
+    v = _MyProfilingValidator(schema, profile=RuleProfile(
+        callback=lambda field, rule, elapsed, failed: calls.append((field, rule))))
+    v.validate(documents[0])
+    assert ("address.zip", "regex") in calls and ("tags.*", "maxlength") in calls
+
+    # turned off: the methods of the class, no overhead
+    off = _MyProfilingValidator(schema)
+    assert off.profile is None and "_validate_regex" not in off.__dict__
+    t_plain = timeit.timeit(lambda: [plain.validate(d) for d in documents[:50]], number=5)
+    t_off = timeit.timeit(lambda: [off.validate(d) for d in documents[:50]], number=5)
+    off.start_profiling()
+    t_on = timeit.timeit(lambda: [off.validate(d) for d in documents[:50]], number=5)
+    print("Validator: %.0f us/doc, profiling off: %.0f us/doc, on: %.0f us/doc" % (
+        t_plain / 250 * 1e6, t_off / 250 * 1e6, t_on / 250 * 1e6))
+
+
+if __name__ == "__main__":
+    """
+    """
+    example_profiling()
@@ -0,0 +1,386 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Cached row shapes for the lists of dicts, see ``list_of_dict_example`` of
+``lsn01_quickstart.py``.
+
+``cerberus.Validator`` validates every row of a list ``schema`` with the
+rule dispatch of a child validator: unknown and required fields, the types,
+then the value rules, again for each row, although the rows of a list share
+the same structure. Here the structure of a row is decided once per shape,
+the keys of the row and the classes of its values:
+
+- a new shape is checked for unknown and missing fields, ``nullable`` and
+  ``type``, which only depend on the classes. The result and the value rules
+  left to run for the shape are remembered.
+- a row of a known shape only runs those value rules: ``min``, ``max``,
+  ``minlength``, ``maxlength``, ``regex``, ``allowed``, ``empty``.
+
+Only the rows which fail are validated by one child validator, so the errors
+are exactly the ones of ``cerberus.Validator``. Rows with any other rule, e.g.
+a nested ``schema``, are validated as usual.
+
+The normalization of ``Validator`` also creates a child validator per row,
+:class:`RowShapesValidator` normalizes with
+:class:`~learn_cerberus.normalization.CopyOnWriteNormalization`, which skips
+the rows whose rules change nothing.
+
+Usage::
+
+    schema = {"rows": {"type": "list", "schema": {"type": "dict", "schema": {
+        "sku": {"type": "string"},
+        "price": {"type": "integer"},
+    }}}}
+    v = RowShapesValidator(schema)
+"""
+
+from __future__ import print_function
+
+from cerberus import Validator, errors
+from cerberus.platform import Iterable, Mapping, Sequence, Sized
+
+from .cache import LRUCache, compile_regex
+from .normalization import CopyOnWriteNormalization
+
+#: the rules of the fields of a row :class:`RowCheck` can check
+ROW_RULES = frozenset([
+    "type", "required", "nullable", "min", "max", "minlength", "maxlength", "regex",
+    "allowed", "empty", "meta", "coerce", "default", "default_setter",
+])
+
+#: the rules of a row itself
+_ROW_ITSELF_RULES = frozenset(["type", "schema", "allow_unknown", "require_all", "meta"])
+
+#: rules which must not be overridden by the validator class
+_CHECKED_RULES = ("type", "nullable", "min", "max", "minlength", "maxlength", "regex",
+                  "allowed", "empty", "required")
+
+#: rules skipped for empty values when ``empty`` is defined, see
+#: ``Validator._validate_empty``
+_DROPPED_BY_EMPTY = frozenset(["allowed", "minlength", "maxlength", "regex"])
+
+#: the number of shapes remembered by a :class:`RowCheck`
+MAX_SHAPES = 1024
+
+
+def _value_tests(rules):
+    """``[(rule, test)]``, ``test(value)`` is ``False`` or raises
+    ``TypeError`` when ``Validator`` may report an error.
+    """
+    tests = list()
+    for rule, constraint in rules.items():
+        if rule == "min":
+            tests.append((rule, lambda value, bound=constraint: not value < bound))
+        elif rule == "max":
+            tests.append((rule, lambda value, bound=constraint: not value > bound))
+        elif rule == "minlength":
+            tests.append((rule, lambda value, bound=constraint:
+                          not isinstance(value, Iterable) or len(value) >= bound))
+        elif rule == "maxlength":
+            tests.append((rule, lambda value, bound=constraint:
+                          not isinstance(value, Iterable) or len(value) <= bound))
+        elif rule == "regex":
+            match = compile_regex(constraint if constraint.endswith("$")
+                                  else constraint + "$").match
+            tests.append((rule, lambda value, match=match:
+                          not isinstance(value, str) or match(value) is not None))
+        elif rule == "allowed":
+            try:
+                allowed = frozenset(constraint)
+            except TypeError:
+                allowed = constraint
+            tests.append((rule, lambda value, allowed=allowed: (
+                value in allowed if isinstance(value, str) or not isinstance(value, Iterable)
+                else all(map(allowed.__contains__, value)))))
+    return tests
+
+
+def _value_check(rules):
+    """One ``check(value)`` for the value rules of a field, ``None`` if it
+    has none.
+    """
+    tests = _value_tests(rules)
+    if "empty" not in rules:
+        if not tests:
+            return None
+        if len(tests) == 1:
+            return tests[0][1]
+    tests_all = tuple(test for _, test in tests)
+    tests_empty = tuple(test for rule, test in tests if rule not in _DROPPED_BY_EMPTY)
+    check_empty = "empty" in rules
+    empty = rules.get("empty")
+
+    def check(value):
+        remaining = tests_all
+        if check_empty and isinstance(value, Sized) and len(value) == 0:
+            if not empty:
+                return False
+            remaining = tests_empty
+        for test in remaining:
+            if not test(value):
+                return False
+        return True
+
+    return check
+
+
+class RowCheck(object):
+    """The rules of the rows of a list, checked with the cached shapes of the
+    rows. ``passes`` never accepts a row ``Validator`` would reject, it may
+    reject valid ones, which are then validated by ``Validator``.
+
+    :param schema: the (resolved) schema of a row, ``{field: rules}``.
+    :param allow_unknown: ``True`` or ``False``.
+    :param require_all: ``True`` or ``False``.
+    :param types_mapping: ``Validator.types_mapping``
+    """
+
+    def __init__(self, schema, allow_unknown, require_all, types_mapping):
+        self.allow_unknown = allow_unknown
+        self.types_mapping = types_mapping
+        self.fields = dict()  # field -> (nullable, type definitions, value check)
+        self.required = frozenset(
+            field for field, rules in schema.items()
+            if rules.get("required", require_all) is True
+        )
+        for field, rules in schema.items():
+            data_type = rules.get("type")
+            types = (data_type,) if isinstance(data_type, str) else tuple(data_type or ())
+            self.fields[field] = (
+                rules.get("nullable", False),
+                tuple(types_mapping[name] for name in types),
+                _value_check(rules),
+            )
+        self._shapes = dict()  # (keys, classes) -> the plan of the shape
+
+    @classmethod
+    def create(cls, validator, rules, allow_unknown, require_all):
+        """A :class:`RowCheck` of the rules of the items of a list, ``None``
+        if they aren't dicts with a schema of simple rules.
+        """
+        if not isinstance(rules, Mapping) or not set(rules) <= _ROW_ITSELF_RULES or \
+                rules.get("type") not in ("dict", ["dict"], ("dict",)) or \
+                not isinstance(allow_unknown, bool) or validator.ignore_none_values:
+            return None
+        if not issubclass(dict, validator.types_mapping["dict"].included_types):
+            return None
+        for rule in _CHECKED_RULES:
+            method_name = "_validate_" + rule
+            if getattr(type(validator), method_name, None) is not \
+                    getattr(Validator, method_name, None):
+                return None
+        schema = validator._resolve_schema(rules.get("schema"))
+        if not isinstance(schema, Mapping):
+            return None
+        resolved = dict()
+        for field, field_rules in schema.items():
+            field_rules = validator._resolve_rules_set(field_rules)
+            if not isinstance(field_rules, Mapping) or not set(field_rules) <= ROW_RULES:
+                return None
+            data_type = field_rules.get("type")
+            types = (data_type,) if isinstance(data_type, str) else tuple(data_type or ())
+            if not all(name in validator.types_mapping for name in types):
+                return None  # _validate_type_* methods
+            resolved[field] = field_rules
+        return cls(resolved, allow_unknown, require_all, validator.types_mapping)
+
+    def _of_type(self, kind, definitions):
+        return not definitions or any(
+            issubclass(kind, definition.included_types)
+            and not issubclass(kind, definition.excluded_types)
+            for definition in definitions
+        )
+
+    def _plan(self, keys, kinds):
+        """``(missing required, value checks)`` of a shape, ``None`` if a row
+        of this shape fails whatever its values.
+        """
+        checks = list()
+        for field, kind in zip(keys, kinds):
+            spec = self.fields.get(field)
+            if spec is None:
+                if not self.allow_unknown:
+                    return None
+                continue
+            nullable, definitions, check = spec
+            if kind is type(None):  # the other rules are dropped
+                if not nullable:
+                    return None
+                continue
+            if not self._of_type(kind, definitions):
+                return None
+            if check is not None:
+                checks.append((field, check))
+        return not self.required.issubset(keys), tuple(checks)
+
+    def passes(self, row, update=False):
+        """``True`` if the row passes the rules.
+        """
+        keys = tuple(row)
+        shape = (keys, tuple(map(type, row.values())))
+        plan = self._shapes.get(shape, False)
+        if plan is False:
+            if len(self._shapes) >= MAX_SHAPES:
+                self._shapes.clear()
+            plan = self._shapes[shape] = self._plan(*shape)
+        if plan is None:
+            return False
+        missing_required, checks = plan
+        if missing_required and not update:
+            return False
+        try:
+            for field, check in checks:
+                if not check(row[field]):
+                    return False
+        except TypeError:  # e.g. comparing a str to an int, Validator decides
+            return False
+        return True
+
+    def failing(self, rows, update=False):
+        """The indexes of the rows which may fail, ``[]`` if all pass.
+        """
+        passes = self.passes
+        return [i for i, row in enumerate(rows)
+                if not (isinstance(row, dict) and passes(row, update))]
+
+    @property
+    def n_shapes(self):
+        return len(self._shapes)
+
+
+class RowShapes(object):
+    """Mixin for ``Validator`` and its subclasses, checks the rows of a list
+    ``schema`` of dicts with cached shapes, see :class:`RowCheck`. The row
+    checks are cached in the validator options, shared with the child
+    validators.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("_row_checks", LRUCache(maxsize=256))
+        super(RowShapes, self).__init__(*args, **kwargs)
+
+    def _row_check(self, rules):
+        rules = self._resolve_rules_set(rules)
+        if not isinstance(rules, Mapping):
+            return None
+        # as the child validators of Validator
+        allow_unknown = rules.get("allow_unknown", self.allow_unknown)
+        require_all = rules.get("require_all", self.require_all)
+        if not isinstance(allow_unknown, bool):
+            return None
+        checks = self._config["_row_checks"]
+        key = (id(rules), allow_unknown, require_all)
+
+        def create():
+            return rules, RowCheck.create(self, rules, allow_unknown, require_all)
+
+        cached = checks.get_or_create(key, create)
+        if cached[0] is not rules:  # the id of dropped rules
+            checks.invalidate(key)
+            cached = checks.get_or_create(key, create)
+        return cached[1]
+
+    def _validate_schema(self, schema, field, value):
+        """
+        {'type': ['dict', 'string'],
+         'anyof': [{'check_with': 'schema'},
+                   {'check_with': 'bulk_schema'}]}
+        """
+        if schema is not None and isinstance(value, Sequence) and not isinstance(value, str):
+            check = self._row_check(schema)
+            if check is not None:
+                failing = check.failing(value, self.update)
+                if failing:
+                    self._revalidate_rows(schema, field, value, failing)
+                return
+        super(RowShapes, self)._validate_schema(schema, field, value)
+
+    def _revalidate_rows(self, schema, field, rows, failing):
+        """Validate the rows which may fail like ``Validator`` validates all
+        of them, with one child validator.
+        """
+        validator = self._get_child_validator(
+            document_crumb=field,
+            schema_crumb=(field, "schema"),
+            schema=dict((i, schema) for i in failing),
+            allow_unknown=self.allow_unknown,
+        )
+        validator(dict((i, rows[i]) for i in failing), update=self.update, normalize=False)
+        if validator._errors:
+            self._drop_nodes_from_errorpaths(validator._errors, [], [2])
+            self._error(field, errors.SEQUENCE_SCHEMA, validator._errors)
+
+
+class RowShapesValidator(RowShapes, CopyOnWriteNormalization, Validator):
+    """``cerberus.Validator`` with cached row shapes for the lists of dicts,
+    and no normalization of the rows without normalization rules.
+    """
+
+
+def example_row_shapes():
+    import random
+    import timeit
+
+    # list_of_dict_example of lsn01_quickstart.py, the rules of the rows are
+    # the schema rule of the list, "items" is for lists of fixed length
+    schema = {
+        "rows": {
+            "type": "list",
+            "schema": {"type": "dict", "schema": {
+                "sku": {"type": "string"},
+                "price": {"type": "integer"},
+            }},
+        },
+    }
+    v, rv = Validator(schema), RowShapesValidator(schema)
+    for document in [
+        {"rows": [{"sku": "KT123", "price": 100}]},
+        {"rows": [{"sku": 123, "price": "100"}]},
+        {"rows": [{"sku": "KT123"}, {"price": None}, None, "KT123", {"sku": "a", "memo": 1}]},
+    ]:
+        assert rv.validate(document) is v.validate(document)
+        assert rv.errors == v.errors, (rv.errors, v.errors)
+
+    # an invoice of 5000 line items, 10 bad ones
+    schema = {
+        "invoice_id": {"type": "string", "required": True},
+        "lines": {"type": "list", "schema": {"type": "dict", "schema": {
+            "sku": {"type": "string", "regex": "[A-Z]{2}[0-9]{3}", "required": True},
+            "price": {"type": "integer", "min": 0, "required": True},
+            "quantity": {"type": "integer", "min": 1, "max": 1000},
+            "discount": {"type": "float", "nullable": True, "min": 0.0, "max": 1.0},
+            "unit": {"type": "string", "allowed": ["pc", "kg", "box"]},
+        }}},
+    }
+    random.seed(0)
+    lines = [{"sku": "KT%03d" % random.randint(0, 999), "price": random.randint(0, 10000),
+              "quantity": random.randint(1, 50),
+              "discount": random.choice([None, 0.1, 0.25]),
+              "unit": random.choice(["pc", "kg", "box"])}
+             for _ in range(5000)]
+    valid = {"invoice_id": "INV-1", "lines": lines}
+    invalid = {"invoice_id": "INV-2", "lines": [dict(line) for line in lines]}
+    for i in random.sample(range(5000), 10):
+        invalid["lines"][i].update(random.choice([
+            {"price": -1}, {"sku": "kt001"}, {"quantity": "3"}, {"unit": "crate"},
+            {"discount": 2}, {"extra": True},
+        ]))
+    del invalid["lines"][7]["price"]
+
+    v, rv = Validator(schema), RowShapesValidator(schema)
+    for document in (valid, invalid):
+        assert rv.validate(document) is v.validate(document)
+        assert rv.errors == v.errors
+    check = rv._row_check(schema["lines"]["schema"])
+    for label, document in (("valid", valid), ("10 bad lines", invalid)):
+        t_plain = timeit.timeit(lambda: v.validate(document), number=1)
+        t_rows = timeit.timeit(lambda: rv.validate(document), number=5) / 5
+        print("5000 line items, %s, Validator: %.0f ms, RowShapesValidator: %.1f ms, "
+              "%d shapes" % (label, t_plain * 1e3, t_rows * 1e3, check.n_shapes))
+
+
+if __name__ == "__main__":
+    """
+    """
+    example_row_shapes()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Validate NDJSON or CSV records one at a time, with flat memory usage.
+
+``validated_method_example`` in ``lsn01_quickstart.py`` builds the whole
+result list in memory. Here records are read, validated and written one by
+one: valid records go to one output stream, error records to another, so the
+input can be of any size.
+
+Command line usage::
+
+    python -m learn_cerberus.stream schema.json data.ndjson \\
+        --output valid.ndjson --errors errors.ndjson
+
+The schema is a JSON or YAML (needs ``PyYAML``) file. The input is a file or
+``-`` for stdin, its format is guessed from the extension, or given with
+``--format``. Every error record is a JSON line
+``{"line": 3, "record": {...}, "errors": {...}}``. The number of records and
+the records/sec are printed to stderr every few seconds.
+
+Note that all values of a CSV record are strings.
+"""
+
+from __future__ import print_function
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+
+from .compiled import CompiledValidator
+
+
+def load_schema(path):
+    """Load a validation schema from a ``.json`` or ``.yml`` / ``.yaml`` file.
+    """
+    with io.open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".yml", ".yaml")):
+            try:
+                import yaml
+            except ImportError:  # pragma: no cover
+                raise ImportError("PyYAML is required to load %r" % path)
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def read_ndjson(stream):
+    """Yield ``(line_number, record, parse_error)`` from a NDJSON stream.
+
+    Blank lines are skipped, lines which are not valid JSON are yielded with
+    the raw line as record and the parse error message.
+    """
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line), None
+        except ValueError as e:
+            yield line_number, line, "invalid JSON: %s" % e
+
+
+def read_csv(stream):
+    """Yield ``(line_number, record, parse_error)`` from a CSV stream with a
+    header line.
+    """
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield reader.line_num, record, None
+
+
+READERS = {
+    "ndjson": read_ndjson,
+    "csv": read_csv,
+}
+
+
+class Progress(object):
+    """Print the number of processed records and the records/sec to a stream
+    every ``interval`` seconds.
+    """
+
+    def __init__(self, stream=sys.stderr, interval=5.0):
+        self.stream = stream
+        self.interval = interval
+        self.start = self.last = time.time()
+        self.n_records = self.last_n_records = 0
+
+    def update(self, n_records):
+        self.n_records = n_records
+        now = time.time()
+        if now - self.last >= self.interval:
+            rate = (n_records - self.last_n_records) / (now - self.last)
+            self.report("%d records, %.0f records/sec" % (n_records, rate))
+            self.last, self.last_n_records = now, n_records
+
+    def finish(self):
+        elapsed = max(time.time() - self.start, 1e-9)
+        self.report("%d records in %.1f sec, %.0f records/sec" % (
+            self.n_records, elapsed, self.n_records / elapsed))
+
+    def report(self, message):
+        print(message, file=self.stream)
+        self.stream.flush()
+
+
+def validate_stream(records, validator, valid_out, error_out, progress=None):
+    """Validate ``(line_number, record, parse_error)`` tuples and write the
+    results as JSON lines.
+
+    :param validator: a ``cerberus.Validator`` or
+        :class:`~learn_cerberus.compiled.CompiledValidator`.
+    :param valid_out: text stream for the normalized valid records.
+    :param error_out: text stream for the error records.
+    :param progress: an optional :class:`Progress`.
+
+    :return: ``(n_valid, n_invalid)``
+    """
+    n_valid = n_invalid = 0
+    for line_number, record, parse_error in records:
+        if parse_error is None:
+            try:
+                ok = validator.validate(record)
+                errors = validator.errors
+            except Exception as e:  # not a mapping
+                ok, errors = False, [str(e)]
+        else:
+            ok, errors = False, [parse_error]
+
+        if ok:
+            n_valid += 1
+            valid_out.write(json.dumps(validator.document, default=str))
+            valid_out.write("\n")
+        else:
+            n_invalid += 1
+            error_out.write(json.dumps(
+                {"line": line_number, "record": record, "errors": errors},
+                default=str,
+            ))
+            error_out.write("\n")
+
+        if progress is not None:
+            progress.update(n_valid + n_invalid)
+    if progress is not None:
+        progress.finish()
+    return n_valid, n_invalid
+
+
+def _open(path, mode):
+    if path == "-":
+        return sys.stdin if "r" in mode else sys.stdout
+    return io.open(path, mode, encoding="utf-8", newline="" if "r" in mode else None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m learn_cerberus.stream",
+        description="Validate NDJSON or CSV records against a cerberus schema.",
+    )
+    parser.add_argument("schema", help="JSON or YAML schema file")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="input file, default is stdin")
+    parser.add_argument("--format", choices=sorted(READERS),
+                        help="input format, default is guessed from the extension")
+    parser.add_argument("-o", "--output", default="-",
+                        help="file for valid records, default is stdout")
+    parser.add_argument("-e", "--errors", default=None,
+                        help="file for error records, default is stderr")
+    parser.add_argument("--allow-unknown", action="store_true",
+                        help="allow fields which are not in the schema")
+    parser.add_argument("--interval", type=float, default=5.0,
+                        help="seconds between two progress reports")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="don't report progress")
+    args = parser.parse_args(argv)
+
+    input_format = args.format
+    if input_format is None:
+        input_format = "csv" if args.input.endswith(".csv") else "ndjson"
+
+    validator = CompiledValidator(load_schema(args.schema),
+                                  allow_unknown=args.allow_unknown)
+    progress = None if args.quiet else Progress(interval=args.interval)
+
+    input_stream = _open(args.input, "r")
+    valid_out = _open(args.output, "w")
+    error_out = sys.stderr if args.errors is None else _open(args.errors, "w")
+    try:
+        n_valid, n_invalid = validate_stream(
+            READERS[input_format](input_stream), validator,
+            valid_out, error_out, progress,
+        )
+    finally:
+        for stream in (input_stream, valid_out, error_out):
+            if stream not in (sys.stdin, sys.stdout, sys.stderr):
+                stream.close()
+    return 1 if n_invalid else 0
+
+
+def example_validate_stream():
+    schema = {"value": {"type": "number"}}
+    records = read_ndjson(io.StringIO(
+        u'{"value": 1}\n{"value": [1, 2, 3]}\n\n{"value": 2}\nnot json\n'))
+    valid_out, error_out = io.StringIO(), io.StringIO()
+    n_valid, n_invalid = validate_stream(
+        records, CompiledValidator(schema), valid_out, error_out)
+    assert (n_valid, n_invalid) == (2, 2)
+    assert valid_out.getvalue() == '{"value": 1}\n{"value": 2}\n'
+    error_lines = [json.loads(line) for line in error_out.getvalue().splitlines()]
+    assert error_lines[0] == {"line": 2, "record": {"value": [1, 2, 3]},
+                              "errors": {"value": ["must be of number type"]}}
+    assert error_lines[1]["line"] == 5
+
+    records = read_csv(io.StringIO(u"name,age\nJohn,32\n,40\n"))
+    schema = {"name": {"type": "string", "empty": False},
+              "age": {"type": "string", "regex": "[0-9]+"}}
+    valid_out, error_out = io.StringIO(), io.StringIO()
+    assert validate_stream(records, CompiledValidator(schema),
+                           valid_out, error_out) == (1, 1)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
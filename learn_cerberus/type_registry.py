@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Precomputed type checks, see the types listed in ``lsn01_quickstart.py`` and
+``custom_data_types`` of ``lsn02_custom_validator.py``.
+
+``Validator._validate_type`` looks up every type name of the ``type`` rule
+again for every value, tries them one by one and falls back to a
+``_validate_type_<name>`` method lookup. Here a type name, or a list of them,
+is resolved once into one checker function:
+
+- a type, or a union of types, e.g. ``["string", "integer"]``, is one
+  ``isinstance`` call with a tuple of classes.
+- the types with excluded classes, e.g. ``number`` (not ``bool``), remember
+  their result for every ``type(value)`` they have seen, one dict lookup.
+- a pattern type, e.g. ``objectid``, is a string matching a compiled regular
+  expression, see :meth:`TypeRegistry.add_pattern`.
+
+:class:`TypeRegistry` holds the types added to the ones of
+``Validator.types_mapping``. :class:`RegisteredTypes` is the mixin for
+``Validator`` which checks types with it, the checkers are resolved once per
+schema and shared with the child validators.
+
+Usage::
+
+    class MyValidator(RegisteredTypes, Validator):
+        type_registry = TypeRegistry().add_pattern("objectid", "[a-f0-9]{24}")
+
+    v = MyValidator({"_id": {"type": ["objectid", "integer"]}})
+
+Types are decided by the class of the values, the results of the unions are
+remembered per class, register the abstract base classes before validating.
+"""
+
+from __future__ import print_function
+
+from cerberus import TypeDefinition, Validator, errors
+
+from .cache import compile_regex
+
+
+def union_checker(definitions, predicates=()):
+    """A function telling if a value is of one of the types.
+
+    :param definitions: ``[(included types, excluded types), ...]``, as in
+        ``cerberus.TypeDefinition``.
+    :param predicates: the checkers of the other types, e.g. pattern types,
+        tried after the definitions.
+    """
+    predicates = tuple(predicates)
+    if definitions and not predicates and not any(excluded for _, excluded in definitions):
+        included = tuple(included for included, _ in definitions)  # nested tuples
+        return lambda value: isinstance(value, included)
+    if not definitions and len(predicates) == 1:
+        return predicates[0]
+
+    by_kind = dict()  # type(value) -> is of one of the definitions
+
+    def of_kind(kind, value):
+        matched = any(isinstance(value, included) and not isinstance(value, excluded)
+                      for included, excluded in definitions)
+        by_kind[kind] = matched
+        return matched
+
+    def check(value):
+        kind = type(value)
+        matched = by_kind.get(kind)
+        if matched is None:
+            matched = of_kind(kind, value)
+        if matched:
+            return True
+        for predicate in predicates:
+            if predicate(value):
+                return True
+        return False
+
+    return check
+
+
+class TypeRegistry(object):
+    """Type names and their checks, added to the ones of
+    ``Validator.types_mapping``.
+    """
+
+    def __init__(self):
+        self.definitions = dict()  # name -> (included types, excluded types)
+        self.predicates = dict()  # name -> checker function
+        self._type_definitions = dict()  # for the schema validation
+
+    def add_definition(self, name, included_types, excluded_types=()):
+        """A type of ``isinstance(value, included_types)`` which are not
+        ``isinstance(value, excluded_types)``.
+        """
+        self.definitions[name] = (included_types, excluded_types)
+        self._type_definitions[name] = TypeDefinition(name, included_types, excluded_types)
+        return self
+
+    def add_pattern(self, name, pattern, flags=0):
+        """A type of the strings matching ``pattern`` as a whole.
+        """
+        fullmatch = compile_regex(pattern, flags).fullmatch
+        return self.add_checker(name, lambda value: isinstance(value, str) and
+                                fullmatch(value) is not None, (str,))
+
+    def add_checker(self, name, func, included_types=(object,)):
+        """A type of the values for which ``func(value)`` is true.
+
+        :param included_types: the types ``Validator`` would accept for this
+            type, without the registry.
+        """
+        self.predicates[name] = func
+        self._type_definitions[name] = TypeDefinition(name, included_types, ())
+        return self
+
+    def type_definitions(self):
+        """``cerberus.TypeDefinition`` of the registered types, to be added
+        to ``types_mapping`` so schemas can use them.
+        """
+        return dict(self._type_definitions)
+
+    def __contains__(self, name):
+        return name in self.definitions or name in self.predicates
+
+
+class RegisteredTypes(object):
+    """Mixin for ``Validator`` and its subclasses, checks the ``type`` rule
+    with one checker function per type or list of types. The types of the
+    ``type_registry`` class attribute are added to the ones of the class.
+    """
+
+    #: a :class:`TypeRegistry` of the types added to ``types_mapping``
+    type_registry = None
+
+    def __init_subclass__(cls, **kwargs):
+        super(RegisteredTypes, cls).__init_subclass__(**kwargs)
+        registry = cls.__dict__.get("type_registry")
+        if registry is not None:
+            types_mapping = dict(cls.types_mapping)
+            types_mapping.update(registry.type_definitions())
+            cls.types_mapping = types_mapping
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("_type_checkers", dict())
+        super(RegisteredTypes, self).__init__(*args, **kwargs)
+
+    def _type_checker(self, names):
+        """Resolve type names into one checker function."""
+        registry = self.type_registry
+        definitions, predicates = list(), list()
+        for name in names:
+            if registry is not None and name in registry.predicates:
+                predicates.append(registry.predicates[name])
+            elif registry is not None and name in registry.definitions:
+                definitions.append(registry.definitions[name])
+            elif name in self.types_mapping:
+                definition = self.types_mapping[name]
+                definitions.append((definition.included_types, definition.excluded_types))
+            else:  # a _validate_type_<name> method
+                predicates.append(getattr(self, "_validate_type_" + name))
+        return union_checker(definitions, predicates)
+
+    def _validate_type(self, data_type, field, value):
+        """
+        {'type': ['string', 'list'],
+         'check_with': 'type'}
+        """
+        if not data_type:
+            return
+        checkers = self._config["_type_checkers"]
+        key = data_type if isinstance(data_type, str) else id(data_type)
+        cached = checkers.get(key)
+        if cached is None or (key is not data_type and cached[0] is not data_type):
+            # or the id of dropped types
+            names = (data_type,) if isinstance(data_type, str) else data_type
+            cached = checkers[key] = (data_type, self._type_checker(names))
+        if not cached[1](value):
+            self._error(field, errors.BAD_TYPE)
+            self._drop_remaining_rules()
+
+
+class RegisteredTypesValidator(RegisteredTypes, Validator):
+    """``cerberus.Validator`` with precomputed type checks.
+    """
+
+
+def example_type_registry():
+    import datetime
+    import timeit
+
+    class MyValidator(RegisteredTypes, Validator):  # custom_data_types of lsn02
+        type_registry = TypeRegistry().add_pattern("objectid", "[a-f0-9]{16}")
+
+    v = MyValidator({"_id": {"type": "objectid"}})
+    assert v.validate({"_id": "0123456789abcdef"}) is True
+    assert v.validate({"_id": "0123456789"}) is False
+    assert v.errors == {"_id": ["must be of objectid type"]}
+    v = MyValidator({"_id": {"type": ["objectid", "integer"]}})
+    assert v.validate({"_id": 7}) is True
+    assert v.validate({"_id": "0123456789abcdeF"}) is False
+
+    # the types of lsn01_quickstart.py, alone and in unions
+    schema = {
+        "string": {"type": "string"},
+        "integer": {"type": "integer"},
+        "float": {"type": "float"},
+        "number": {"type": "number"},
+        "boolean": {"type": "boolean"},
+        "datetime": {"type": "datetime"},
+        "dict": {"type": "dict"},
+        "list": {"type": "list"},
+        "set": {"type": "set"},
+        "string_or_integer": {"type": ["string", "integer"]},
+        "number_or_list": {"type": ["number", "list"]},
+    }
+    values = ["a", 1, 1.5, True, None, datetime.datetime(2020, 1, 1), {}, [], set(), (1,)]
+    v, rv = Validator(schema), RegisteredTypesValidator(schema)
+    for value in values:
+        document = dict((field, value) for field in schema)
+        assert rv.validate(document) is v.validate(document)
+        assert rv.errors == v.errors
+
+    document = {"string": "a", "integer": 1, "float": 1.5, "number": 2, "boolean": True,
+                "datetime": datetime.datetime(2020, 1, 1), "dict": {}, "list": [],
+                "set": set(), "string_or_integer": 3, "number_or_list": [1]}
+    assert v.validate(document) is rv.validate(document) is True
+    n = 100000
+    for field in ("string", "number", "string_or_integer", "number_or_list"):
+        data_type, value = schema[field]["type"], document[field]
+        t_plain = timeit.timeit(lambda: v._validate_type(data_type, field, value), number=n)
+        t_registry = timeit.timeit(lambda: rv._validate_type(data_type, field, value), number=n)
+        print("type %-20r Validator: %.2f us, RegisteredTypesValidator: %.2f us" % (
+            data_type, t_plain / n * 1e6, t_registry / n * 1e6))
+
+
+if __name__ == "__main__":
+    """
+    """
+    example_type_registry()
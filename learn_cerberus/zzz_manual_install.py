@@ -26,9 +26,12 @@ SOFTWARE.
 from __future__ import print_function, unicode_literals
 import os
 import site
+import errno
+import json
 import shutil
 import hashlib
 import platform
+from concurrent.futures import ThreadPoolExecutor
 
 __version__ = "0.0.1"
 __short_description__ = "Utility script to install your package in one shot, for developer."
@@ -130,71 +133,249 @@ def md5_of_file(abspath):
     return m.hexdigest()
 
 
-def check_need_install():
+MANIFEST_NAME = ".install-manifest.json"
+MANIFEST_VERSION = 1
+HASH_WORKERS = 8
+
+
+def scan_tree(top):
+    """Size and mtime of the package files of a tree, ``__pycache__``,
+    ``*.pyc`` and the manifest excluded.
+
+    :return: ``{relative path: (size, mtime_ns)}``
+    """
+    stats = dict()
+    if not os.path.isdir(top):
+        return stats
+    for root, dirnames, basename_list in os.walk(top):
+        dirnames[:] = [dirname for dirname in dirnames if dirname != "__pycache__"]
+        for basename in basename_list:
+            if basename.endswith(".pyc") or basename == MANIFEST_NAME:
+                continue
+            abspath = os.path.join(root, basename)
+            st = os.stat(abspath)
+            stats[os.path.relpath(abspath, top)] = (st.st_size, st.st_mtime_ns)
+    return stats
+
+
+def file_entries(top, stats, known, max_workers=HASH_WORKERS):
+    """Md5 value of the files of a tree. A file whose size and mtime are the
+    ones in ``known`` keeps its known md5, the other ones are hashed in a
+    thread pool.
+
+    :return: ``{relative path: [size, mtime_ns, md5]}``
+    """
+    entries = dict()
+    to_hash = list()
+    for relpath, stat in stats.items():
+        entry = known.get(relpath)
+        if entry is not None and tuple(entry[:2]) == stat:
+            entries[relpath] = list(entry)
+        else:
+            to_hash.append(relpath)
+    if to_hash:
+        abspath_list = [os.path.join(top, relpath) for relpath in to_hash]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for relpath, md5 in zip(to_hash, pool.map(md5_of_file, abspath_list)):
+                entries[relpath] = [stats[relpath][0], stats[relpath][1], md5]
+    return entries
+
+
+def load_manifest(dst):
+    """The manifest of the last install, ``{"source": entries, "installed":
+    entries}``, empty ones if there is none.
+    """
+    try:
+        with open(os.path.join(dst, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (IOError, OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "source": dict(), "installed": dict()}
+
+
+def save_manifest(top, source, installed):
+    """Write the manifest in ``top`` atomically.
+    """
+    path = os.path.join(top, MANIFEST_NAME)
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp_path, "w") as f:
+        json.dump({"version": MANIFEST_VERSION, "source": source,
+                   "installed": installed}, f, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def plan_install(src=SRC, dst=DST):
+    """Compare this package to the installed one, only the files whose size
+    or mtime changed since the last install are hashed.
+
+    :return: ``(source entries, installed entries, files to copy, files to
+        delete)``
+    """
+    manifest = load_manifest(dst)
+    source = file_entries(src, scan_tree(src), manifest["source"])
+    installed = file_entries(dst, scan_tree(dst), manifest["installed"])
+    to_copy = sorted(relpath for relpath, entry in source.items()
+                     if relpath not in installed or installed[relpath][2] != entry[2])
+    to_delete = sorted(relpath for relpath in installed if relpath not in source)
+    return source, installed, to_copy, to_delete
+
+
+def check_need_install(src=SRC, dst=DST):
     """Check if installed package are exactly the same to this one.
-    By checking md5 value of all files.
+    By checking md5 value of the files which changed since the last install.
     """
-    need_install_flag = False
-    for root, _, basename_list in os.walk(SRC):
-        if os.path.basename(root) != "__pycache__":
-            for basename in basename_list:
-                if not basename.endswith(".pyc"):
-                    src = os.path.join(root, basename)
-                    dst = os.path.join(root.replace(SRC, DST), basename)
-                    if os.path.exists(dst):
-                        if md5_of_file(src) != md5_of_file(dst):
-                            return True
-                    else:
-                        return True
-    return need_install_flag
-
-
-def install():
+    _, _, to_copy, to_delete = plan_install(src, dst)
+    return bool(to_copy or to_delete)
+
+
+def _link_or_copy(src, dst):
+    """Hard link ``src`` to ``dst``, copy it if the file system can't."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def build_staging(src, dst, source, installed, to_copy, to_delete):
+    """Build the new tree next to ``dst``: the unchanged files are hard links
+    to the installed ones, only the changed files are copied.
+
+    :return: ``(staging directory, installed entries of the new tree)``
+    """
+    staging = "%s.new-%d" % (dst, os.getpid())
+    if os.path.exists(staging):
+        shutil.rmtree(staging)
+    os.makedirs(staging)
+
+    replaced = set(to_copy) | set(to_delete)
+    new_installed = dict()
+    for relpath, entry in installed.items():
+        if relpath in replaced:
+            continue
+        target = os.path.join(staging, relpath)
+        if not os.path.isdir(os.path.dirname(target)):
+            os.makedirs(os.path.dirname(target))
+        _link_or_copy(os.path.join(dst, relpath), target)
+        st = os.stat(target)
+        new_installed[relpath] = [st.st_size, st.st_mtime_ns, entry[2]]
+    for relpath in to_copy:
+        target = os.path.join(staging, relpath)
+        if not os.path.isdir(os.path.dirname(target)):
+            os.makedirs(os.path.dirname(target))
+        shutil.copy2(os.path.join(src, relpath), target)
+        st = os.stat(target)
+        new_installed[relpath] = [st.st_size, st.st_mtime_ns, source[relpath][2]]
+    save_manifest(staging, source, new_installed)
+    return staging, new_installed
+
+
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2  # linux/fs.h
+RENAME_SWAP = 2  # macOS stdio.h
+
+_exchange = []
+
+
+def find_exchange():
+    """A function which exchanges two paths atomically: ``renameat2`` with
+    ``RENAME_EXCHANGE`` on Linux, ``renamex_np`` with ``RENAME_SWAP`` on
+    macOS. ``None`` if the platform has none.
+    """
+    if _exchange:
+        return _exchange[0]
+    import ctypes
+    import ctypes.util
+
+    func = None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    except (OSError, TypeError):
+        libc = None
+    if SYS_NAME == "Linux" and hasattr(libc, "renameat2"):
+        renameat2 = libc.renameat2
+        renameat2.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                              ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+
+        def func(path1, path2):
+            return renameat2(AT_FDCWD, path1, AT_FDCWD, path2, RENAME_EXCHANGE)
+    elif SYS_NAME == "Darwin" and hasattr(libc, "renamex_np"):
+        renamex_np = libc.renamex_np
+        renamex_np.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_uint]
+
+        def func(path1, path2):
+            return renamex_np(path1, path2, RENAME_SWAP)
+
+    exchange = None
+    if func is not None:
+        def exchange(path1, path2):
+            if func(os.fsencode(path1), os.fsencode(path2)) != 0:
+                code = ctypes.get_errno()
+                raise OSError(code, os.strerror(code), path1)
+    _exchange.append(exchange)
+    return exchange
+
+
+def swap_in(staging, dst):
+    """Replace ``dst`` by ``staging``.
+
+    With :func:`find_exchange` the two trees are exchanged in one atomic
+    step, an import always finds a complete ``dst``. Elsewhere, or if the
+    file system can't exchange, ``dst`` is renamed away then ``staging``
+    renamed to it: ``dst`` is never half written, but it's missing between
+    the two renames.
+    """
+    if not os.path.exists(dst):
+        os.rename(staging, dst)
+        return
+    exchange = find_exchange()
+    if exchange is not None:
+        try:
+            exchange(staging, dst)
+        except OSError as e:
+            if e.errno not in (errno.EINVAL, errno.ENOSYS, errno.ENOTSUP):
+                raise
+        else:
+            shutil.rmtree(staging, ignore_errors=True)  # the old tree now
+            return
+    old = "%s.old-%d" % (dst, os.getpid())
+    os.rename(dst, old)
+    try:
+        os.rename(staging, dst)
+    except OSError:
+        os.rename(old, dst)
+        raise
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def install(src=SRC, dst=DST):
     """Manual install main script.
+
+    Only the files which differ are copied or deleted, the new tree is built
+    next to the installed one and swapped in, see :func:`build_staging` and
+    :func:`swap_in`.
     """
     # check installed package
-    print("Compare to '%s' ..." % DST)
-    need_install_flag = check_need_install()
-    if not need_install_flag:
+    print("Compare to '%s' ..." % dst)
+    source, installed, to_copy, to_delete = plan_install(src, dst)
+    if not (to_copy or to_delete):
+        if os.path.isdir(dst) and load_manifest(dst) != {
+                "version": MANIFEST_VERSION, "source": source, "installed": installed}:
+            save_manifest(dst, source, installed)  # e.g. touched files
         print("    package is up-to-date, no need to install.")
         return
-    print("Difference been found, start installing ...")
-
-    # remove __pycache__ folder and *.pyc file
-    print("Remove *.pyc file ...")
-    pyc_folder_list = list()
-    pyc_file_list = list()
-    for root, _, basename_list in os.walk(SRC):
-        if os.path.basename(root) == "__pycache__":
-            pyc_folder_list.append(root)
-        for basename in basename_list:
-            if basename.endswith(".pyc"):
-                abspath = os.path.join(root, basename)
-                pyc_file_list.append(abspath)
-
-    for folder in pyc_folder_list:
-        try:
-            shutil.rmtree(folder)
-        except:
-            pass
-    for abspath in pyc_file_list:
-        try:
-            os.remove(abspath)
-        except:
-            pass
-    print("    all *.pyc file has been removed.")
-
-    # install this package to all python version
-    print("Uninstall %s from %s ..." % (PKG_NAME, DST))
-    if os.path.exists(DST):
-        try:
-            shutil.rmtree(DST)
-            print("    Successfully uninstall %s" % PKG_NAME)
-        except Exception as e:
-            print("    %s" % e)
-
-    print("Install %s to %s ..." % (PKG_NAME, DST))
-    shutil.copytree(SRC, DST)
+    print("Difference been found, %d files to copy, %d files to delete ..." % (
+        len(to_copy), len(to_delete)))
+
+    # build the new tree next to the installed one, then swap them
+    print("Install %s to %s ..." % (os.path.basename(os.path.abspath(src)), dst))
+    staging, _ = build_staging(src, dst, source, installed, to_copy, to_delete)
+    try:
+        swap_in(staging, dst)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
     print("    Complete!")
 
 
@@ -48,6 +48,8 @@ def function_based_custom_validators():
     
 # function_based_custom_validators()
 
+objectid_regex = re.compile('[a-f0-9]{16}') # 只编译一次, 不要在每次验证时编译
+
 def custom_data_types():
     """自定义你的data type
     """
@@ -58,7 +60,7 @@ def custom_data_types():
             :param field: field name.
             :param value: field value.
             """
-            if not re.match('[a-f0-9]{16}', value):
+            if not objectid_regex.match(value):
                 self._error(field, ERROR_BAD_TYPE.format('ObjectId'))
                 
     schema = {"_id": {"type": "objectid"}}